@@ -1,6 +1,7 @@
 from recommendations import print_recommendations
+from motor import obtener_motor
+from metricas import resumen
 import streamlit as st
-import pickle
 import pandas as pd
 from datetime import datetime
 
@@ -281,40 +282,17 @@ st.markdown("""
 # FUNCIONES DE CARGA CON CACHE
 # ============================================
 @st.cache_resource
-def load_model():
-    """Carga el modelo con cache para mejor performance"""
+def load_engine():
+    """Carga el motor de recomendaciones (único por proceso) con cache"""
     try:
-        with open('model/modelo.pkl', 'rb') as f:
-            model = pickle.load(f)
-        return model
+        motor = obtener_motor().cargar()
+        # Las canciones más populares quedan en la caché de resultados
+        motor.precalentar()
+        return motor
     except Exception as e:
         st.error(f"Error loading model: {str(e)}")
         return None
 
-@st.cache_data
-def load_data():
-    """Carga los datos con cache"""
-    try:
-        with open('data/datos_tokenizacion.pkl', 'rb') as f:
-            datos = pickle.load(f)
-            playlists_tokenizadas = datos['playlists_tokenizadas']
-            canciones_a_tokens = datos['canciones_a_tokens']
-            tokens_a_canciones = datos['tokens_a_canciones']
-
-        # Crear DataFrame con columnas separadas: cancion, artista, token
-        songs_df = []
-        for token, info in tokens_a_canciones.items():
-            songs_df.append({
-                'cancion': info['cancion'],
-                'artista': info['artista'],
-                'token': token
-            })
-
-        return pd.DataFrame(songs_df), canciones_a_tokens, tokens_a_canciones
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
-        return None, None, None
-
 # ============================================
 # INICIALIZACIÓN DE SESSION STATE
 # ============================================
@@ -330,8 +308,19 @@ if 'last_recommendations' not in st.session_state:
 # ============================================
 # CARGAR DATOS
 # ============================================
-model = load_model()
-songs_df, canciones_a_tokens, tokens_a_canciones = load_data()
+motor = load_engine()
+
+# Si se exportó un modelo nuevo, el motor se recarga y la caché se vuelve a precalentar
+if motor is not None and motor.actualizar_si_cambia():
+    motor.precalentar()
+
+# Sesión de recomendación: se actualiza de forma incremental con cada favorito
+if 'sesion' not in st.session_state:
+    st.session_state.sesion = motor.nueva_sesion() if motor is not None else None
+# El motor es único por proceso: si otra sesión del navegador lo recargó, la versión de los
+# embeddings de esta sesión ya no coincide y se reconstruye desde sus favoritos
+elif motor is not None:
+    st.session_state.sesion = motor.sesion_vigente(st.session_state.sesion)
 
 # ============================================
 # SIDEBAR
@@ -379,8 +368,14 @@ with st.sidebar:
         for i, fav in enumerate(st.session_state.favorites[-5:]):
             st.text(f"♥ {fav}")
         
+        if st.session_state.sesion is not None and len(st.session_state.sesion) > 0:
+            if st.button("💚 Recommend from Favorites"):
+                st.session_state.show_session_recommendations = True
+        
         if st.button("🗑️ Clear Favorites"):
             st.session_state.favorites = []
+            st.session_state.sesion = motor.nueva_sesion() if motor is not None else None
+            st.session_state.show_session_recommendations = False
             st.rerun()
     
     st.markdown("---")
@@ -400,6 +395,26 @@ with st.sidebar:
         **Version:** 2.0  
         **Last Update:** 2024
         """)
+    
+    # Panel de depuración: latencias por etapa (hasta la ejecución anterior) y caché
+    with st.expander("🛠️ Debug"):
+        metricas = resumen()
+        if metricas['etapas']:
+            st.dataframe(
+                pd.DataFrame([
+                    {'stage': etapa, 'calls': datos['total'],
+                     'p50 (ms)': round(datos['p50_ms'], 2), 'p95 (ms)': round(datos['p95_ms'], 2)}
+                    for etapa, datos in metricas['etapas'].items()
+                ]),
+                hide_index=True,
+            )
+        else:
+            st.caption("No timings recorded yet")
+        if motor is not None and motor.cache is not None:
+            estadisticas_cache = motor.cache.estadisticas()
+            st.metric("Cache hit rate", f"{estadisticas_cache['tasa_aciertos']:.1%}")
+            st.caption(f"{estadisticas_cache['entradas']}/{estadisticas_cache['capacidad']} entries · "
+                       f"{estadisticas_cache['expulsiones']} evictions")
 
 # ============================================
 # MAIN HEADER
@@ -530,8 +545,12 @@ if recommend_button:
                                         if st.button(fav_button_label, key=f"fav_{i}_{j}", use_container_width=True):
                                             if is_favorite:
                                                 st.session_state.favorites.remove(card_id)
+                                                if st.session_state.sesion is not None:
+                                                    st.session_state.sesion.quitar(int(row['token']))
                                             else:
                                                 st.session_state.favorites.append(card_id)
+                                                if st.session_state.sesion is not None:
+                                                    st.session_state.sesion.agregar(int(row['token']))
                                             st.rerun()
                     
                     # VISUALIZACIÓN EN TABLA
@@ -619,18 +638,40 @@ if recommend_button:
                     st.info("💡 Try with a different song name or check the spelling.")
                     
                     # Sugerencias
-                    if songs_df is not None:
+                    if motor is not None:
                         st.markdown("### 🔍 Did you mean?")
-                        # Buscar canciones similares
-                        similar = songs_df[songs_df['cancion'].str.contains(search_query, case=False, na=False)]
-                        if not similar.empty:
-                            for _, row in similar.head(5).iterrows():
-                                st.text(f"• {row['cancion'].title()} - {row['artista'].title()}")
+                        # Buscar canciones similares con el índice de búsqueda
+                        for similar in motor.sugerencias(search_query, limite=5):
+                            st.text(f"• {similar['cancion'].title()} - {similar['artista'].title()}")
         
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}")
             st.info("💡 Please try again with a different song or contact support if the problem persists.")
 
+# ============================================
+# RECOMENDACIONES A PARTIR DE FAVORITOS
+# ============================================
+if st.session_state.get('show_session_recommendations') and st.session_state.sesion is not None:
+    st.markdown("### 💚 Based on Your Favorites")
+    session_recommendations = motor.recomendar_desde(st.session_state.sesion, top_n=num_recommendations)
+    
+    if session_recommendations.empty:
+        st.info("💡 Add some favorites to get recommendations based on them.")
+    else:
+        session_recommendations['cancion'] = session_recommendations['cancion'].str.title()
+        session_recommendations['artista'] = session_recommendations['artista'].str.title()
+        session_recommendations.insert(0, '#', range(1, len(session_recommendations) + 1))
+        st.dataframe(
+            session_recommendations,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "#": st.column_config.NumberColumn("#", width="small"),
+                "cancion": st.column_config.TextColumn("Song", width="large"),
+                "artista": st.column_config.TextColumn("Artist", width="large")
+            }
+        )
+
 # ============================================
 # FOOTER
 # ============================================
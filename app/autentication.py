@@ -1,13 +1,5 @@
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from dotenv import load_dotenv
-import os
+from cliente_spotify import obtener_cliente
 
-load_dotenv()
-
-sp = spotipy.Spotify(
-    auth_manager=SpotifyClientCredentials(
-        client_id=os.getenv('SPOTIFY_CLIENT_ID'),
-        client_secret=os.getenv('SPOTIFY_CLIENT_SECRET')
-    )
-)
\ No newline at end of file
+# Cliente compartido del proceso (pool de conexiones, reintentos, token en disco y métricas);
+# ver cliente_spotify.crear_cliente
+sp = obtener_cliente()
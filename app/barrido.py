@@ -0,0 +1,178 @@
+"""
+Barrido de hiperparámetros de Word2Vec sobre settings.PARAMS.
+
+Cada candidato es PARAMS con algunos valores sustituidos (rejilla completa o
+muestra aleatoria de ESPACIO_BARRIDO). Los candidatos se entrenan en un pool
+de procesos: el subcorpus de entrenamiento (y su corpus.txt) se escribe una
+sola vez y todos los procesos lo abren con memory-map, así que comparten la
+misma copia en la caché de páginas. Cada proceso entrena con
+núcleos / procesos hilos y evalúa el modelo sobre las playlists reservadas
+con evaluacion.py (continuación de playlist: siguiente canción y dejar uno
+fuera).
+
+La tabla de resultados incluye las métricas, el tiempo de entrenamiento y el
+tamaño del artefacto de servicio, y marca los candidatos de la frontera de
+Pareto: ninguno otro es a la vez mejor en la métrica y más barato en tiempo
+y tamaño.
+
+Uso:
+    python app/barrido.py                       # Rejilla completa de ESPACIO_BARRIDO
+    python app/barrido.py --aleatorio 12        # 12 candidatos al azar
+    python app/barrido.py --procesos 4 --metrica dejar_uno_fuera.mrr
+"""
+import argparse
+import itertools
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from settings import (PARAMS, ESPACIO_BARRIDO, PROCESOS_BARRIDO, METRICA_BARRIDO, CONSULTAS_BARRIDO,
+                      RUTA_BARRIDO, RUTA_CORPUS, FRACCION_PRUEBA, MODO_ENTRENAMIENTO)
+
+# Contexto de cada proceso del pool (lo fija _inicializar una vez por proceso)
+_CONTEXTO = {}
+
+
+def candidatos_rejilla(espacio=ESPACIO_BARRIDO):
+    """Todas las combinaciones del espacio (lista de diccionarios)"""
+    claves = list(espacio)
+    return [dict(zip(claves, valores)) for valores in itertools.product(*(espacio[c] for c in claves))]
+
+
+def candidatos_aleatorios(espacio=ESPACIO_BARRIDO, n=10, semilla=42):
+    """Hasta `n` combinaciones distintas elegidas al azar"""
+    rejilla = candidatos_rejilla(espacio)
+    rng = np.random.default_rng(semilla)
+    return [rejilla[i] for i in rng.choice(len(rejilla), min(n, len(rejilla)), replace=False)]
+
+
+def _inicializar(ruta_entrenamiento, ruta_corpus, indices_prueba, hilos, max_consultas, modo):
+    from corpus import CorpusPlaylists
+
+    _CONTEXTO.update(
+        entrenamiento=CorpusPlaylists(ruta_entrenamiento), corpus=CorpusPlaylists(ruta_corpus),
+        prueba=indices_prueba, hilos=hilos, max_consultas=max_consultas, modo=modo,
+    )
+
+
+def _entrenar_y_evaluar(candidato):
+    """Entrena y evalúa un candidato dentro de un proceso del pool"""
+    from entrenamiento import entrenar
+    from evaluacion import evaluar
+
+    params = {**PARAMS, **candidato}
+    modelo, estadisticas = entrenar(_CONTEXTO['entrenamiento'], params, modo=_CONTEXTO['modo'],
+                                    workers=_CONTEXTO['hilos'], verbose=False)
+    # Artefacto de servicio: vectores float32 + claves y filas int32 (ver embeddings.py)
+    n_vectores = len(modelo.wv)
+    max_token = max(int(clave) for clave in modelo.wv.index_to_key)
+    bytes_artefacto = n_vectores * params['vector_size'] * 4 + n_vectores * 4 + (max_token + 1) * 4
+
+    inicio = time.perf_counter()
+    resultados = evaluar(modelo.wv, _CONTEXTO['corpus'], _CONTEXTO['prueba'],
+                         max_consultas=_CONTEXTO['max_consultas'], workers=_CONTEXTO['hilos'])
+    fila = {
+        **candidato,
+        'segundos_entrenamiento': estadisticas['segundos_vocabulario'] + estadisticas['segundos'],
+        'palabras_por_s': estadisticas['palabras_por_s'],
+        'mb_artefacto': bytes_artefacto / 2**20,
+        'segundos_evaluacion': time.perf_counter() - inicio,
+    }
+    for tarea, metricas in resultados.items():
+        fila.update({f"{tarea}.{nombre}": valor for nombre, valor in metricas.items()
+                     if nombre.startswith(('hit@', 'mrr', 'cobertura@'))})
+    return fila
+
+
+def frontera_pareto(tabla, metrica, costes=('segundos_entrenamiento', 'mb_artefacto')):
+    """
+    Marca las filas no dominadas: ninguna otra tiene una métrica mayor o igual
+    y costes menores o iguales, con al menos una mejora estricta
+
+    Returns:
+        Serie booleana alineada con la tabla
+    """
+    calidad = tabla[metrica].to_numpy()
+    coste = tabla[list(costes)].to_numpy()
+    no_peor = (calidad[None, :] >= calidad[:, None]) & np.all(coste[None, :] <= coste[:, None], axis=2)
+    mejor = (calidad[None, :] > calidad[:, None]) | np.any(coste[None, :] < coste[:, None], axis=2)
+    dominada = np.any(no_peor & mejor, axis=1)
+    return pd.Series(~dominada, index=tabla.index)
+
+
+def barrido(candidatos, ruta_corpus=RUTA_CORPUS, procesos=PROCESOS_BARRIDO, fraccion_prueba=FRACCION_PRUEBA,
+            max_consultas=CONSULTAS_BARRIDO, metrica=METRICA_BARRIDO, modo=MODO_ENTRENAMIENTO, semilla=42):
+    """
+    Entrena y evalúa cada candidato en un pool de procesos
+
+    Args:
+        candidatos: Lista de diccionarios con los valores que sustituyen a PARAMS
+        ruta_corpus: Corpus compacto completo
+        procesos: Procesos del pool (None = uno por cada 2 núcleos)
+        fraccion_prueba: Playlists reservadas para evaluar
+        max_consultas: Consultas por tarea de evaluación
+        metrica: Columna por la que se ordena ('tarea.métrica')
+        modo: Modo de entrenamiento ('corpus_file' o 'iterable')
+
+    Returns:
+        DataFrame con una fila por candidato, ordenado por la métrica, con la
+        columna 'pareto'
+    """
+    from entrenamiento import workers_automaticos
+    from corpus import CorpusPlaylists, escribir_subcorpus
+    from evaluacion import dividir_corpus
+
+    nucleos = workers_automaticos()
+    procesos = max(1, min(procesos or nucleos // 2, len(candidatos)))
+    hilos = max(1, nucleos // procesos)
+    corpus = CorpusPlaylists(ruta_corpus)
+    indices_entrenamiento, indices_prueba = dividir_corpus(corpus, fraccion_prueba, semilla)
+    print(f"\n=== BARRIDO: {len(candidatos)} candidatos, {procesos} procesos x {hilos} hilos, "
+          f"{len(indices_entrenamiento)} playlists de entrenamiento / {len(indices_prueba)} reservadas ===\n")
+
+    # Subcorpus de entrenamiento compartido (y su corpus.txt, generado una sola vez)
+    ruta_entrenamiento = f"{ruta_corpus}.barrido"
+    entrenamiento = escribir_subcorpus(corpus, indices_entrenamiento, ruta_entrenamiento)
+    if modo == 'corpus_file':
+        entrenamiento.exportar_lineas()
+
+    filas = []
+    try:
+        with ProcessPoolExecutor(
+            max_workers=procesos, initializer=_inicializar,
+            initargs=(ruta_entrenamiento, ruta_corpus, indices_prueba, hilos, max_consultas, modo),
+        ) as executor:
+            futuros = {executor.submit(_entrenar_y_evaluar, candidato): candidato for candidato in candidatos}
+            for hechos, futuro in enumerate(as_completed(futuros), 1):
+                fila = futuro.result()
+                filas.append(fila)
+                print(f"  ✓ [{hechos}/{len(candidatos)}] {futuros[futuro]} → {metrica}={fila.get(metrica, 0):.4f} "
+                      f"({fila['segundos_entrenamiento']:.1f}s, {fila['mb_artefacto']:.1f} MB)")
+    finally:
+        shutil.rmtree(ruta_entrenamiento, ignore_errors=True)
+
+    tabla = pd.DataFrame(filas).sort_values(metrica, ascending=False).reset_index(drop=True)
+    tabla['pareto'] = frontera_pareto(tabla, metrica)
+    return tabla
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Barrido de hiperparámetros de Word2Vec')
+    parser.add_argument('--corpus', default=RUTA_CORPUS)
+    parser.add_argument('--aleatorio', type=int, help='Número de candidatos al azar (por defecto, rejilla completa)')
+    parser.add_argument('--procesos', type=int, default=PROCESOS_BARRIDO)
+    parser.add_argument('--metrica', default=METRICA_BARRIDO)
+    parser.add_argument('--consultas', type=int, default=CONSULTAS_BARRIDO)
+    parser.add_argument('--salida', default=RUTA_BARRIDO)
+    args = parser.parse_args()
+
+    candidatos = candidatos_aleatorios(n=args.aleatorio) if args.aleatorio else candidatos_rejilla()
+    tabla = barrido(candidatos, args.corpus, args.procesos, max_consultas=args.consultas, metrica=args.metrica)
+
+    columnas = [*ESPACIO_BARRIDO, args.metrica, 'segundos_entrenamiento', 'mb_artefacto', 'pareto']
+    print(f"\n{tabla[columnas].to_string(index=False, float_format=lambda v: f'{v:.4f}')}")
+    os.makedirs(os.path.dirname(args.salida) or '.', exist_ok=True)
+    tabla.to_csv(args.salida, index=False)
+    print(f"\n✓ Resultados guardados en: {args.salida} ({int(tabla['pareto'].sum())} en la frontera de Pareto)")
@@ -0,0 +1,319 @@
+"""
+Benchmarks de las rutas críticas, del crawl al servicio, con un corpus sintético.
+
+Todo se genera sin conexión: las playlists tienen popularidad de canciones
+tipo Zipf y longitud configurable (de 10k a 10M tokens). Se miden:
+
+    tokenizacion        aplanar_tracks + tokenizar_lote sobre items con el formato de la API
+    corpus              Escritura del corpus compacto
+    catalogo            Escritura del catálogo columnar
+    entrenamiento       Word2Vec con settings.PARAMS (épocas y modo configurables)
+    exportacion         Exportación de los embeddings de servicio
+    indice_busqueda     Construcción del índice de búsqueda por nombre
+    carga               Apertura de los artefactos en un RecommenderEngine nuevo
+    busqueda            Búsquedas por nombre (limite=10)
+    recomendacion       Recomendaciones de una canción (sin caché)
+    recomendacion_lote  recomendar_muchos con muchas consultas
+    rss_pico_mb         Memoria residente máxima del proceso
+
+El resultado se guarda en RUTA_BENCHMARK_RESULTADOS (model/, no se versiona)
+y se compara con la línea base versionada RUTA_BENCHMARK_BASELINE: una métrica
+empeora si pasa el umbral relativo (UMBRAL_REGRESION, o el de la métrica en
+UMBRALES_REGRESION) y la diferencia absoluta supera el ruido mínimo
+(RUIDO_MINIMO). Con regresiones el proceso termina con código 1.
+
+Uso:
+    python app/benchmark.py --tokens 100000
+    python app/benchmark.py --tokens 100000 --guardar-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+from settings import (PARAMS, MODO_ENTRENAMIENTO, RUTA_BENCHMARK_RESULTADOS, RUTA_BENCHMARK_BASELINE,
+                      UMBRAL_REGRESION, UMBRALES_REGRESION, RUIDO_MINIMO)
+
+PALABRAS = ('amor', 'noche', 'corazón', 'fuego', 'luna', 'baila', 'sueño', 'cielo', 'mar', 'vida',
+            'love', 'night', 'heart', 'fire', 'dance', 'dream', 'sky', 'rain', 'gold', 'wild')
+MAX_TOKENS_TOKENIZACION = 500_000  # Los items tipo API ocupan mucha memoria: se tokeniza una muestra
+
+
+def rss_pico_mb():
+    """Memoria residente máxima del proceso en MB (ru_maxrss es KB en Linux y bytes en macOS)"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def percentiles_ms(tiempos):
+    tiempos = np.asarray(tiempos) * 1000
+    return {'p50_ms': float(np.percentile(tiempos, 50)), 'p99_ms': float(np.percentile(tiempos, 99))}
+
+
+# ---------- Datos sintéticos ----------
+
+def generar_playlists(n_tokens, longitud_media=50, n_canciones=None, exponente_zipf=1.1, semilla=42):
+    """
+    Playlists sintéticas con popularidad de canciones tipo Zipf
+
+    Args:
+        n_tokens: Total aproximado de tokens del corpus
+        longitud_media: Longitud media de las playlists (distribución de Poisson)
+        n_canciones: Tamaño del catálogo (por defecto n_tokens / 10)
+        exponente_zipf: Exponente s de la popularidad p(rango) ∝ 1 / rango^s
+        semilla: Semilla aleatoria
+
+    Returns:
+        Tupla (tokens, offsets, n_canciones): tokens int32 desde 1 y offsets
+        int64 con el mismo formato que el corpus compacto
+    """
+    rng = np.random.default_rng(semilla)
+    n_canciones = n_canciones or max(n_tokens // 10, 100)
+    longitudes = np.maximum(rng.poisson(longitud_media, max(n_tokens // longitud_media, 1)), 2)
+    offsets = np.zeros(len(longitudes) + 1, dtype=np.int64)
+    np.cumsum(longitudes, out=offsets[1:])
+
+    probabilidades = 1.0 / np.arange(1, n_canciones + 1) ** exponente_zipf
+    probabilidades /= probabilidades.sum()
+    # Las canciones más populares reciben tokens dispersos, no los primeros
+    permutacion = rng.permutation(n_canciones).astype(np.int32) + 1
+    tokens = permutacion[rng.choice(n_canciones, int(offsets[-1]), p=probabilidades)]
+    return tokens, offsets, n_canciones
+
+
+def nombre_cancion(token):
+    return f"{PALABRAS[token % len(PALABRAS)]} {PALABRAS[(token // 7) % len(PALABRAS)]} {token}"
+
+
+def items_api(tokens):
+    """Items de una playlist con el formato de la API de Spotify"""
+    return [{'track': {'name': nombre_cancion(t), 'artists': [{'name': f"artista {t % 997}"}],
+                       'popularity': int(100 / (1 + t % 50))}} for t in tokens.tolist()]
+
+
+# ---------- Etapas ----------
+
+class Cronometro:
+    """Mide el tiempo de cada etapa y guarda sus métricas"""
+
+    def __init__(self):
+        self.resultados = {}
+
+    def medir(self, etapa, funcion, **extra):
+        inicio = time.perf_counter()
+        valor = funcion()
+        segundos = time.perf_counter() - inicio
+        self.resultados[etapa] = {'segundos': segundos, **{k: v(segundos) if callable(v) else v
+                                                             for k, v in extra.items()}}
+        print(f"  ✓ {etapa:<20} {segundos:>9.3f}s  {self._resumen(self.resultados[etapa])}")
+        return valor
+
+    def agregar(self, etapa, metricas):
+        self.resultados[etapa] = metricas
+        segundos = f"{metricas['segundos']:>9.3f}s" if 'segundos' in metricas else ''
+        print(f"  ✓ {etapa:<20} {segundos:>10}  {self._resumen(metricas)}")
+
+    @staticmethod
+    def _resumen(metricas):
+        return ', '.join(f"{k}={v:,.3f}" if isinstance(v, float) else f"{k}={v}"
+                         for k, v in metricas.items() if k != 'segundos')
+
+
+def ejecutar_benchmark(n_tokens=100_000, longitud_media=50, n_canciones=None, epochs=None,
+                       n_consultas=200, tam_lote=1000, semilla=42, modo_entrenamiento=MODO_ENTRENAMIENTO):
+    """
+    Ejecuta todas las etapas en una carpeta temporal
+
+    Returns:
+        Diccionario con la configuración y los resultados por etapa
+    """
+    from entrenamiento import entrenar
+    from tokenizer_songs import estado_vacio, tokenizar_lote
+    from normalizacion import aplanar_tracks
+    from corpus import EscritorCorpus, CorpusPlaylists
+    from catalogo import escribir_catalogo, Catalogo
+    from embeddings import exportar_embeddings
+    from busqueda import cargar_indice_busqueda
+    from motor import RecommenderEngine
+
+    params = {**PARAMS, 'epochs': epochs or PARAMS['epochs']}
+    rng = np.random.default_rng(semilla)
+    carpeta = tempfile.mkdtemp(prefix='benchmark_')
+    rutas = {nombre: os.path.join(carpeta, nombre) for nombre in ('corpus', 'catalogo', 'embeddings')}
+    crono = Cronometro()
+
+    try:
+        tokens, offsets, n_canciones = generar_playlists(n_tokens, longitud_media, n_canciones, semilla=semilla)
+        n_playlists = len(offsets) - 1
+        print(f"\n=== BENCHMARK: {len(tokens):,} tokens, {n_playlists:,} playlists, "
+              f"{n_canciones:,} canciones, {params['epochs']} épocas ===\n")
+
+        # Tokenización de una muestra de playlists con items tipo API
+        limite = int(np.searchsorted(offsets, min(len(tokens), MAX_TOKENS_TOKENIZACION), side='right')) - 1
+        playlists_items = [items_api(tokens[offsets[i]:offsets[i + 1]]) for i in range(max(limite, 1))]
+        n_tokenizados = sum(len(items) for items in playlists_items)
+        estado = estado_vacio()
+        playlists_api = [(None, {'id': f"playlist{i}", 'name': f"playlist {i}"}) for i in range(len(playlists_items))]
+        tracks_api = {info['id']: items for (_, info), items in zip(playlists_api, playlists_items)}
+        crono.medir('tokenizacion', lambda: tokenizar_lote(estado, aplanar_tracks(playlists_api, tracks_api)[0]),
+                    tokens=n_tokenizados, tokens_por_s=lambda s: n_tokenizados / s)
+        del playlists_items, playlists_api, tracks_api, estado
+
+        def escribir_corpus():
+            with EscritorCorpus(rutas['corpus']) as escritor:
+                for i in range(n_playlists):
+                    escritor.agregar(tokens[offsets[i]:offsets[i + 1]], f"playlist{i}")
+        crono.medir('corpus', escribir_corpus, tokens_por_s=lambda s: len(tokens) / s)
+
+        canciones = {token: {'cancion': nombre_cancion(token), 'artista': f"artista {token % 997}",
+                             'genero': PALABRAS[token % 5], 'popularidad': int(100 / (1 + token % 50))}
+                     for token in range(1, n_canciones + 1)}
+        crono.medir('catalogo', lambda: escribir_catalogo(canciones, rutas['catalogo']),
+                    canciones=n_canciones)
+
+        inicio = time.perf_counter()
+        modelo, entrenamiento = entrenar(CorpusPlaylists(rutas['corpus']), params,
+                                         modo=modo_entrenamiento, verbose=False)
+        crono.agregar('entrenamiento', {
+            'segundos': time.perf_counter() - inicio, 'epochs': params['epochs'],
+            'modo': entrenamiento['modo'], 'workers': entrenamiento['workers'],
+            'palabras_por_s': entrenamiento['palabras_por_s'],
+            'palabras_por_s_worker': entrenamiento['palabras_por_s_worker'],
+        })
+        crono.medir('exportacion', lambda: exportar_embeddings(modelo.wv, rutas['embeddings']),
+                    vectores=len(modelo.wv))
+        del modelo
+        crono.medir('indice_busqueda', lambda: cargar_indice_busqueda(Catalogo(rutas['catalogo'])))
+
+        motor = RecommenderEngine(ruta_catalogo=rutas['catalogo'], ruta_embeddings=rutas['embeddings'],
+                                  usar_indice=False, ruta_tabla_vecinos=os.path.join(carpeta, 'sin_tabla'))
+        crono.medir('carga', motor.cargar)
+
+        # Búsquedas: prefijos de títulos reales, sin tildes
+        consultas = [nombre_cancion(int(t))[:rng.integers(3, 12)].replace('ó', 'o')
+                     for t in rng.integers(1, n_canciones + 1, n_consultas)]
+        tiempos = []
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            motor.buscar(consulta, limite=10)
+            tiempos.append(time.perf_counter() - inicio)
+        crono.agregar('busqueda', {'consultas': n_consultas, **percentiles_ms(tiempos)})
+
+        claves = np.asarray(motor.embeddings.claves)
+        muestra = rng.choice(claves, min(n_consultas, len(claves)), replace=False).tolist()
+        tiempos = []
+        for token in muestra:
+            inicio = time.perf_counter()
+            motor.recomendar(token, 10)
+            tiempos.append(time.perf_counter() - inicio)
+        crono.agregar('recomendacion', {'consultas': len(muestra), **percentiles_ms(tiempos)})
+
+        lote = rng.choice(claves, min(tam_lote, len(claves)), replace=False).tolist()
+        crono.medir('recomendacion_lote', lambda: motor.recomendar_muchos(lote, 10),
+                    consultas=len(lote), consultas_por_s=lambda s: len(lote) / s)
+        del motor
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    crono.resultados['rss_pico_mb'] = {'mb': rss_pico_mb()}
+    print(f"  ✓ {'rss_pico_mb':<20} {crono.resultados['rss_pico_mb']['mb']:>9.1f} MB")
+    return {
+        'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'maquina': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'config': {'tokens': int(len(tokens)), 'playlists': n_playlists, 'canciones': n_canciones,
+                   'longitud_media': longitud_media, 'epochs': params['epochs'], 'semilla': semilla,
+                   'modo_entrenamiento': modo_entrenamiento},
+        'resultados': crono.resultados,
+    }
+
+
+# ---------- Comparación con la línea base ----------
+
+def _mayor_es_mejor(metrica):
+    return metrica.endswith('_por_s')
+
+
+def comparar(actual, baseline, umbral=UMBRAL_REGRESION, umbrales=UMBRALES_REGRESION, ruido=RUIDO_MINIMO):
+    """
+    Compara los resultados con la línea base
+
+    Solo se comparan tiempos (segundos, *_ms), ritmos (*_por_s) y memoria (mb).
+
+    Returns:
+        Lista de diccionarios (etapa, metrica, base, actual, cambio, regresion)
+    """
+    if baseline.get('config') != actual.get('config'):
+        print("⚠️  La línea base se generó con otra configuración; la comparación es orientativa")
+
+    filas = []
+    for etapa, metricas in actual['resultados'].items():
+        base_etapa = baseline.get('resultados', {}).get(etapa, {})
+        for metrica, valor in metricas.items():
+            comparable = metrica in ('segundos', 'mb') or metrica.endswith(('_ms', '_por_s'))
+            base = base_etapa.get(metrica)
+            if not comparable or not base:
+                continue
+            # Cambio relativo positivo = peor
+            cambio = (base - valor) / base if _mayor_es_mejor(metrica) else (valor - base) / base
+            limite = umbrales.get(f"{etapa}.{metrica}", umbrales.get(etapa, umbral))
+            unidad = 'ms' if metrica.endswith('_ms') else metrica
+            significativo = abs(valor - base) > ruido.get(unidad, 0)
+            filas.append({'etapa': etapa, 'metrica': metrica, 'base': base, 'actual': valor,
+                          'cambio': cambio, 'regresion': cambio > limite and significativo})
+    return filas
+
+
+def imprimir_comparacion(filas):
+    print(f"\n{'etapa':<20} {'métrica':<16} {'base':>12} {'actual':>12} {'cambio':>9}")
+    for fila in filas:
+        marca = '❌' if fila['regresion'] else ('✅' if fila['cambio'] < 0 else '  ')
+        print(f"{fila['etapa']:<20} {fila['metrica']:<16} {fila['base']:>12.3f} {fila['actual']:>12.3f} "
+              f"{fila['cambio']:>+8.1%} {marca}")
+    regresiones = [fila for fila in filas if fila['regresion']]
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones frente a la línea base")
+    else:
+        print("\n✅ Sin regresiones frente a la línea base")
+    return regresiones
+
+
+def guardar_json(datos, ruta):
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks con un corpus sintético')
+    parser.add_argument('--tokens', type=int, default=100_000, help='Tokens del corpus (10k a 10M)')
+    parser.add_argument('--longitud', type=int, default=50, help='Longitud media de las playlists')
+    parser.add_argument('--canciones', type=int, help='Tamaño del catálogo (por defecto tokens/10)')
+    parser.add_argument('--epochs', type=int, help='Épocas de Word2Vec (por defecto settings.PARAMS)')
+    parser.add_argument('--modo', choices=('corpus_file', 'iterable'), default=MODO_ENTRENAMIENTO,
+                        help='Modo de entrenamiento de Word2Vec')
+    parser.add_argument('--salida', default=RUTA_BENCHMARK_RESULTADOS)
+    parser.add_argument('--baseline', default=RUTA_BENCHMARK_BASELINE)
+    parser.add_argument('--guardar-baseline', action='store_true', help='Guarda el resultado como línea base')
+    args = parser.parse_args()
+
+    resultado = ejecutar_benchmark(args.tokens, args.longitud, args.canciones, args.epochs,
+                                   modo_entrenamiento=args.modo)
+    guardar_json(resultado, args.salida)
+    print(f"\n✓ Resultados guardados en: {args.salida}")
+
+    if args.guardar_baseline:
+        guardar_json(resultado, args.baseline)
+        print(f"✓ Línea base guardada en: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if imprimir_comparacion(comparar(resultado, baseline)):
+            sys.exit(1)
+    else:
+        print(f"💡 No hay línea base en {args.baseline}; créala con --guardar-baseline")
@@ -0,0 +1,242 @@
+"""
+Índice de búsqueda de canciones por nombre.
+
+Los títulos se normalizan (minúsculas, sin tildes ni diacríticos, espacios
+colapsados) para que "titi me pregunto" encuentre "Tití Me Preguntó". El
+índice se guarda en la carpeta del catálogo (subcarpeta busqueda/):
+
+    titulos.bin / titulos_offsets.npy   Títulos normalizados por token
+    trigramas.npy                       Trigramas distintos (int64, ordenados)
+    postings_offsets.npy                Los tokens del trigrama i son
+    postings.npy                        postings[postings_offsets[i]:postings_offsets[i+1]]
+    prefijos.npy                        Tokens ordenados por título normalizado
+
+Una búsqueda intersecta las listas de los trigramas de la consulta (de la
+más corta a la más larga) y comprueba la subcadena solo en los candidatos.
+Las consultas de menos de 3 caracteres no tienen trigramas: los títulos que
+empiezan por ellas salen de una búsqueda binaria sobre el array de prefijos
+y, si no llenan el límite, el resto se obtiene comparando la consulta con
+los bytes UTF-8 de todos los títulos a la vez (numpy). Los resultados se
+ordenan: primero los títulos que empiezan por la consulta, después el
+resto, y dentro de cada grupo por popularidad.
+"""
+import json
+import os
+import re
+import shutil
+import unicodedata
+import numpy as np
+from catalogo import CARPETA_BUSQUEDA, ColumnaTexto, escribir_textos
+
+BITS_CARACTER = 21  # Un code point Unicode cabe en 21 bits: 3 por trigrama en un int64
+
+
+def normalizar(texto):
+    """Minúsculas, sin diacríticos y con los espacios colapsados"""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_marcas = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', sin_marcas.casefold()).strip()
+
+
+def _codificar_trigramas(puntos):
+    """Trigramas consecutivos de un array de code points como int64"""
+    return (puntos[:-2] << 2 * BITS_CARACTER) | (puntos[1:-1] << BITS_CARACTER) | puntos[2:]
+
+
+def _code_points(texto):
+    return np.frombuffer(texto.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+
+
+def ruta_indice_busqueda(ruta_catalogo):
+    return os.path.join(ruta_catalogo, CARPETA_BUSQUEDA)
+
+
+def construir_indice_busqueda(canciones, ruta):
+    """
+    Construye el índice de búsqueda a partir de los títulos del catálogo
+
+    Args:
+        canciones: Lista de títulos indexada por token (la fila 0 vacía)
+        ruta: Carpeta de destino (se reemplaza de forma atómica)
+    """
+    titulos = [normalizar(cancion) for cancion in canciones]
+    ruta_tmp = f"{ruta}.tmp"
+    os.makedirs(ruta_tmp, exist_ok=True)
+    escribir_textos(ruta_tmp, 'titulos', titulos)
+
+    # Todos los títulos en un array de code points separados por 0: los trigramas
+    # se calculan de una vez y se descartan los que cruzan un separador
+    puntos = _code_points('\0'.join(titulos) + '\0')
+    longitudes = np.fromiter((len(titulo) + 1 for titulo in titulos), dtype=np.int64, count=len(titulos))
+    token_de_posicion = np.repeat(np.arange(len(titulos), dtype=np.int32), longitudes)
+    trigramas = _codificar_trigramas(puntos)
+    validos = (puntos[:-2] != 0) & (puntos[1:-1] != 0) & (puntos[2:] != 0)
+    trigramas, tokens = trigramas[validos], token_de_posicion[:-2][validos]
+
+    # Ordenar por (trigrama, token) y quitar repetidos del mismo título
+    orden = np.lexsort((tokens, trigramas))
+    trigramas, tokens = trigramas[orden], tokens[orden]
+    nuevos = np.ones(len(trigramas), dtype=bool)
+    nuevos[1:] = (trigramas[1:] != trigramas[:-1]) | (tokens[1:] != tokens[:-1])
+    trigramas, tokens = trigramas[nuevos], tokens[nuevos]
+
+    distintos, inicios = np.unique(trigramas, return_index=True)
+    np.save(os.path.join(ruta_tmp, 'trigramas.npy'), distintos)
+    np.save(os.path.join(ruta_tmp, 'postings_offsets.npy'), np.append(inicios, len(tokens)).astype(np.int64))
+    np.save(os.path.join(ruta_tmp, 'postings.npy'), tokens)
+
+    prefijos = sorted(range(1, len(titulos)), key=titulos.__getitem__)
+    np.save(os.path.join(ruta_tmp, 'prefijos.npy'), np.asarray(prefijos, dtype=np.int32))
+    with open(os.path.join(ruta_tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'n_filas': len(titulos), 'trigramas': int(len(distintos)), 'postings': int(len(tokens))}, f)
+
+    if os.path.exists(ruta):
+        shutil.rmtree(ruta)
+    os.replace(ruta_tmp, ruta)
+
+
+class IndiceBusqueda:
+    """
+    Índice de trigramas + prefijos con memory-map
+
+    Args:
+        ruta: Carpeta del índice (ver construir_indice_busqueda)
+        popularidades: Array de popularidad por token para ordenar (opcional)
+    """
+
+    def __init__(self, ruta, popularidades=None):
+        self.ruta = ruta
+        self.titulos = ColumnaTexto(ruta, 'titulos')
+        self.trigramas = np.load(os.path.join(ruta, 'trigramas.npy'))
+        self.postings_offsets = np.load(os.path.join(ruta, 'postings_offsets.npy'), mmap_mode='r')
+        self.postings = np.load(os.path.join(ruta, 'postings.npy'), mmap_mode='r')
+        self.prefijos = np.load(os.path.join(ruta, 'prefijos.npy'), mmap_mode='r')
+        self.popularidades = popularidades
+
+    @staticmethod
+    def existe(ruta):
+        return os.path.exists(os.path.join(ruta, 'meta.json'))
+
+    def _postings(self, trigrama):
+        i = int(np.searchsorted(self.trigramas, trigrama))
+        if i == len(self.trigramas) or self.trigramas[i] != trigrama:
+            return np.zeros(0, dtype=np.int32)
+        return self.postings[self.postings_offsets[i]:self.postings_offsets[i + 1]]
+
+    def _rango_prefijo(self, prefijo):
+        """Posiciones [inicio, fin) de `prefijos` cuyos títulos empiezan por el prefijo"""
+        def primera_posicion(mayor_o_igual):
+            bajo, alto = 0, len(self.prefijos)
+            while bajo < alto:
+                medio = (bajo + alto) // 2
+                titulo = self.titulos[self.prefijos[medio]]
+                if mayor_o_igual(titulo):
+                    alto = medio
+                else:
+                    bajo = medio + 1
+            return bajo
+
+        inicio = primera_posicion(lambda titulo: titulo >= prefijo)
+        fin = primera_posicion(lambda titulo: titulo[:len(prefijo)] > prefijo)
+        return inicio, fin
+
+    def _por_popularidad(self, tokens, limite=None):
+        """Tokens ordenados por popularidad; con límite, solo los `limite` primeros"""
+        tokens = np.asarray(tokens)
+        if self.popularidades is None or len(tokens) == 0:
+            return tokens[:limite]
+        scores = -np.asarray(self.popularidades[tokens])
+        if limite is not None and len(tokens) > limite:
+            elegidos = np.argpartition(scores, limite - 1)[:limite]
+            return tokens[elegidos[np.argsort(scores[elegidos], kind='stable')]]
+        return tokens[np.argsort(scores, kind='stable')]
+
+    def candidatos(self, consulta):
+        """Tokens cuyos títulos contienen todos los trigramas de la consulta normalizada"""
+        trigramas = np.unique(_codificar_trigramas(_code_points(consulta)))
+        listas = sorted((self._postings(t) for t in trigramas.tolist()), key=len)
+        resultado = np.asarray(listas[0])
+        for lista in listas[1:]:
+            if len(resultado) == 0:
+                break
+            resultado = np.intersect1d(resultado, lista, assume_unique=True)
+        return resultado
+
+    def con_subcadena(self, consulta):
+        """
+        Tokens cuyos títulos contienen la consulta normalizada, sin trigramas:
+        la consulta se compara en bloque con los bytes de todos los títulos
+        (para consultas cortas, donde los trigramas no filtran)
+        """
+        patron = np.frombuffer(consulta.encode('utf-8'), dtype=np.uint8)
+        datos = self.titulos.datos
+        n = len(datos) - len(patron) + 1
+        if n <= 0:
+            return np.zeros(0, dtype=np.int32)
+        coincide = datos[:n] == patron[0]
+        for k in range(1, len(patron)):
+            coincide &= datos[k:k + n] == patron[k]
+        posiciones = np.flatnonzero(coincide)
+        # Título de cada coincidencia; se descartan las que cruzan al título siguiente
+        offsets = np.asarray(self.titulos.offsets)
+        tokens = np.searchsorted(offsets, posiciones, side='right') - 1
+        dentro = posiciones + len(patron) <= offsets[tokens + 1]
+        return np.unique(tokens[dentro]).astype(np.int32)
+
+    def buscar(self, query, limite=None):
+        """
+        Tokens cuyos títulos contienen la consulta (sin distinguir tildes ni mayúsculas)
+
+        Args:
+            query: Texto buscado
+            limite: Máximo de resultados (None = todos)
+
+        Returns:
+            Array int32 de tokens: primero los que empiezan por la consulta,
+            luego el resto; cada grupo ordenado por popularidad
+        """
+        consulta = normalizar(query)
+        if not consulta:
+            return np.zeros(0, dtype=np.int32)
+
+        inicio, fin = self._rango_prefijo(consulta)
+        con_prefijo = self._por_popularidad(self.prefijos[inicio:fin], limite)
+        if limite is not None and len(con_prefijo) >= limite:
+            return con_prefijo
+        if len(consulta) < 3:
+            resto = np.setdiff1d(self.con_subcadena(consulta), self.prefijos[inicio:fin], assume_unique=True)
+            faltan = None if limite is None else limite - len(con_prefijo)
+            return np.concatenate([con_prefijo, self._por_popularidad(resto, faltan)]).astype(np.int32)
+
+        # Resto de coincidencias: candidatos por trigramas, verificados por
+        # orden de popularidad hasta completar el límite. Con límite se ordena
+        # primero solo una parte de los candidatos (casi siempre basta)
+        resultado = con_prefijo.tolist()
+        ya_incluidos = set(resultado)
+        candidatos = self.candidatos(consulta)
+        parciales = None if limite is None else 4 * limite
+        while True:
+            for token in self._por_popularidad(candidatos, parciales).tolist():
+                if limite is not None and len(resultado) >= limite:
+                    break
+                if token not in ya_incluidos and consulta in self.titulos[token]:
+                    resultado.append(token)
+                    ya_incluidos.add(token)
+            if parciales is None or len(resultado) >= limite or parciales >= len(candidatos):
+                break
+            parciales = None
+        return np.asarray(resultado, dtype=np.int32)
+
+
+def cargar_indice_busqueda(catalogo):
+    """
+    Abre el índice de búsqueda del catálogo; lo construye si todavía no existe
+    (escribir_catalogo borra el índice anterior al reescribir el catálogo)
+
+    Returns:
+        IndiceBusqueda
+    """
+    ruta = ruta_indice_busqueda(catalogo.ruta)
+    if not IndiceBusqueda.existe(ruta):
+        construir_indice_busqueda(catalogo.canciones.todas(), ruta)
+    return IndiceBusqueda(ruta, catalogo.popularidades)
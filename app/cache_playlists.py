@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import threading
+from settings import RUTA_CACHE
+
+# Caché en memoria: evita releer el disco dentro de una misma ejecución
+_memoria = {}
+
+
+def clave_cache(*partes):
+    """Genera una clave direccionada por contenido (sha256) a partir de sus partes"""
+    texto = ':'.join(str(parte) for parte in partes)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def ruta_cache(clave):
+    """Ruta del archivo JSON de una clave (se reparte en subcarpetas por prefijo)"""
+    return os.path.join(RUTA_CACHE, clave[:2], f"{clave}.json")
+
+
+def leer_cache(clave):
+    """Devuelve la respuesta cacheada para una clave o None si no existe"""
+    if clave in _memoria:
+        return _memoria[clave]
+
+    ruta = ruta_cache(clave)
+    if not os.path.exists(ruta):
+        return None
+
+    with open(ruta, 'r', encoding='utf-8') as f:
+        datos = json.load(f)
+    _memoria[clave] = datos
+    return datos
+
+
+def guardar_cache(clave, datos):
+    """Guarda una respuesta en disco de forma atómica (archivo temporal + rename)"""
+    ruta = ruta_cache(clave)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    ruta_tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(ruta_tmp, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(ruta_tmp, ruta)
+
+    _memoria[clave] = datos
+
+
+def obtener_con_cache(clave, descargar, refrescar=False):
+    """
+    Devuelve la respuesta cacheada o la descarga una única vez y la guarda
+
+    Args:
+        clave: Clave de caché (ver clave_cache)
+        descargar: Función sin argumentos que hace la llamada a la API
+        refrescar: Si es True, ignora la caché y vuelve a descargar
+
+    Returns:
+        Respuesta JSON (dict) de la API
+    """
+    datos = None if refrescar else leer_cache(clave)
+    if datos is None:
+        datos = descargar()
+        if datos is not None:
+            guardar_cache(clave, datos)
+    return datos
+
+
+def clave_playlist(playlist_info):
+    """Clave de caché de una playlist completa (todas sus páginas) en su snapshot actual"""
+    return clave_cache('playlist-paginada', playlist_info['id'], playlist_info.get('snapshot_id') or 'sin-snapshot')
@@ -0,0 +1,105 @@
+"""
+Caché LRU de resultados de recomendación.
+
+Cada entrada guarda los `top_n` vecinos más similares de un token (el máximo
+configurado), así que cualquier petición con un top_n menor se sirve con un
+slice. La clave incluye la versión de los embeddings: al cargar un modelo
+nuevo las entradas antiguas dejan de coincidir y el motor vacía la caché.
+Tras una actualización incremental, en cambio, las entradas de los tokens
+cuyos vecinos no cambiaron pasan a la versión nueva (migrar).
+"""
+import threading
+import numpy as np
+from collections import OrderedDict
+from metricas import contar
+from settings import CACHE_RESULTADOS_CAPACIDAD, CACHE_RESULTADOS_TOP_N
+
+
+class CacheRecomendaciones:
+    """
+    Caché LRU acotada, segura entre hilos
+
+    Args:
+        capacidad: Máximo de tokens en caché (se expulsa el menos usado)
+        top_n: Vecinos que se guardan por token
+    """
+
+    def __init__(self, capacidad=CACHE_RESULTADOS_CAPACIDAD, top_n=CACHE_RESULTADOS_TOP_N):
+        self.capacidad = capacidad
+        self.top_n = top_n
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obtener(self, version, token, top_n):
+        """
+        Vecinos en caché de un token
+
+        Returns:
+            Lista de tuplas (token, similitud) de longitud <= top_n, o None si
+            no está en caché o top_n es mayor que el guardado
+        """
+        clave = (version, token)
+        with self._lock:
+            similares = self._entradas.get(clave)
+            if similares is None or top_n > self.top_n:
+                self.fallos += 1
+                contar('cache_fallos')
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+        contar('cache_aciertos')
+        return similares[:top_n]
+
+    def guardar(self, version, token, similares):
+        """Guarda los vecinos de un token (lista de tuplas ordenada, hasta self.top_n)"""
+        clave = (version, token)
+        with self._lock:
+            self._entradas[clave] = similares[:self.top_n]
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+                self.expulsiones += 1
+                contar('cache_expulsiones')
+
+    def invalidar(self):
+        """Vacía la caché (p. ej. al cargar un modelo nuevo)"""
+        with self._lock:
+            self._entradas.clear()
+
+    def migrar(self, version_anterior, version_nueva, invalidos):
+        """
+        Pasa a `version_nueva` las entradas de `version_anterior` salvo las de
+        los tokens de `invalidos`; el resto de entradas se descartan
+
+        Returns:
+            Número de entradas conservadas
+        """
+        invalidos = set(np.asarray(invalidos).tolist())
+        with self._lock:
+            entradas = OrderedDict(
+                ((version_nueva, token), similares)
+                for (version, token), similares in self._entradas.items()
+                if version == version_anterior and token not in invalidos
+            )
+            self._entradas = entradas
+        return len(entradas)
+
+    def tasa_aciertos(self):
+        total = self.aciertos + self.fallos
+        return self.aciertos / total if total else 0.0
+
+    def estadisticas(self):
+        return {
+            'entradas': len(self._entradas),
+            'capacidad': self.capacidad,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'expulsiones': self.expulsiones,
+            'tasa_aciertos': self.tasa_aciertos(),
+        }
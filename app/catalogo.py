@@ -0,0 +1,196 @@
+"""
+Catálogo columnar de canciones.
+
+El token es directamente el índice de fila (la fila 0 queda vacía), así que
+consultar los datos de un token es O(1). Cada columna se guarda como archivo
+NumPy y se abre con memory-map:
+
+    cancion.bin / cancion_offsets.npy   Textos UTF-8 concatenados + offsets
+    artista.bin / artista_offsets.npy
+    genero.npy                          Código de género (int16, -1 = desconocido)
+    generos.json                        Nombres de los géneros por código
+    popularidad.npy                     Popularidad de Spotify (int16, -1 = desconocida)
+    busqueda/                           Índice de búsqueda por nombre (ver busqueda.py)
+"""
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+import pandas as pd
+from settings import RUTA_CATALOGO, RUTA_DATOS_TOKENIZACION
+
+COLUMNAS_TEXTO = ('cancion', 'artista')
+CARPETA_BUSQUEDA = 'busqueda'
+
+
+def escribir_textos(ruta, nombre, textos):
+    """Guarda una columna de texto como bytes UTF-8 concatenados + offsets int64"""
+    codificados = [texto.encode('utf-8') for texto in textos]
+    offsets = np.zeros(len(codificados) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in codificados], out=offsets[1:])
+    with open(os.path.join(ruta, f"{nombre}.bin"), 'wb') as f:
+        f.write(b''.join(codificados))
+    np.save(os.path.join(ruta, f"{nombre}_offsets.npy"), offsets)
+
+
+def escribir_catalogo(tokens_a_canciones, ruta=RUTA_CATALOGO):
+    """
+    Escribe el catálogo columnar a partir del diccionario token -> info
+
+    Args:
+        tokens_a_canciones: Diccionario token -> {'cancion', 'artista', 'genero', 'popularidad'}
+        ruta: Carpeta de destino
+    """
+    os.makedirs(ruta, exist_ok=True)
+    n_filas = max(tokens_a_canciones, default=0) + 1
+
+    columnas = {nombre: [''] * n_filas for nombre in COLUMNAS_TEXTO}
+    generos = []
+    codigos_genero = {}
+    genero = np.full(n_filas, -1, dtype=np.int16)
+    popularidad = np.full(n_filas, -1, dtype=np.int16)
+
+    for token, info in tokens_a_canciones.items():
+        for nombre in COLUMNAS_TEXTO:
+            columnas[nombre][token] = info.get(nombre) or ''
+        if info.get('genero'):
+            if info['genero'] not in codigos_genero:
+                codigos_genero[info['genero']] = len(generos)
+                generos.append(info['genero'])
+            genero[token] = codigos_genero[info['genero']]
+        if info.get('popularidad') is not None:
+            popularidad[token] = info['popularidad']
+
+    for nombre in COLUMNAS_TEXTO:
+        escribir_textos(ruta, nombre, columnas[nombre])
+    np.save(os.path.join(ruta, 'genero.npy'), genero)
+    np.save(os.path.join(ruta, 'popularidad.npy'), popularidad)
+    with open(os.path.join(ruta, 'generos.json'), 'w', encoding='utf-8') as f:
+        json.dump(generos, f, ensure_ascii=False)
+
+    # El índice de búsqueda queda obsoleto: se reconstruye en la próxima carga
+    ruta_busqueda = os.path.join(ruta, CARPETA_BUSQUEDA)
+    if os.path.exists(ruta_busqueda):
+        shutil.rmtree(ruta_busqueda)
+
+
+class ColumnaTexto:
+    """Columna de textos sobre memory-map: decodifica solo la fila pedida"""
+
+    def __init__(self, ruta, nombre):
+        ruta_bin = os.path.join(ruta, f"{nombre}.bin")
+        if os.path.getsize(ruta_bin) > 0:
+            self.datos = np.memmap(ruta_bin, dtype=np.uint8, mode='r')
+        else:
+            self.datos = np.zeros(0, dtype=np.uint8)
+        self.offsets = np.load(os.path.join(ruta, f"{nombre}_offsets.npy"), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, fila):
+        return self.datos[self.offsets[fila]:self.offsets[fila + 1]].tobytes().decode('utf-8')
+
+    def todas(self):
+        """Decodifica la columna completa en una lista (usar solo para búsquedas completas)"""
+        texto = self.datos.tobytes()
+        offsets = self.offsets.tolist()
+        return [texto[a:b].decode('utf-8') for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+class Catalogo:
+    """
+    Catálogo de canciones indexado por token
+
+    Args:
+        ruta: Carpeta del catálogo (ver escribir_catalogo)
+    """
+
+    def __init__(self, ruta=RUTA_CATALOGO):
+        self.ruta = ruta
+        self.canciones = ColumnaTexto(ruta, 'cancion')
+        self.artistas = ColumnaTexto(ruta, 'artista')
+        self.generos_codigo = np.load(os.path.join(ruta, 'genero.npy'), mmap_mode='r')
+        self.popularidades = np.load(os.path.join(ruta, 'popularidad.npy'), mmap_mode='r')
+        with open(os.path.join(ruta, 'generos.json'), 'r', encoding='utf-8') as f:
+            self.generos = json.load(f)
+        self._df = None
+
+    @staticmethod
+    def existe(ruta=RUTA_CATALOGO):
+        return os.path.exists(os.path.join(ruta, 'popularidad.npy'))
+
+    @property
+    def n_filas(self):
+        return len(self.canciones)
+
+    def __len__(self):
+        return max(self.n_filas - 1, 0)
+
+    def contiene(self, token):
+        """Comprueba en O(1) si un token existe en el catálogo"""
+        return isinstance(token, (int, np.integer)) and 1 <= token < self.n_filas
+
+    def __contains__(self, token):
+        return self.contiene(token)
+
+    def cancion(self, token):
+        return self.canciones[token]
+
+    def artista(self, token):
+        return self.artistas[token]
+
+    def genero(self, token):
+        codigo = int(self.generos_codigo[token])
+        return self.generos[codigo] if codigo >= 0 else None
+
+    def popularidad(self, token):
+        valor = int(self.popularidades[token])
+        return valor if valor >= 0 else None
+
+    def info(self, token):
+        """Diccionario con los datos de un token (mismas claves que songs_df)"""
+        return {'cancion': self.cancion(token), 'artista': self.artista(token), 'token': int(token)}
+
+    def a_dataframe(self, tokens=None):
+        """
+        DataFrame con columnas cancion, artista, token
+
+        Args:
+            tokens: Tokens a incluir, en ese orden. Si es None, todo el catálogo
+                (se construye una sola vez y queda en memoria)
+
+        Returns:
+            DataFrame de pandas
+        """
+        if tokens is not None:
+            tokens = [int(token) for token in tokens]
+            return pd.DataFrame({
+                'cancion': [self.canciones[token] for token in tokens],
+                'artista': [self.artistas[token] for token in tokens],
+                'token': tokens,
+            })
+
+        if self._df is None:
+            self._df = pd.DataFrame({
+                'cancion': self.canciones.todas()[1:],
+                'artista': self.artistas.todas()[1:],
+                'token': np.arange(1, self.n_filas),
+            })
+        return self._df
+
+
+def cargar_catalogo(ruta=RUTA_CATALOGO):
+    """
+    Abre el catálogo columnar; si todavía no existe, lo genera a partir de
+    datos_tokenizacion.pkl (una única vez)
+
+    Returns:
+        Catalogo
+    """
+    if not Catalogo.existe(ruta):
+        with open(RUTA_DATOS_TOKENIZACION, 'rb') as f:
+            datos = pickle.load(f)
+        escribir_catalogo(datos['tokens_a_canciones'], ruta)
+    return Catalogo(ruta)
@@ -0,0 +1,171 @@
+"""
+Cliente de la API de Spotify para el crawler concurrente.
+
+crear_cliente configura una sesión HTTP compartida por todos los hilos:
+
+    - Pool de conexiones keep-alive del tamaño del crawler
+      (SPOTIFY_POOL_CONEXIONES), así cada hilo reutiliza su conexión TLS.
+    - Timeout de conexión y de lectura en cada petición (SPOTIFY_TIMEOUT).
+    - Reintentos solo de GET (idempotentes) ante errores de red y 5xx, con
+      backoff exponencial y jitter. Las respuestas 429 no se reintentan aquí:
+      llegan al crawler, que pausa el token bucket compartido.
+    - Token client-credentials cacheado en disco (RUTA_TOKEN_SPOTIFY): todos
+      los procesos del crawler reutilizan el mismo hasta que caduca.
+    - Latencia por endpoint (etapa spotify_<endpoint> en metricas.py) y
+      contadores spotify_<endpoint>_errores y spotify_reintentos.
+
+obtener_cliente devuelve el cliente del proceso (se crea al primer uso) y
+fijar_cliente lo sustituye, por ejemplo por uno que apunte a spotify_falso.
+
+Uso:
+    sp = obtener_cliente()
+    fijar_cliente(crear_cliente(auth='token-falso', prefijo=servidor.url_base))
+"""
+import json
+import os
+import threading
+from urllib.parse import urlparse
+import requests
+import spotipy
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from spotipy.cache_handler import CacheFileHandler
+from spotipy.oauth2 import SpotifyClientCredentials
+from urllib3.util.retry import Retry
+from metricas import cronometrar, contar
+from settings import (SPOTIFY_POOL_CONEXIONES, SPOTIFY_TIMEOUT, SPOTIFY_REINTENTOS, SPOTIFY_BACKOFF,
+                      SPOTIFY_BACKOFF_JITTER, RUTA_TOKEN_SPOTIFY)
+
+_cliente = None
+_lock = threading.Lock()
+
+
+def nombre_endpoint(url):
+    """
+    Nombre estable de un endpoint para las métricas: los segmentos de recurso
+    sin los ids ('/v1/playlists/<id>/items' -> 'playlists_items',
+    '/v1/search' -> 'search', '/api/token' -> 'token')
+    """
+    partes = [parte for parte in urlparse(url).path.split('/') if parte]
+    if partes[:1] in (['v1'], ['api']):
+        partes = partes[1:]
+    return '_'.join(partes[::2]) or 'raiz'
+
+
+class _ReintentoContado(Retry):
+    """Retry de urllib3 que cuenta cada reintento en las métricas"""
+
+    def increment(self, *args, **kwargs):
+        contar('spotify_reintentos')
+        return super().increment(*args, **kwargs)
+
+
+class SesionInstrumentada(requests.Session):
+    """Sesión de requests que mide la latencia y cuenta los errores de cada endpoint"""
+
+    def request(self, method, url, *args, **kwargs):
+        endpoint = nombre_endpoint(url)
+        with cronometrar(f"spotify_{endpoint}"):
+            try:
+                respuesta = super().request(method, url, *args, **kwargs)
+            except requests.RequestException:
+                contar(f"spotify_{endpoint}_errores")
+                raise
+        if respuesta.status_code >= 400:
+            contar(f"spotify_{endpoint}_errores")
+        return respuesta
+
+
+class CacheTokenArchivo(CacheFileHandler):
+    """CacheFileHandler que escribe el token de forma atómica (varios procesos lo comparten)"""
+
+    def save_token_to_cache(self, token_info):
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        ruta_tmp = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(token_info, f, cls=self.encoder_cls)
+        os.chmod(ruta_tmp, 0o600)
+        os.replace(ruta_tmp, self.cache_path)
+
+
+def crear_sesion(tamano_pool=SPOTIFY_POOL_CONEXIONES, reintentos=SPOTIFY_REINTENTOS, backoff=SPOTIFY_BACKOFF,
+                 jitter=SPOTIFY_BACKOFF_JITTER):
+    """
+    Sesión HTTP con pool de conexiones keep-alive y reintentos de GET
+
+    Args:
+        tamano_pool: Conexiones reutilizables por host (al menos una por hilo)
+        reintentos: Reintentos ante errores de red y respuestas 5xx
+        backoff: Espera base en segundos (se duplica en cada reintento)
+        jitter: Segundos aleatorios añadidos a cada espera
+
+    Returns:
+        SesionInstrumentada
+    """
+    reintento = _ReintentoContado(
+        total=reintentos, backoff_factor=backoff, backoff_jitter=jitter,
+        status_forcelist=(500, 502, 503, 504), allowed_methods=frozenset({'GET'}),
+        respect_retry_after_header=False,  # Los 429 los gestiona el token bucket del crawler
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(pool_connections=tamano_pool, pool_maxsize=tamano_pool, max_retries=reintento)
+    sesion = SesionInstrumentada()
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    return sesion
+
+
+def crear_cliente(client_id=None, client_secret=None, auth=None, prefijo=None, sesion=None,
+                  timeout=SPOTIFY_TIMEOUT, ruta_token=RUTA_TOKEN_SPOTIFY):
+    """
+    Crea un cliente spotipy sobre una sesión con pool, reintentos y métricas
+
+    Args:
+        client_id: ID de la aplicación (por defecto SPOTIFY_CLIENT_ID del entorno / .env)
+        client_secret: Secreto de la aplicación (por defecto SPOTIFY_CLIENT_SECRET)
+        auth: Token fijo; si se indica no se usan credenciales (servidor falso)
+        prefijo: URL base de la API (por defecto la de Spotify)
+        sesion: Sesión HTTP (se crea una con crear_sesion si es None)
+        timeout: Segundos (conexión, lectura) de cada petición
+        ruta_token: Archivo donde se comparte el token client-credentials
+
+    Returns:
+        spotipy.Spotify
+    """
+    sesion = sesion or crear_sesion()
+    if auth is not None:
+        cliente = spotipy.Spotify(auth=auth, requests_session=sesion, requests_timeout=timeout)
+    else:
+        load_dotenv()
+        credenciales = SpotifyClientCredentials(
+            client_id=client_id or os.getenv('SPOTIFY_CLIENT_ID'),
+            client_secret=client_secret or os.getenv('SPOTIFY_CLIENT_SECRET'),
+            requests_session=sesion, requests_timeout=timeout,
+            cache_handler=CacheTokenArchivo(cache_path=ruta_token),
+        )
+        cliente = spotipy.Spotify(auth_manager=credenciales, requests_session=sesion, requests_timeout=timeout)
+    if prefijo is not None:
+        cliente.prefix = prefijo
+    return cliente
+
+
+def obtener_cliente():
+    """Cliente compartido del proceso (se crea en el primer uso)"""
+    global _cliente
+    with _lock:
+        if _cliente is None:
+            _cliente = crear_cliente()
+        return _cliente
+
+
+def fijar_cliente(cliente):
+    """
+    Sustituye el cliente compartido (None = volver a crearlo en el próximo uso)
+
+    Returns:
+        El cliente anterior
+    """
+    global _cliente
+    with _lock:
+        anterior, _cliente = _cliente, cliente
+    return anterior
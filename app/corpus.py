@@ -0,0 +1,201 @@
+"""
+Formato compacto del corpus de playlists tokenizadas.
+
+Un corpus es una carpeta con:
+    tokens.i32    Todos los tokens de todas las playlists, int32 contiguos
+    offsets.npy   int64 de tamaño n+1: la playlist i es tokens[offsets[i]:offsets[i+1]]
+    ids.npy       ID de Spotify de cada playlist (para actualizaciones incrementales)
+    corpus.txt    (opcional) Una playlist por línea, tokens separados por espacios:
+                  el formato corpus_file de gensim (ver entrenamiento.py)
+
+Los tokens se leen con memory-map, así que entrenar no requiere cargar el corpus
+en objetos de Python: solo la playlist que se está iterando.
+"""
+import hashlib
+import os
+import shutil
+import numpy as np
+from settings import RUTA_CORPUS
+
+ARCHIVO_TOKENS = 'tokens.i32'
+ARCHIVO_OFFSETS = 'offsets.npy'
+ARCHIVO_IDS = 'ids.npy'
+ARCHIVO_LINEAS = 'corpus.txt'
+PLAYLISTS_POR_ESCRITURA = 10_000
+
+
+class EscritorCorpus:
+    """
+    Escribe playlists tokenizadas en streaming al formato compacto
+
+    Args:
+        ruta: Carpeta del corpus
+        reanudar_hasta: Si no es None, conserva las primeras N playlists ya
+            guardadas (con guardar) y sigue escribiendo a continuación
+    """
+
+    def __init__(self, ruta=RUTA_CORPUS, reanudar_hasta=None):
+        self.ruta = ruta
+        os.makedirs(ruta, exist_ok=True)
+        self._offsets = [0]
+        self._ids = []
+
+        ruta_tokens = os.path.join(ruta, ARCHIVO_TOKENS)
+        if reanudar_hasta and os.path.exists(os.path.join(ruta, ARCHIVO_OFFSETS)):
+            offsets = np.load(os.path.join(ruta, ARCHIVO_OFFSETS))
+            ids = np.load(os.path.join(ruta, ARCHIVO_IDS))
+            self._offsets = offsets[:reanudar_hasta + 1].tolist()
+            self._ids = ids[:reanudar_hasta].tolist()
+            self._archivo = open(ruta_tokens, 'r+b')
+            self._archivo.truncate(self._offsets[-1] * 4)
+            self._archivo.seek(0, os.SEEK_END)
+        else:
+            self._archivo = open(ruta_tokens, 'wb')
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def agregar(self, tokens, playlist_id=''):
+        """Agrega una playlist (lista o array de tokens) al final del corpus"""
+        tokens = np.asarray(tokens, dtype=np.int32)
+        self._archivo.write(tokens.tobytes())
+        self._offsets.append(self._offsets[-1] + len(tokens))
+        self._ids.append(playlist_id or '')
+
+    def guardar(self):
+        """Vuelca a disco tokens, offsets e ids (estado consistente para checkpoints)"""
+        self._archivo.flush()
+        np.save(os.path.join(self.ruta, ARCHIVO_OFFSETS), np.asarray(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self.ruta, ARCHIVO_IDS), np.asarray(self._ids, dtype=str))
+
+    def cerrar(self):
+        if not self._archivo.closed:
+            self.guardar()
+            self._archivo.close()
+
+
+class CorpusPlaylists:
+    """
+    Corpus compacto con memory-map. Es un iterable reiniciable que devuelve
+    cada playlist como lista de tokens, por lo que se puede pasar
+    directamente a Word2Vec.
+    """
+
+    def __init__(self, ruta=RUTA_CORPUS):
+        self.ruta = ruta
+        ruta_tokens = os.path.join(ruta, ARCHIVO_TOKENS)
+        if os.path.getsize(ruta_tokens) > 0:
+            self.tokens = np.memmap(ruta_tokens, dtype=np.int32, mode='r')
+        else:
+            self.tokens = np.zeros(0, dtype=np.int32)
+        self.offsets = np.load(os.path.join(ruta, ARCHIVO_OFFSETS), mmap_mode='r')
+        self.ids = np.load(os.path.join(ruta, ARCHIVO_IDS))
+
+    @staticmethod
+    def existe(ruta=RUTA_CORPUS):
+        return os.path.exists(os.path.join(ruta, ARCHIVO_OFFSETS))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def num_tokens(self):
+        return int(self.offsets[-1])
+
+    def playlist(self, i):
+        """Tokens de la playlist i como vista int32 sobre el memory-map (sin copiar)"""
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, i):
+        return self.playlist(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.playlist(i).tolist()
+
+    def huellas(self):
+        """
+        Huella de 64 bits del contenido de cada playlist (blake2b de sus tokens).
+        Una playlist nueva o modificada tiene una huella que no estaba en el
+        corpus anterior
+
+        Returns:
+            Array uint64 (n,)
+        """
+        return np.fromiter(
+            (int.from_bytes(hashlib.blake2b(self.playlist(i).tobytes(), digest_size=8).digest(), 'little')
+             for i in range(len(self))),
+            dtype=np.uint64, count=len(self),
+        )
+
+    def exportar_lineas(self, ruta=None):
+        """
+        Escribe el corpus en el formato de líneas de gensim (corpus_file). Si
+        el archivo ya existe y es más reciente que los tokens, se reutiliza
+
+        Args:
+            ruta: Archivo de destino (por defecto corpus.txt dentro del corpus)
+
+        Returns:
+            Ruta del archivo
+        """
+        ruta = ruta or os.path.join(self.ruta, ARCHIVO_LINEAS)
+        ruta_tokens = os.path.join(self.ruta, ARCHIVO_TOKENS)
+        if os.path.exists(ruta) and os.path.getmtime(ruta) >= os.path.getmtime(ruta_tokens):
+            return ruta
+
+        ruta_tmp = f"{ruta}.tmp"
+        with open(ruta_tmp, 'w', encoding='ascii') as f:
+            for inicio in range(0, len(self), PLAYLISTS_POR_ESCRITURA):
+                lineas = (' '.join(map(str, self.playlist(i).tolist()))
+                          for i in range(inicio, min(inicio + PLAYLISTS_POR_ESCRITURA, len(self))))
+                f.write(''.join(f"{linea}\n" for linea in lineas if linea))
+        os.replace(ruta_tmp, ruta)
+        return ruta
+
+
+def escribir_subcorpus(corpus, indices, ruta):
+    """
+    Escribe en `ruta` las playlists `indices` de un corpus, en ese orden
+
+    Returns:
+        CorpusPlaylists del subcorpus
+    """
+    with EscritorCorpus(ruta) as escritor:
+        for i in np.asarray(indices).tolist():
+            escritor.agregar(corpus.playlist(i), corpus.ids[i])
+    return CorpusPlaylists(ruta)
+
+
+def combinar_corpus(destino, nuevo, anterior=None, ids_validos=None):
+    """
+    Escribe un corpus con las playlists de `nuevo` más las de `anterior` que no
+    fueron reemplazadas, copiando por bloques sin pasar por listas de Python
+
+    Args:
+        destino: Carpeta del corpus resultante (se reemplaza de forma atómica)
+        nuevo: CorpusPlaylists con las playlists tokenizadas en esta ejecución
+        anterior: CorpusPlaylists previo o None
+        ids_validos: Conjunto de IDs de `anterior` que se deben conservar
+    """
+    ruta_tmp = f"{destino}.nuevo"
+    ids_nuevos = set(nuevo.ids.tolist())
+
+    with EscritorCorpus(ruta_tmp) as escritor:
+        for fuente, filtrar in ((anterior, True), (nuevo, False)):
+            if fuente is None:
+                continue
+            for i, playlist_id in enumerate(fuente.ids.tolist()):
+                if filtrar and (playlist_id in ids_nuevos or (ids_validos is not None and playlist_id not in ids_validos)):
+                    continue
+                escritor.agregar(fuente.playlist(i), playlist_id)
+
+    if os.path.exists(destino):
+        shutil.rmtree(destino)
+    os.replace(ruta_tmp, destino)
@@ -0,0 +1,314 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import threading
+import time
+from spotipy.exceptions import SpotifyException
+from cache_playlists import clave_cache, clave_playlist, obtener_con_cache
+from cliente_spotify import obtener_cliente
+from metricas import cronometrar, contar
+from settings import (CRAWL_MAX_WORKERS, CRAWL_PETICIONES_POR_SEGUNDO, CRAWL_MAX_REINTENTOS, RUTA_GENEROS,
+                      OBJETIVO_PLAYLISTS_GENERO)
+
+TAMANO_PAGINA = 100  # Máximo de items por página que devuelve la API
+TAMANO_PAGINA_BUSQUEDA = 50  # Máximo de resultados por página de /search
+MAX_OFFSET_BUSQUEDA = 1000   # /search no devuelve resultados más allá de este offset
+
+
+class TokenBucket:
+    """
+    Limitador de peticiones compartido entre hilos.
+
+    Repone `tasa` fichas por segundo hasta `capacidad`. Cuando la API responde
+    429, `pausar` congela a todos los hilos durante el Retry-After indicado.
+    """
+
+    def __init__(self, tasa=CRAWL_PETICIONES_POR_SEGUNDO, capacidad=None):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad if capacidad is not None else max(1.0, tasa))
+        self._fichas = self.capacidad
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloquea hasta que haya una ficha disponible y la consume"""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                if ahora < self._pausa_hasta:
+                    espera = self._pausa_hasta - ahora
+                else:
+                    self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+                    self._ultimo = ahora
+                    if self._fichas >= 1:
+                        self._fichas -= 1
+                        return
+                    espera = (1 - self._fichas) / self.tasa
+            time.sleep(espera)
+
+    def pausar(self, segundos):
+        """Detiene todas las peticiones durante `segundos` (respuesta 429)"""
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+            self._fichas = 0.0
+            self._ultimo = self._pausa_hasta
+
+
+class EstadisticasCrawl:
+    """Contadores del crawl (peticiones, 429, páginas) con cálculo de req/s"""
+
+    def __init__(self):
+        self.peticiones = 0
+        self.respuestas_429 = 0
+        self.paginas = 0
+        self.inicio = time.perf_counter()
+        self.fin = None
+        self._lock = threading.Lock()
+
+    def registrar(self, campo):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def terminar(self):
+        self.fin = time.perf_counter()
+
+    @property
+    def duracion(self):
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    @property
+    def peticiones_por_segundo(self):
+        return self.peticiones / self.duracion if self.duracion > 0 else 0.0
+
+    def resumen(self):
+        return (f"{self.peticiones} peticiones en {self.duracion:.2f}s "
+                f"({self.peticiones_por_segundo:.1f} req/s, {self.respuestas_429} respuestas 429)")
+
+
+def _llamar_api(llamada, bucket, estadisticas, max_reintentos=CRAWL_MAX_REINTENTOS):
+    """Ejecuta una llamada a la API respetando el bucket y los 429 (Retry-After)"""
+    for intento in range(max_reintentos + 1):
+        bucket.adquirir()
+        estadisticas.registrar('peticiones')
+        contar('spotify_peticiones')
+        try:
+            with cronometrar('fetch'):
+                return llamada()
+        except SpotifyException as e:
+            if e.http_status != 429 or intento == max_reintentos:
+                raise
+            estadisticas.registrar('respuestas_429')
+            contar('spotify_respuestas_429')
+            retry_after = (e.headers or {}).get('Retry-After')
+            bucket.pausar(float(retry_after) if retry_after else 2 ** intento)
+
+
+def descargar_playlist_completa(sp, playlist_id, bucket, estadisticas):
+    """
+    Descarga todas las páginas de una playlist siguiendo el enlace `next`
+
+    Args:
+        sp: Cliente spotipy
+        playlist_id: ID de la playlist
+        bucket: TokenBucket compartido
+        estadisticas: EstadisticasCrawl compartidas
+
+    Returns:
+        Respuesta de la primera página con 'items' conteniendo todas las páginas
+    """
+    respuesta = _llamar_api(
+        lambda: sp.playlist_items(playlist_id, limit=TAMANO_PAGINA, additional_types=('track',)),
+        bucket, estadisticas,
+    )
+    if not respuesta:
+        return respuesta
+    estadisticas.registrar('paginas')
+
+    items = list(respuesta.get('items') or [])
+    pagina = respuesta
+    while pagina and pagina.get('next'):
+        pagina = _llamar_api(lambda p=pagina: sp.next(p), bucket, estadisticas)
+        if pagina:
+            estadisticas.registrar('paginas')
+            items.extend(pagina.get('items') or [])
+
+    respuesta['items'] = items
+    respuesta['next'] = None
+    return respuesta
+
+
+def descargar_playlists(playlists, sp=None, max_workers=CRAWL_MAX_WORKERS, bucket=None, usar_cache=True):
+    """
+    Descarga en paralelo todas las canciones de varias playlists
+
+    Args:
+        playlists: Lista de diccionarios con 'id' (y opcionalmente 'snapshot_id', 'name')
+        sp: Cliente spotipy (por defecto cliente_spotify.obtener_cliente())
+        max_workers: Número máximo de hilos simultáneos
+        bucket: TokenBucket compartido (se crea uno si es None)
+        usar_cache: Si es True, lee/escribe la caché en disco por snapshot
+
+    Returns:
+        Tupla (dict playlist_id -> lista de items, EstadisticasCrawl)
+    """
+    if sp is None:
+        sp = obtener_cliente()
+    bucket = bucket or TokenBucket()
+    estadisticas = EstadisticasCrawl()
+    tracks_por_playlist = {}
+
+    def descargar(playlist_info):
+        def descarga():
+            return descargar_playlist_completa(sp, playlist_info['id'], bucket, estadisticas)
+
+        if usar_cache:
+            tracks = obtener_con_cache(clave_playlist(playlist_info), descarga)
+        else:
+            tracks = descarga()
+        return tracks['items'] if tracks and 'items' in tracks else []
+
+    # Evitar descargar dos veces la misma playlist
+    unicas = {playlist_info['id']: playlist_info for playlist_info in playlists}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {executor.submit(descargar, info): info for info in unicas.values()}
+        for futuro in as_completed(futuros):
+            playlist_info = futuros[futuro]
+            try:
+                tracks_por_playlist[playlist_info['id']] = futuro.result()
+            except Exception as e:
+                print(f"✗ Error al obtener canciones de {playlist_info.get('name', playlist_info['id'])}: {e}")
+
+    estadisticas.terminar()
+    return tracks_por_playlist, estadisticas
+
+
+def cargar_generos(ruta=RUTA_GENEROS):
+    """
+    Géneros a descubrir desde el archivo de configuración
+
+    Args:
+        ruta: JSON con la forma {"generos": ["Rock", "Pop", ...]}
+
+    Returns:
+        Lista de géneros sin repetidos, en el orden del archivo
+    """
+    with open(ruta, 'r', encoding='utf-8') as f:
+        generos = json.load(f)['generos']
+    return list(dict.fromkeys(genero.strip() for genero in generos if genero.strip()))
+
+
+def buscar_playlists_genero(sp, genero, objetivo, bucket, estadisticas, refrescar=False, usar_cache=True):
+    """
+    Pagina /search con offset hasta reunir `objetivo` playlists cuyo nombre
+    contiene el género (o hasta que no haya más resultados)
+
+    Args:
+        sp: Cliente spotipy
+        genero: Género a buscar (la consulta es "Top <genero>")
+        objetivo: Playlists a reunir
+        bucket: TokenBucket compartido
+        estadisticas: EstadisticasCrawl compartidas
+        refrescar: Si es True, ignora la caché (para conocer los snapshots actuales)
+        usar_cache: Si es True, lee/escribe cada página en la caché en disco
+
+    Returns:
+        Lista de diccionarios con 'id', 'name', 'snapshot_id' y 'oficial'
+    """
+    consulta = f'Top {genero}'
+    encontradas = {}
+    offset = 0
+    while len(encontradas) < objetivo and offset < MAX_OFFSET_BUSQUEDA:
+        def buscar(offset=offset):
+            resultados = _llamar_api(
+                lambda: sp.search(q=consulta, type='playlist', limit=TAMANO_PAGINA_BUSQUEDA, offset=offset),
+                bucket, estadisticas
+            )
+            estadisticas.registrar('paginas')
+            return resultados
+
+        if usar_cache:
+            clave = clave_cache('search', consulta, TAMANO_PAGINA_BUSQUEDA, offset)
+            resultados = obtener_con_cache(clave, buscar, refrescar=refrescar)
+        else:
+            resultados = buscar()
+
+        pagina = (resultados or {}).get('playlists') or {}
+        items = pagina.get('items') or []
+        for playlist in items:
+            if playlist and genero.lower() in playlist['name'].lower() and playlist['id'] not in encontradas:
+                encontradas[playlist['id']] = {
+                    'id': playlist['id'],
+                    'name': playlist['name'],
+                    'snapshot_id': playlist.get('snapshot_id'),
+                    'oficial': 'spotify' in playlist['owner']['id'].lower(),
+                }
+                if len(encontradas) >= objetivo:
+                    break
+        if not items or not pagina.get('next'):
+            break
+        offset += TAMANO_PAGINA_BUSQUEDA
+    return list(encontradas.values())
+
+
+def deduplicar_playlists(playlists_generos):
+    """
+    Deja cada playlist en un único género: el primero (en el orden del
+    diccionario) en el que aparece
+
+    Returns:
+        Nuevo diccionario genero -> playlists
+    """
+    vistas = set()
+    unicas = {}
+    for genero, playlists in playlists_generos.items():
+        unicas[genero] = []
+        for playlist_info in playlists:
+            if playlist_info['id'] not in vistas:
+                vistas.add(playlist_info['id'])
+                unicas[genero].append(playlist_info)
+    return unicas
+
+
+def descubrir_playlists(generos, objetivo=OBJETIVO_PLAYLISTS_GENERO, sp=None, max_workers=CRAWL_MAX_WORKERS,
+                        bucket=None, refrescar=False, usar_cache=True):
+    """
+    Busca playlists de varios géneros en paralelo, paginando cada búsqueda con
+    offset, y elimina los ids repetidos entre géneros antes de descargar nada
+
+    Args:
+        generos: Lista de géneros (ver cargar_generos)
+        objetivo: Playlists por género
+        sp: Cliente spotipy (por defecto cliente_spotify.obtener_cliente())
+        max_workers: Número máximo de géneros buscándose a la vez
+        bucket: TokenBucket compartido (se crea uno si es None)
+        refrescar: Si es True, ignora la caché de búsquedas
+        usar_cache: Si es True, lee/escribe la caché en disco
+
+    Returns:
+        Tupla (dict genero -> playlists sin repetidos, EstadisticasCrawl);
+        cada playlist queda en el primer género de la lista que la encontró
+    """
+    if sp is None:
+        sp = obtener_cliente()
+    bucket = bucket or TokenBucket()
+    estadisticas = EstadisticasCrawl()
+    encontradas = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(generos)))) as executor:
+        futuros = {
+            executor.submit(buscar_playlists_genero, sp, genero, objetivo, bucket, estadisticas,
+                            refrescar, usar_cache): genero
+            for genero in generos
+        }
+        for futuro in as_completed(futuros):
+            genero = futuros[futuro]
+            try:
+                encontradas[genero] = futuro.result()
+            except Exception as e:
+                print(f"✗ Error buscando playlists de {genero}: {e}")
+
+    estadisticas.terminar()
+    # Orden de la configuración (no el de llegada) para que la deduplicación sea determinista
+    encontradas = {genero: encontradas[genero] for genero in generos if genero in encontradas}
+    return deduplicar_playlists(encontradas), estadisticas
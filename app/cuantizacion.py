@@ -0,0 +1,293 @@
+"""
+Embeddings cuantizados para búsqueda con menos memoria.
+
+Con vector_size = 128 cada canción ocupa 512 bytes en float32. Aquí se
+guardan códigos compactos y se busca con distancia asimétrica (la consulta
+sigue en float32, solo la base está cuantizada):
+
+    IndiceInt8   Cuantización escalar por dimensión a int8 (d bytes, 4x menos)
+    IndicePQ     Cuantización de producto: m subespacios con 256 centroides
+                 cada uno (m bytes por vector: 32x menos con d=128 y m=16)
+
+Los `reordenar` mejores candidatos se vuelven a puntuar con los vectores
+float32 exactos. Esos vectores se leen del memory-map de Embeddings, así que
+solo se tocan las filas de los candidatos y la matriz completa no tiene que
+estar en RAM.
+
+Ambos implementan la interfaz de IndiceANN, así que se construyen, guardan y
+cargan igual que IVF/HNSW (settings.INDICE_ANN = 'int8' o 'pq').
+
+Uso:
+    python app/cuantizacion.py                 # Reporte calidad / tamaño
+    python app/indices_ann.py --tipo pq --m 16 # Construir y guardar el índice
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from indices_ann import IndiceANN, kmeans, asignar, top_k, busqueda_exacta, evaluar_recall, TAM_BLOQUE
+from settings import RUTA_EMBEDDINGS, RUTA_REPORTE_CUANTIZACION, PARAMS_ANN
+
+TAM_BLOQUE_ESCANEO = 4096  # Filas por bloque al escanear códigos (caben en caché)
+
+
+class IndiceCuantizado(IndiceANN):
+    """
+    Base de los índices cuantizados: escaneo aproximado + reordenado exacto
+
+    Args:
+        vectores: Matriz (n, d) de vectores normalizados (puede ser memory-map)
+        reordenar: Candidatos que se reordenan con los vectores exactos (0 = ninguno)
+    """
+    barrido = ('reordenar', (0, 20, 50, 100, 200))
+
+    def __init__(self, vectores, reordenar=50):
+        super().__init__(vectores)
+        self.reordenar = reordenar
+        self.codigos = None
+
+    def _preparar(self, consulta):
+        """Precalcula lo que necesita _puntuar para una consulta (una vez por búsqueda)"""
+        raise NotImplementedError
+
+    def _puntuar(self, preparada, inicio, fin):
+        """Scores aproximados de las filas [inicio, fin)"""
+        raise NotImplementedError
+
+    def bytes_totales(self):
+        """Memoria necesaria para escanear: códigos + escalas o libros de códigos"""
+        raise NotImplementedError
+
+    def buscar(self, consulta, k, reordenar=None):
+        consulta = np.asarray(consulta, dtype=np.float32)
+        reordenar = self.reordenar if reordenar is None else reordenar
+        n_candidatos = max(k, reordenar)
+
+        n = len(self.vectores)
+        preparada = self._preparar(consulta)
+        scores = np.empty(n, dtype=np.float32)
+        for inicio in range(0, n, TAM_BLOQUE_ESCANEO):
+            fin = min(inicio + TAM_BLOQUE_ESCANEO, n)
+            scores[inicio:fin] = self._puntuar(preparada, inicio, fin)
+        candidatos = top_k(scores, n_candidatos)
+
+        if reordenar > 0:
+            # Reordenado exacto: solo se leen las filas candidatas del memory-map
+            filas = np.sort(candidatos)
+            exactos = np.asarray(self.vectores[filas], dtype=np.float32) @ consulta
+            mejores = top_k(exactos, k)
+            return filas[mejores], exactos[mejores]
+
+        candidatos = candidatos[:k]
+        return candidatos, scores[candidatos]
+
+
+class IndiceInt8(IndiceCuantizado):
+    """
+    Cuantización escalar simétrica a int8 con una escala por dimensión
+
+    Args:
+        vectores: Matriz (n, d) de vectores normalizados
+        reordenar: Candidatos que se reordenan con los vectores exactos
+    """
+    tipo = 'int8'
+
+    def __init__(self, vectores, reordenar=50):
+        super().__init__(vectores, reordenar)
+        self.escalas = None
+
+    def construir(self):
+        d = self.vectores.shape[1]
+        maximos = np.zeros(d, dtype=np.float32)
+        for inicio in range(0, len(self.vectores), TAM_BLOQUE):
+            bloque = np.abs(np.asarray(self.vectores[inicio:inicio + TAM_BLOQUE], dtype=np.float32))
+            np.maximum(maximos, bloque.max(axis=0, initial=0), out=maximos)
+        self.escalas = np.maximum(maximos, 1e-12) / 127
+
+        self.codigos = np.empty(self.vectores.shape, dtype=np.int8)
+        for inicio in range(0, len(self.vectores), TAM_BLOQUE):
+            bloque = np.asarray(self.vectores[inicio:inicio + TAM_BLOQUE], dtype=np.float32)
+            self.codigos[inicio:inicio + len(bloque)] = np.clip(np.rint(bloque / self.escalas), -127, 127)
+        return self
+
+    def _preparar(self, consulta):
+        # q · (c · s) = (q · s) · c: la escala se aplica a la consulta, no a la base
+        return consulta * self.escalas
+
+    def _puntuar(self, consulta_escalada, inicio, fin):
+        return self.codigos[inicio:fin].astype(np.float32) @ consulta_escalada
+
+    def bytes_totales(self):
+        return int(self.codigos.nbytes + self.escalas.nbytes)
+
+    def parametros(self):
+        return {'reordenar': self.reordenar}
+
+    def _guardar_arrays(self, ruta):
+        np.save(os.path.join(ruta, 'codigos.npy'), self.codigos)
+        np.save(os.path.join(ruta, 'escalas.npy'), self.escalas)
+
+    @classmethod
+    def cargar(cls, ruta, vectores, parametros):
+        indice = cls(vectores, **parametros)
+        indice.codigos = np.load(os.path.join(ruta, 'codigos.npy'), mmap_mode='r')
+        indice.escalas = np.load(os.path.join(ruta, 'escalas.npy'))
+        return indice
+
+
+class IndicePQ(IndiceCuantizado):
+    """
+    Cuantización de producto (PQ) con búsqueda por tabla de distancias (ADC)
+
+    Args:
+        vectores: Matriz (n, d) de vectores normalizados
+        m: Número de subespacios (d debe ser múltiplo de m); bytes por vector
+        k_sub: Centroides por subespacio (máximo 256, un byte por código)
+        reordenar: Candidatos que se reordenan con los vectores exactos
+        semilla: Semilla de los k-means
+    """
+    tipo = 'pq'
+
+    def __init__(self, vectores, m=16, k_sub=256, reordenar=100, semilla=42):
+        super().__init__(vectores, reordenar)
+        if vectores.shape[1] % m != 0:
+            raise ValueError(f"La dimensión {vectores.shape[1]} no es múltiplo de m={m}")
+        if not 1 <= k_sub <= 256:
+            raise ValueError(f"k_sub debe estar entre 1 y 256 (recibido {k_sub})")
+        self.m = m
+        self.k_sub = k_sub
+        self.semilla = semilla
+        self.libros = None  # (m, k_sub, d/m): centroides de cada subespacio
+
+    def construir(self):
+        n, d = self.vectores.shape
+        d_sub = d // self.m
+        # Cada libro de códigos se entrena con una muestra (64 puntos por centroide)
+        rng = np.random.default_rng(self.semilla)
+        muestra = np.asarray(
+            self.vectores[np.sort(rng.choice(n, min(n, self.k_sub * 64), replace=False))], dtype=np.float32
+        )
+        k_sub = min(self.k_sub, len(muestra))
+        self.libros = np.stack([
+            kmeans(muestra[:, j * d_sub:(j + 1) * d_sub], k_sub, esferico=False, semilla=self.semilla + j)
+            for j in range(self.m)
+        ])
+
+        # Códigos por subespacio (m, n): cada fila es contigua, lo que acelera el escaneo
+        self.codigos = np.empty((self.m, n), dtype=np.uint8)
+        for j in range(self.m):
+            self.codigos[j] = asignar(self.vectores[:, j * d_sub:(j + 1) * d_sub], self.libros[j], esferico=False)
+        return self
+
+    def _preparar(self, consulta):
+        # Tabla ADC: producto punto de cada subvector de la consulta con cada centroide (m, k_sub)
+        return np.einsum('jkd,jd->jk', self.libros, consulta.reshape(self.m, -1))
+
+    def _puntuar(self, tabla, inicio, fin):
+        scores = np.zeros(fin - inicio, dtype=np.float32)
+        for j in range(self.m):
+            scores += tabla[j].take(self.codigos[j, inicio:fin])
+        return scores
+
+    def bytes_totales(self):
+        return int(self.codigos.nbytes + self.libros.nbytes)
+
+    def parametros(self):
+        return {'m': self.m, 'k_sub': self.k_sub, 'reordenar': self.reordenar, 'semilla': self.semilla}
+
+    def _guardar_arrays(self, ruta):
+        np.save(os.path.join(ruta, 'codigos.npy'), self.codigos)
+        np.save(os.path.join(ruta, 'libros.npy'), self.libros)
+
+    @classmethod
+    def cargar(cls, ruta, vectores, parametros):
+        indice = cls(vectores, **parametros)
+        indice.codigos = np.load(os.path.join(ruta, 'codigos.npy'), mmap_mode='r')
+        indice.libros = np.load(os.path.join(ruta, 'libros.npy'))
+        return indice
+
+
+class _Exacta:
+    """Búsqueda exacta en float32 con la interfaz de un índice (referencia del reporte)"""
+
+    def __init__(self, vectores):
+        self.vectores = vectores
+
+    def buscar(self, consulta, k):
+        return busqueda_exacta(self.vectores, consulta, k)
+
+
+def reporte_cuantizacion(vectores, ruta=RUTA_REPORTE_CUANTIZACION, k=10, n_consultas=200,
+                         params_int8=None, params_pq=None):
+    """
+    Compara float32, int8 y PQ (con y sin reordenado) en tamaño, recall@k y latencia
+
+    Args:
+        vectores: Matriz de vectores normalizados
+        ruta: Archivo JSON donde se guarda el reporte (None = no guardar)
+        k: k del recall@k
+        n_consultas: Consultas aleatorias por configuración
+        params_int8: Parámetros de IndiceInt8 (por defecto settings.PARAMS_ANN['int8'])
+        params_pq: Parámetros de IndicePQ (por defecto settings.PARAMS_ANN['pq'])
+
+    Returns:
+        Lista de diccionarios, una fila por configuración
+    """
+    params_int8 = {**PARAMS_ANN['int8'], **(params_int8 or {})}
+    params_pq = {**PARAMS_ANN['pq'], **(params_pq or {})}
+    n, d = vectores.shape
+    bytes_float = n * d * 4
+    print(f"\n=== REPORTE DE CUANTIZACIÓN ({n} vectores, d={d}) ===\n")
+
+    filas = []
+
+    def medir(nombre, indice, bytes_totales, **busqueda):
+        resultado = evaluar_recall(indice, vectores, k=k, n_consultas=n_consultas, **busqueda)
+        filas.append({
+            'metodo': nombre,
+            'bytes_por_vector': bytes_totales / max(n, 1),
+            'mb_totales': bytes_totales / 1e6,
+            'compresion': bytes_float / bytes_totales,
+            'recall': resultado['recall'],
+            'latencia_ms': resultado['latencia_ann_ms'],
+            'latencia_exacta_ms': resultado['latencia_exacta_ms'],
+            'busqueda': busqueda,
+        })
+
+    medir('float32', _Exacta(vectores), bytes_float)
+    for clase, params in ((IndiceInt8, params_int8), (IndicePQ, params_pq)):
+        inicio = time.perf_counter()
+        indice = clase(vectores, **params).construir()
+        print(f"✓ {clase.tipo} construido en {time.perf_counter() - inicio:.1f}s con {indice.parametros()}")
+        medir(f"{clase.tipo} (sin reordenar)", indice, indice.bytes_totales(), reordenar=0)
+        medir(f"{clase.tipo} + reordenar {indice.reordenar}", indice, indice.bytes_totales())
+
+    print(f"\n{'método':<26} {'B/vector':>9} {'MB':>9} {'compresión':>11} "
+          f"{'recall@' + str(k):>10} {'ms/consulta':>12}")
+    for fila in filas:
+        print(f"{fila['metodo']:<26} {fila['bytes_por_vector']:>9.1f} {fila['mb_totales']:>9.2f} "
+              f"{fila['compresion']:>10.1f}x {fila['recall']:>10.3f} {fila['latencia_ms']:>12.3f}")
+    print("\n(El reordenado lee solo las filas candidatas del memory-map float32)")
+
+    if ruta:
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'num_vectores': n, 'vector_size': d, 'k': k, 'filas': filas}, f, indent=2)
+        print(f"✓ Reporte guardado en: {ruta}")
+    return filas
+
+
+if __name__ == '__main__':
+    from embeddings import Embeddings
+
+    parser = argparse.ArgumentParser(description='Reporte calidad / tamaño de los embeddings cuantizados')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--m', type=int, help='Subespacios de PQ')
+    args = parser.parse_args()
+
+    reporte_cuantizacion(
+        Embeddings(RUTA_EMBEDDINGS).vectores, k=args.k, n_consultas=args.consultas,
+        params_pq={'m': args.m} if args.m else None,
+    )
@@ -1,185 +1,216 @@
-from autentication import sp
+import argparse
+import os
+import shutil
+import numpy as np
 import pandas as pd
-from utils import buscar_playlist_genero, limpiar_parentesis
-import pickle
-
-# Lista de géneros musicales
-generos = [
-    'Reggaeton', 
-    'Rock', 'Pop', 'Rap', 'Metal', 'Salsa', 'Cumbia', 
-    'Norteña', 'Popular', 'Vallenato', 'House', 'Electronica', 'Indie'
-]
-
-# Buscar playlists dinámicamente por género
-print("=== BUSCANDO PLAYLISTS POR GÉNERO ===\n")
-playlists_generos = {}
-
-for genero in generos:
-    playlists = buscar_playlist_genero(genero, limite=20)
-    if playlists:
-        playlists_generos[genero] = playlists
-        print(f"✓ {genero}: {len(playlists)} playlists encontradas\n")
+from crawler import cargar_generos, descubrir_playlists, deduplicar_playlists, descargar_playlists
+from normalizacion import SEPARADOR_ARTISTAS, aplanar_tracks, normalizar_canciones
+from tokenizer_songs import (
+    estado_vacio, cargar_estado, guardar_estado, guardar_checkpoint, borrar_checkpoint,
+    playlists_pendientes, tokenizar_lote
+)
+from corpus import EscritorCorpus, CorpusPlaylists, combinar_corpus
+from catalogo import Catalogo, escribir_catalogo
+from busqueda import cargar_indice_busqueda
+from metricas import cronometrar, imprimir_resumen, servir_metricas
+from settings import (RUTA_CHECKPOINT_TOKENIZACION, CHECKPOINT_CADA, RUTA_CORPUS, RUTA_CATALOGO,
+                      VERBOSIDAD_EXTRACCION, RUTA_GENEROS, OBJETIVO_PLAYLISTS_GENERO)
+
+parser = argparse.ArgumentParser(description='Extrae y tokeniza canciones de playlists de Spotify')
+parser.add_argument(
+    '--incremental', action='store_true',
+    help='Reutiliza los datos guardados y solo descarga las playlists cuyo snapshot cambió'
+)
+parser.add_argument(
+    '--metricas-puerto', type=int, default=None,
+    help='Expone /metrics (formato Prometheus) en este puerto mientras dura la extracción'
+)
+parser.add_argument(
+    '--generos', default=RUTA_GENEROS,
+    help='Archivo JSON con la lista de géneros a buscar ({"generos": [...]})'
+)
+parser.add_argument(
+    '--objetivo', type=int, default=OBJETIVO_PLAYLISTS_GENERO,
+    help='Playlists a descubrir por género (la búsqueda se pagina hasta alcanzarlo)'
+)
+parser.add_argument(
+    '--verbosidad', type=int, choices=(0, 1, 2), default=VERBOSIDAD_EXTRACCION,
+    help='0 = solo resúmenes, 1 = una línea por playlist, 2 = una línea por canción'
+)
+args = parser.parse_args()
+if args.metricas_puerto is not None:
+    servir_metricas(args.metricas_puerto)
+
+# Un checkpoint pendiente tiene prioridad: reanuda un crawl interrumpido
+estado = cargar_estado(RUTA_CHECKPOINT_TOKENIZACION)
+if estado is not None:
+    print("↻ Reanudando crawl desde el último checkpoint\n")
+elif args.incremental:
+    estado = cargar_estado() or estado_vacio()
+else:
+    estado = estado_vacio()
+
+# Géneros desde el archivo de configuración; las búsquedas van en paralelo y cada una se
+# pagina con offset hasta el objetivo por género
+generos = cargar_generos(args.generos)
+print(f"=== BUSCANDO PLAYLISTS POR GÉNERO ({len(generos)} géneros, objetivo {args.objetivo}) ===\n")
+with cronometrar('descubrimiento'):
+    # En modo incremental la búsqueda se refresca para conocer los snapshots actuales
+    playlists_generos, estadisticas_busqueda = descubrir_playlists(
+        generos, args.objetivo, refrescar=args.incremental
+    )
+for genero, playlists in playlists_generos.items():
+    if args.verbosidad >= 2:
+        for playlist_info in playlists:
+            tipo = "oficial" if playlist_info.get('oficial') else "popular"
+            print(f"  ✓ Playlist {tipo}: {playlist_info['name']} - ID: {playlist_info['id']}")
+    print(f"✓ {genero}: {len(playlists)} playlists encontradas")
+print(f"\n✓ Búsqueda: {estadisticas_busqueda.resumen()}")
+
+# Conservar las playlists descubiertas en ejecuciones anteriores
+for genero, playlists in estado['playlists_generos'].items():
+    conocidas = {playlist_info['id'] for playlist_info in playlists_generos.get(genero, [])}
+    playlists_generos.setdefault(genero, []).extend(
+        playlist_info for playlist_info in playlists if playlist_info['id'] not in conocidas
+    )
+# Cada playlist queda en un solo género antes de descargar canciones
+playlists_generos = deduplicar_playlists(playlists_generos)
 
 total_playlists = sum(len(playlists) for playlists in playlists_generos.values())
 print(f"\n✓ Total de playlists encontradas: {total_playlists}\n")
 
-# Obtener tracks de las playlists por género
-all_tracks = []
-
+# Obtener tracks de las playlists por género: cada playlist se descarga una sola vez
+# (todas sus páginas, en paralelo); las pasadas siguientes leen de tracks_por_playlist
 print("\n=== OBTENIENDO CANCIONES DE PLAYLISTS POR GÉNERO ===\n")
-for genero, playlists in playlists_generos.items():
-    for playlist_info in playlists:
-        try:
-            print(f"Obteniendo canciones de {genero} ({playlist_info['name']})...")
-            tracks = sp.playlist_tracks(playlist_info['id'])
-            
-            if tracks and 'items' in tracks:
-                print(f"✓ {len(tracks['items'])} canciones obtenidas")
-                all_tracks.extend(tracks['items'])
-            else:
-                print(f"⚠ No se encontraron canciones")
-                
-        except Exception as e:
-            print(f"✗ Error al obtener canciones: {e}")
-
-print(f"\n✓ Total de canciones recopiladas: {len(all_tracks)}")
-
-# Extraer nombres de canciones por género
-print("\n=== EXTRAYENDO NOMBRES DE CANCIONES POR GÉNERO ===\n")
-playlists_canciones = {}
-
-for genero, playlists in playlists_generos.items():
-    nombres_canciones = []
-    for playlist_info in playlists:
-        try:
-            tracks = sp.playlist_tracks(playlist_info['id'])
-            
-            if tracks and 'items' in tracks:
-                # Extraer solo los nombres de las canciones
-                for item in tracks['items']:
-                    if item and item['track']:
-                        nombre_cancion = item['track']['name']
-                        nombres_canciones.append(nombre_cancion)
-                
-        except Exception as e:
-            print(f"✗ Error procesando playlist {playlist_info['name']}: {e}")
-    
-    if nombres_canciones:
-        playlists_canciones[genero] = nombres_canciones
-        print(f"✓ {genero}: {len(nombres_canciones)} canciones totales")
-
-# Mostrar las canciones de cada género
-print("\n=== LISTAS DE CANCIONES POR GÉNERO ===\n")
-for genero, canciones in playlists_canciones.items():
-    print(f"\n{genero}:")
-    print("-" * 50)
-    for idx, cancion in enumerate(canciones, 1):
-        print(f"{idx}. {cancion}")
-    print()
-
-# Crear DataFrame con todas las canciones
+todas_las_playlists = [playlist_info for playlists in playlists_generos.values() for playlist_info in playlists]
+pendientes = playlists_pendientes(estado, todas_las_playlists)
+print(f"✓ Playlists nuevas o modificadas: {len(pendientes)} (sin cambios: {len(todas_las_playlists) - len(pendientes)})\n")
+tracks_por_playlist, estadisticas_crawl = descargar_playlists(pendientes)
+
+# Normalización por columnas: todas las playlists descargadas se aplanan de una vez
+# (una playlist repetida en varios géneros aparece una vez por género, como en el CSV)
+pares_descargados = [(genero, playlist_info) for genero, playlists in playlists_generos.items()
+                     for playlist_info in playlists if playlist_info['id'] in tracks_por_playlist]
+with cronometrar('normalizar'):
+    tracks, bloques_invalidos = aplanar_tracks(pares_descargados, tracks_por_playlist,
+                                               verbose=args.verbosidad >= 1)
+canciones_por_bloque = np.bincount(tracks['bloque'], minlength=len(pares_descargados))
+
+if args.verbosidad >= 1:
+    for bloque, ((genero, playlist_info), n_canciones) in enumerate(zip(pares_descargados, canciones_por_bloque)):
+        if bloque in bloques_invalidos:
+            continue
+        if n_canciones:
+            print(f"✓ {genero} ({playlist_info['name']}): {n_canciones} canciones obtenidas")
+        else:
+            print(f"⚠ {genero} ({playlist_info['name']}): No se encontraron canciones")
+
+print(f"\n✓ Crawl: {estadisticas_crawl.resumen()}")
+print(f"\n✓ Total de canciones recopiladas: {len(tracks)}")
+
+print("\n=== CANCIONES POR GÉNERO ===\n")
+for genero, n_canciones in tracks.groupby('genero', sort=False).size().items():
+    print(f"✓ {genero}: {n_canciones} canciones totales")
+
+# Listado completo de canciones por género (solo con --verbosidad 2)
+if args.verbosidad >= 2:
+    print("\n=== LISTAS DE CANCIONES POR GÉNERO ===\n")
+    for genero, nombres in tracks.groupby('genero', sort=False)['nombre']:
+        print(f"\n{genero}:")
+        print("-" * 50)
+        print('\n'.join(f"{idx}. {cancion}" for idx, cancion in enumerate(nombres, 1)))
+        print()
+
+# Crear DataFrame con todas las canciones (nombres sin paréntesis, en formato título)
 print("\n=== CREANDO DATAFRAME CON TODAS LAS CANCIONES ===\n")
-datos_canciones = []
-for genero, playlists in playlists_generos.items():
-    for playlist_info in playlists:
-        try:
-            tracks = sp.playlist_tracks(playlist_info['id'])
-            
-            if tracks and 'items' in tracks:
-                for item in tracks['items']:
-                    if item and item['track']:
-                        track = item['track']
-                        
-                        # Limpiar nombres de paréntesis
-                        nombre_cancion = limpiar_parentesis(track['name'])
-                        nombre_artistas = ', '.join([limpiar_parentesis(artist['name'].title()) for artist in track['artists']])
-                        
-                        datos_canciones.append({
-                            'genero': genero,
-                            'playlist': playlist_info['name'].title(),
-                            'cancion': nombre_cancion.title(),
-                            'artista': nombre_artistas,
-                            'popularidad': track['popularity'],
-                            'id': track['id']
-                        })
-        except Exception as e:
-            print(f"✗ Error procesando playlist {playlist_info['name']}: {e}")
-
-df_canciones = pd.DataFrame(datos_canciones)
+with cronometrar('normalizar'):
+    df_canciones = normalizar_canciones(tracks)
+
+# En modo incremental se reemplazan solo las filas de las playlists descargadas de nuevo
+csv_filename = 'data/canciones_playlists_generos.csv'
+if args.incremental and os.path.exists(csv_filename):
+    df_anterior = pd.read_csv(csv_filename, encoding='utf-8')
+    if 'playlist_id' in df_anterior.columns:
+        df_anterior = df_anterior[~df_anterior['playlist_id'].isin(tracks_por_playlist)]
+    df_canciones = pd.concat([df_anterior, df_canciones], ignore_index=True)
 print(f"✓ DataFrame creado con {len(df_canciones)} canciones")
-print("\nMuestra de canciones:")
-print(df_canciones.sample(min(60, len(df_canciones))))
+if args.verbosidad >= 1:
+    print("\nMuestra de canciones:")
+    print(df_canciones.sample(min(60, len(df_canciones))))
 
 print("\n=== TOKENIZANDO CANCIONES ===\n")
 
-# Estructura principal: lista de listas (cada sublista es una playlist tokenizada)
-playlists_tokenizadas = []
-
-# Diccionario de mapeo: "cancion - artista" -> token_id
-canciones_a_tokens = {}
-
-# Diccionario inverso: token_id -> {'cancion': nombre, 'artista': artista}
-tokens_a_canciones = {}
-
-token = 0
-
-# Iterar sobre cada género y cada playlist individual
-for genero, playlists in playlists_generos.items():
-    print(f"\n--- Tokenizando playlists de {genero} ---")
-    
-    for playlist_info in playlists:
-        try:
-            # Obtener canciones de esta playlist específica
-            tracks = sp.playlist_tracks(playlist_info['id'])
-            
-            if tracks and 'items' in tracks:
-                tokens_playlist_actual = []
-                
-                print(f"\nPlaylist: {playlist_info['name']}")
-                
-                for item in tracks['items']:
-                    if item and item['track']:
-                        nombre_cancion = item['track']['name'].lower()
-                        # Obtener artistas (puede haber múltiples)
-                        artistas = ', '.join([artist['name'] for artist in item['track']['artists']])
-                        
-                        # Crear clave única: cancion + artista
-                        clave_unica = f"{nombre_cancion} - {artistas.lower()}"
-                        
-                        # Si la canción NO ha sido tokenizada, crear nuevo token
-                        if clave_unica not in canciones_a_tokens:
-                            token += 1
-                            canciones_a_tokens[clave_unica] = token
-                            tokens_a_canciones[token] = {
-                                'cancion': nombre_cancion,
-                                'artista': artistas
-                            }
-                            tokens_playlist_actual.append(token)
-                            print(f"  ✓ Nueva: '{nombre_cancion}' - {artistas} -> Token {token}")
-                        else:
-                            # Si ya existe, reutilizar el token existente
-                            token_existente = canciones_a_tokens[clave_unica]
-                            tokens_playlist_actual.append(token_existente)
-                            print(f"  ↻ Repetida: '{nombre_cancion}' - {artistas} -> Token {token_existente}")
-                
-                # Agregar esta playlist tokenizada a la lista principal
-                playlists_tokenizadas.append(tokens_playlist_actual)
-                print(f"  ✓ Playlist tokenizada: {len(tokens_playlist_actual)} canciones, {len(set(tokens_playlist_actual))} únicas")
-                
-        except Exception as e:
-            print(f"  ✗ Error tokenizando playlist {playlist_info['name']}: {e}")
+# Los tokens existentes se conservan: las canciones nuevas reciben los siguientes números.
+# Cada playlist se tokeniza una sola vez (con el primer género en el que aparece); las que tienen
+# items inválidos no se marcan como tokenizadas y se vuelven a descargar en la próxima ejecución
+canciones_a_tokens = estado['canciones_a_tokens']
+tokens_a_canciones = estado['tokens_a_canciones']
+bloques_tokenizar, vistas = [], set()
+for bloque, (_, playlist_info) in enumerate(pares_descargados):
+    if playlist_info['id'] not in vistas and bloque not in bloques_invalidos:
+        vistas.add(playlist_info['id'])
+        bloques_tokenizar.append(bloque)
+tracks_tokenizar = tracks[np.isin(tracks['bloque'].to_numpy(), bloques_tokenizar)]
+with cronometrar('tokenizar'):
+    tokens, es_nueva = tokenizar_lote(estado, tracks_tokenizar)
+print(f"✓ {len(tokens)} canciones tokenizadas, {int(es_nueva.sum())} nuevas")
+
+# Las playlists tokenizadas se escriben en streaming a un corpus parcial;
+# al reanudar se conservan las que ya estaban en el último checkpoint
+ruta_corpus_parcial = f"{RUTA_CORPUS}.parcial"
+escritor = EscritorCorpus(ruta_corpus_parcial, reanudar_hasta=estado['playlists_en_corpus_parcial'])
+
+inicio = 0
+for n_tokenizadas, bloque in enumerate(bloques_tokenizar, 1):
+    genero, playlist_info = pares_descargados[bloque]
+    fin = inicio + canciones_por_bloque[bloque]
+    tokens_playlist_actual = tokens[inicio:fin]
+    escritor.agregar(tokens_playlist_actual, playlist_info['id'])
+    estado['snapshots'][playlist_info['id']] = playlist_info.get('snapshot_id')
+
+    if args.verbosidad >= 2:
+        filas = tracks_tokenizar.iloc[inicio:fin]
+        for nombre, artistas, token, nueva in zip(filas['nombre'], filas['artistas'], tokens_playlist_actual,
+                                                  es_nueva[inicio:fin]):
+            artistas = artistas.replace(SEPARADOR_ARTISTAS, ', ')
+            print(f"  {'✓ Nueva' if nueva else '↻ Repetida'}: '{nombre.lower()}' - {artistas} -> Token {token}")
+    if args.verbosidad >= 1:
+        print(f"  ✓ {genero} ({playlist_info['name']}): {len(tokens_playlist_actual)} canciones, "
+              f"{len(np.unique(tokens_playlist_actual))} únicas")
+    inicio = fin
+
+    if n_tokenizadas % CHECKPOINT_CADA == 0:
+        escritor.guardar()
+        estado['playlists_en_corpus_parcial'] = len(escritor)
+        estado['playlists_generos'] = playlists_generos
+        guardar_checkpoint(estado)
+        if args.verbosidad >= 1:
+            print(f"  💾 Checkpoint guardado ({n_tokenizadas} playlists)")
+
+escritor.cerrar()
+
+# Corpus final: playlists nuevas o modificadas + playlists anteriores sin cambios
+corpus_anterior = CorpusPlaylists(RUTA_CORPUS) if CorpusPlaylists.existe(RUTA_CORPUS) else None
+combinar_corpus(
+    RUTA_CORPUS, CorpusPlaylists(ruta_corpus_parcial), corpus_anterior,
+    ids_validos=set(estado['snapshots'])
+)
+shutil.rmtree(ruta_corpus_parcial)
+
+# Estructura principal: corpus compacto (cada elemento es una playlist tokenizada)
+playlists_tokenizadas = CorpusPlaylists(RUTA_CORPUS)
 
 print(f"\n{'='*60}")
 print(f"✓ Total de playlists tokenizadas: {len(playlists_tokenizadas)}")
 print(f"✓ Total de canciones únicas: {len(canciones_a_tokens)}")
-print(f"✓ Total de tokens en todas las playlists: {sum(len(p) for p in playlists_tokenizadas)}")
+print(f"✓ Total de tokens en todas las playlists: {playlists_tokenizadas.num_tokens}")
 print(f"{'='*60}")
 
 # Mostrar ejemplos de uso
 print("\n=== EJEMPLOS DE USO ===\n")
 
 print("1. Primera playlist tokenizada (primeros 10 tokens):")
-print(f"   {playlists_tokenizadas[0][:10]}")
+print(f"   {playlists_tokenizadas[0][:10].tolist()}")
 
 print(f"\n2. Buscar canción y artista por token (ej: token {list(tokens_a_canciones.keys())[0]}):")
 primer_token = list(tokens_a_canciones.keys())[0]
@@ -193,24 +224,27 @@ ejemplo_clave = list(canciones_a_tokens.keys())[0]
 print(f"   '{ejemplo_clave}' -> Token {canciones_a_tokens[ejemplo_clave]}")
 
 print(f"\n4. Estructura completa:")
-print(f"   - playlists_tokenizadas: lista con {len(playlists_tokenizadas)} sublistas")
+print(f"   - playlists_tokenizadas: corpus compacto con {len(playlists_tokenizadas)} playlists en {RUTA_CORPUS}/")
 print(f"   - canciones_a_tokens: diccionario con {len(canciones_a_tokens)} canciones")
 print(f"   - tokens_a_canciones: diccionario con {len(tokens_a_canciones)} tokens")
-print(f"     Cada token mapea a: {{'cancion': '...', 'artista': '...'}}")
+print(f"     Cada token mapea a: {{'cancion': '...', 'artista': '...', 'genero': '...', 'popularidad': ...}}")
 
 # Guardar a CSV
-csv_filename = 'data/canciones_playlists_generos.csv'
 df_canciones.to_csv(csv_filename, index=False, encoding='utf-8')
 print(f"\n✓ Datos guardados en: {csv_filename}")
 
-# Guardar
-datos_tokenizacion = {
-    'playlists_tokenizadas': playlists_tokenizadas,
-    'canciones_a_tokens': canciones_a_tokens,
-    'tokens_a_canciones': tokens_a_canciones
-}
-
-with open('data/datos_tokenizacion.pkl', 'wb') as f:
-    pickle.dump(datos_tokenizacion, f)
-
-print(f"✓ Datos guardados en: datos_tokenizacion.pkl")
\ No newline at end of file
+# Guardar (mapeos y snapshots para la próxima ejecución incremental)
+estado['playlists_generos'] = playlists_generos
+estado['playlists_en_corpus_parcial'] = 0
+guardar_estado(estado)
+borrar_checkpoint()
+
+# Catálogo columnar (token = índice de fila) para la app y las recomendaciones
+with cronometrar('escribir_catalogo'):
+    escribir_catalogo(tokens_a_canciones)
+# Índice de búsqueda por nombre (trigramas + prefijos) junto al catálogo
+with cronometrar('indice_busqueda'):
+    cargar_indice_busqueda(Catalogo(RUTA_CATALOGO))
+
+print(f"✓ Datos guardados en: datos_tokenizacion.pkl, {RUTA_CORPUS}/ y {RUTA_CATALOGO}/")
+imprimir_resumen()
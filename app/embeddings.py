@@ -0,0 +1,264 @@
+"""
+Artefacto de servicio de los embeddings de canciones.
+
+En lugar de guardar el modelo Word2Vec completo (con el estado de
+entrenamiento: syn1neg, tablas de vocabulario...), se exportan solo los
+vectores normalizados en float32. Se abren con memory-map, de modo que el
+arranque es inmediato y varios procesos comparten la misma copia en la
+caché de páginas del sistema operativo.
+
+    vectores.npy   float32 (n, d), filas con norma 1
+    claves.npy     int32 (n,): token de cada fila
+    filas.npy      int32 (max_token + 1,): fila de cada token, -1 si no existe
+    meta.json      Dimensión, número de vectores y versión
+    cambiados.npy  (solo tras una actualización incremental) int32: tokens cuyo
+                   vector es nuevo o distinto del de la versión `version_base`
+"""
+import json
+import os
+import shutil
+import time
+import numpy as np
+from settings import RUTA_EMBEDDINGS
+
+BLOQUE_COLUMNAS = 16384  # Columnas por producto de matrices en top_k_similares
+
+
+def productos_por_bloques(consultas, vectores, bloque_columnas=BLOQUE_COLUMNAS):
+    """
+    Similitudes de las consultas con `vectores`, un GEMM por bloque de columnas
+
+    Yields:
+        Tupla (col, scores): primera fila del bloque y matriz (q, columnas) float32
+    """
+    consultas = np.asarray(consultas, dtype=np.float32)
+    for col in range(0, len(vectores), bloque_columnas):
+        col_fin = min(col + bloque_columnas, len(vectores))
+        yield col, consultas @ np.asarray(vectores[col:col_fin], dtype=np.float32).T
+
+
+class TopKPorBloques:
+    """
+    Top-k de varias consultas acumulado bloque a bloque de columnas
+
+    Cada bloque aporta su top-k, que se fusiona con el acumulado (solo se
+    concatenan 2k columnas), así que la memoria no depende del número de filas.
+
+    Args:
+        n_consultas: Filas de los bloques de scores
+        k: Resultados por consulta
+    """
+
+    def __init__(self, n_consultas, k):
+        self.k = k
+        self.scores = np.full((n_consultas, k), -np.inf, dtype=np.float32)
+        self.filas = np.zeros((n_consultas, k), dtype=np.int64)
+
+    def anadir(self, col, scores):
+        """Fusiona un bloque de scores (q, columnas) cuya primera columna es la fila `col`"""
+        k_bloque = min(self.k, scores.shape[1])
+        locales = np.argpartition(-scores, k_bloque - 1, axis=1)[:, :k_bloque]
+        candidatos_scores = np.hstack([self.scores, np.take_along_axis(scores, locales, axis=1)])
+        candidatos_filas = np.hstack([self.filas, locales + col])
+        elegidos = np.argpartition(-candidatos_scores, self.k - 1, axis=1)[:, :self.k]
+        self.scores = np.take_along_axis(candidatos_scores, elegidos, axis=1)
+        self.filas = np.take_along_axis(candidatos_filas, elegidos, axis=1)
+
+    def resultado(self):
+        """
+        Returns:
+            Tupla (filas int64, scores float32), arrays (q, k) ordenados de mayor a menor
+        """
+        orden = np.argsort(-self.scores, axis=1)
+        return np.take_along_axis(self.filas, orden, axis=1), np.take_along_axis(self.scores, orden, axis=1)
+
+
+def top_k_similares(consultas, vectores, k, excluir=None, bloque_columnas=BLOQUE_COLUMNAS):
+    """
+    Top-k exacto por producto punto de varias consultas a la vez
+
+    Recorre `vectores` por bloques de columnas (productos_por_bloques) y
+    fusiona el top-k de cada bloque con el acumulado (TopKPorBloques), así
+    que la memoria queda acotada a len(consultas) x bloque_columnas.
+
+    Args:
+        consultas: Matriz (q, d) float32
+        vectores: Matriz (n, d) de vectores normalizados (puede ser memory-map)
+        k: Resultados por consulta
+        excluir: Array (q,) con la fila a excluir de cada consulta (-1 = ninguna)
+
+    Returns:
+        Tupla (filas int64, scores float32), arrays (q, k) ordenados de mayor a menor
+    """
+    top = TopKPorBloques(len(consultas), min(k, len(vectores)))
+    rango = np.arange(len(consultas))
+    for col, scores in productos_por_bloques(consultas, vectores, bloque_columnas):
+        if excluir is not None:
+            propias = np.asarray(excluir) - col
+            dentro = (propias >= 0) & (propias < scores.shape[1])
+            scores[rango[dentro], propias[dentro]] = -np.inf
+        top.anadir(col, scores)
+    return top.resultado()
+
+
+def tokens_cambiados(vectores, claves, anterior):
+    """
+    Tokens cuyo vector no existía en `anterior` o es distinto
+
+    Args:
+        vectores, claves: Vectores normalizados nuevos y el token de cada fila
+        anterior: Embeddings de la versión previa
+
+    Returns:
+        Array int32 de tokens
+    """
+    filas_anteriores = np.full(len(claves), -1, dtype=np.int64)
+    conocidos = claves < len(anterior.filas)
+    filas_anteriores[conocidos] = anterior.filas[claves[conocidos]]
+    cambiados = filas_anteriores < 0
+    for inicio in range(0, len(claves), BLOQUE_COLUMNAS):
+        fin = min(inicio + BLOQUE_COLUMNAS, len(claves))
+        previas = filas_anteriores[inicio:fin]
+        existentes = np.flatnonzero(previas >= 0)
+        distintos = np.any(vectores[inicio:fin][existentes] != anterior.vectores[previas[existentes]], axis=1)
+        cambiados[inicio + existentes[distintos]] = True
+    return claves[cambiados]
+
+
+def exportar_embeddings(wv, ruta=RUTA_EMBEDDINGS, version=None, anterior=None):
+    """
+    Exporta los vectores de un KeyedVectors de gensim al artefacto de servicio
+
+    Args:
+        wv: KeyedVectors entrenados (model.wv)
+        ruta: Carpeta de destino (se reemplaza de forma atómica)
+        version: Identificador de la versión (por defecto, timestamp)
+        anterior: Embeddings de la versión previa (actualización incremental):
+            se guardan los tokens cambiados para que la tabla de vecinos y
+            la caché solo recalculen esas filas
+    """
+    vectores = np.ascontiguousarray(wv.get_normed_vectors(), dtype=np.float32)
+    claves = np.asarray([int(clave) for clave in wv.index_to_key], dtype=np.int32)
+    filas = np.full(int(claves.max(initial=0)) + 1, -1, dtype=np.int32)
+    filas[claves] = np.arange(len(claves), dtype=np.int32)
+    meta = {
+        'version': version or time.strftime('%Y%m%d-%H%M%S'),
+        'vector_size': int(vectores.shape[1]),
+        'num_vectores': int(vectores.shape[0]),
+    }
+
+    ruta_tmp = f"{ruta}.tmp"
+    os.makedirs(ruta_tmp, exist_ok=True)
+    if anterior is not None:
+        cambiados = tokens_cambiados(vectores, claves, anterior)
+        np.save(os.path.join(ruta_tmp, 'cambiados.npy'), cambiados)
+        meta.update(version_base=anterior.version, num_cambiados=int(len(cambiados)))
+        print(f"✓ {len(cambiados)} de {len(claves)} vectores nuevos o modificados")
+    np.save(os.path.join(ruta_tmp, 'vectores.npy'), vectores)
+    np.save(os.path.join(ruta_tmp, 'claves.npy'), claves)
+    np.save(os.path.join(ruta_tmp, 'filas.npy'), filas)
+    with open(os.path.join(ruta_tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.exists(ruta):
+        shutil.rmtree(ruta)
+    os.replace(ruta_tmp, ruta)
+
+
+def leer_version(ruta=RUTA_EMBEDDINGS):
+    """Versión del artefacto guardado en disco (None si no existe)"""
+    try:
+        with open(os.path.join(ruta, 'meta.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)['version']
+    except FileNotFoundError:
+        return None
+
+
+class Embeddings:
+    """
+    Vectores normalizados con memory-map y búsqueda exacta por similitud coseno
+
+    Args:
+        ruta: Carpeta del artefacto (ver exportar_embeddings)
+    """
+
+    def __init__(self, ruta=RUTA_EMBEDDINGS):
+        self.ruta = ruta
+        self.vectores = np.load(os.path.join(ruta, 'vectores.npy'), mmap_mode='r')
+        self.claves = np.load(os.path.join(ruta, 'claves.npy'), mmap_mode='r')
+        self.filas = np.load(os.path.join(ruta, 'filas.npy'), mmap_mode='r')
+        with open(os.path.join(ruta, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    def cambiados_desde(self, version):
+        """
+        Tokens cuyo vector cambió respecto a `version`
+
+        Returns:
+            Array int32, o None si esta versión no es una actualización
+            incremental de `version` (hay que recalcular todo)
+        """
+        if self.meta.get('version_base') != version:
+            return None
+        return np.load(os.path.join(self.ruta, 'cambiados.npy'))
+
+    def __len__(self):
+        return len(self.claves)
+
+    def fila(self, token):
+        """Fila del token en la matriz de vectores, o -1 si no está en el vocabulario"""
+        if not isinstance(token, (int, np.integer)) or not 0 <= token < len(self.filas):
+            return -1
+        return int(self.filas[token])
+
+    def contiene(self, token):
+        return self.fila(token) >= 0
+
+    def __contains__(self, token):
+        return self.contiene(token)
+
+    def vector(self, token):
+        return self.vectores[self.fila(token)]
+
+    def most_similar(self, token, topn=10):
+        """
+        Canciones más similares a un token (misma salida que KeyedVectors.most_similar)
+
+        Args:
+            token: Token de la canción
+            topn: Número de resultados
+
+        Returns:
+            Lista de tuplas (token, similitud) ordenada de mayor a menor
+        """
+        fila = self.fila(token)
+        scores = self.vectores @ self.vectores[fila]
+        scores[fila] = -np.inf
+
+        topn = min(topn, len(scores) - 1)
+        if topn <= 0:
+            return []
+        candidatos = np.argpartition(-scores, topn - 1)[:topn]
+        candidatos = candidatos[np.argsort(-scores[candidatos])]
+        return [(int(self.claves[i]), float(scores[i])) for i in candidatos]
+
+    def most_similar_lote(self, filas, topn=10, bloque_columnas=BLOQUE_COLUMNAS):
+        """
+        Vecinos de varias filas con un producto de matrices por bloque
+
+        Args:
+            filas: Array (q,) de filas de la matriz de vectores
+            topn: Resultados por consulta (se excluye la propia fila)
+
+        Returns:
+            Tupla (tokens int32, scores float32), arrays (q, topn) de mayor a menor
+        """
+        filas = np.asarray(filas, dtype=np.int64)
+        topn = min(topn, len(self) - 1)
+        resultado, scores = top_k_similares(self.vectores[filas], self.vectores, topn,
+                                            excluir=filas, bloque_columnas=bloque_columnas)
+        return np.asarray(self.claves)[resultado], scores
@@ -0,0 +1,447 @@
+"""
+Entrenamiento de Word2Vec sobre el corpus compacto de playlists.
+
+Dos modos (MODO_ENTRENAMIENTO en settings.py):
+    corpus_file  El corpus se vuelca una vez al formato de líneas de gensim
+                 (corpus.txt) y cada worker lee su propio tramo del archivo
+                 desde código C: no hay hilo productor ni contención por el
+                 GIL, así que el rendimiento escala casi linealmente con los
+                 núcleos.
+    iterable     CorpusPlaylists se pasa como iterable de Python. Un único
+                 hilo reparte las playlists a los workers, por lo que deja de
+                 escalar a partir de unos pocos núcleos.
+
+Con PARAMS['workers'] = None se usan todos los núcleos disponibles para el
+proceso. Al terminar se informa de las palabras por segundo (totales y por
+worker) para comprobar el escalado.
+
+Actualización incremental: el modelo completo (con syn1neg y el vocabulario)
+se guarda en RUTA_MODELO_COMPLETO junto con la huella de cada playlist del
+corpus. `actualizar` añade al vocabulario los tokens nuevos con
+build_vocab(update=True) y entrena solo sobre las playlists cuya huella no
+estaba en el modelo, más una muestra aleatoria de playlists antiguas
+(REPLAY_ACTUALIZACION por cada nueva) para limitar la deriva de los vectores
+que no se vuelven a ver.
+
+Seguimiento por época (SeguimientoEntrenamiento, un callback de gensim):
+registra la pérdida y las palabras por segundo de cada época, guarda un
+checkpoint del modelo completo cada EPOCHS_CHECKPOINT épocas (reanudar()
+continúa desde ahí con el mismo learning rate lineal) y, si se le pasan
+playlists de validación, mide su hit-rate al final de cada época y corta
+el entrenamiento tras PACIENCIA_PARADA épocas sin mejora, devolviendo los
+vectores de la mejor época.
+
+Uso:
+    modelo, estadisticas = entrenar(CorpusPlaylists())
+    modelo, estadisticas = entrenar(subcorpus, validacion=(corpus, indices), cada_checkpoint=5)
+    modelo, estadisticas = reanudar(subcorpus, validacion=(corpus, indices))
+    guardar_modelo(modelo, CorpusPlaylists())
+    modelo, estadisticas = actualizar(CorpusPlaylists())
+"""
+import json
+import os
+import shutil
+import time
+import numpy as np
+from gensim.models import Word2Vec
+from gensim.models.callbacks import CallbackAny2Vec
+from corpus import escribir_subcorpus
+from evaluacion import evaluar
+from metricas import cronometrar
+from settings import (PARAMS, MODO_ENTRENAMIENTO, RUTA_MODELO_COMPLETO, EPOCHS_ACTUALIZACION,
+                      REPLAY_ACTUALIZACION, RUTA_CHECKPOINT, METRICA_PARADA, PACIENCIA_PARADA,
+                      MEJORA_MINIMA_PARADA, CONSULTAS_VALIDACION, KS_EVALUACION)
+
+MODOS = ('corpus_file', 'iterable')
+
+
+def workers_automaticos(workers=None):
+    """Núcleos disponibles para el proceso si workers es None"""
+    if workers:
+        return int(workers)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # sched_getaffinity no existe en macOS ni Windows
+        return os.cpu_count() or 1
+
+
+def _fuente(corpus, modo):
+    if modo not in MODOS:
+        raise ValueError(f"Modo de entrenamiento desconocido: {modo} (opciones: {', '.join(MODOS)})")
+    if modo == 'corpus_file':
+        return {'corpus_file': corpus.exportar_lineas()}
+    return {'corpus_iterable': corpus}
+
+
+class DetenerEntrenamiento(Exception):
+    """Corta model.train() desde el callback cuando la validación deja de mejorar"""
+
+
+class SeguimientoEntrenamiento(CallbackAny2Vec):
+    """
+    Callback de gensim que, al final de cada época, registra la pérdida y las
+    palabras por segundo, evalúa la validación, guarda el checkpoint que toque
+    y lanza DetenerEntrenamiento si la métrica lleva `paciencia` épocas sin mejorar
+
+    Args:
+        epochs: Épocas totales del entrenamiento
+        validacion: Tupla (corpus completo, índices de las playlists de validación) o None
+        cada_checkpoint: Épocas entre checkpoints (None = sin checkpoints)
+        ruta_checkpoint: Carpeta del checkpoint (se reemplaza de forma atómica)
+        metrica: Métrica de la tarea 'siguiente' de evaluacion.py
+        paciencia: Épocas sin mejora antes de parar
+        mejora_minima: Mejora absoluta mínima de la métrica
+        max_consultas: Consultas de validación por época
+        verbose: Si es True, imprime una línea por época
+    """
+
+    def __init__(self, epochs, validacion=None, cada_checkpoint=None, ruta_checkpoint=RUTA_CHECKPOINT,
+                 metrica=METRICA_PARADA, paciencia=PACIENCIA_PARADA, mejora_minima=MEJORA_MINIMA_PARADA,
+                 max_consultas=CONSULTAS_VALIDACION, verbose=True):
+        self.epochs = epochs
+        self.validacion = validacion
+        self.cada_checkpoint = cada_checkpoint
+        self.ruta_checkpoint = ruta_checkpoint
+        self.metrica = metrica
+        self.paciencia = paciencia
+        self.mejora_minima = mejora_minima
+        self.max_consultas = max_consultas
+        self.verbose = verbose
+        # Learning rate inicial y final del entrenamiento completo (train() sobrescribe modelo.alpha)
+        self.alpha = None
+        self.min_alpha = None
+        self.epoca = 0
+        self.historial = []
+        self.mejor = None
+        self.epoca_mejor = 0
+        self.sin_mejora = 0
+        self.detenido = False
+        self._mejores = None  # (vectores, syn1neg) de la mejor época
+
+    def estado(self):
+        """Estado serializable en JSON (checkpoint)"""
+        return {'epoca': self.epoca, 'epochs': self.epochs, 'alpha': self.alpha, 'min_alpha': self.min_alpha,
+                'historial': self.historial, 'metrica': self.metrica, 'mejor': self.mejor,
+                'epoca_mejor': self.epoca_mejor, 'sin_mejora': self.sin_mejora, 'detenido': self.detenido}
+
+    def restaurar(self, estado, mejores=None):
+        for clave in ('epoca', 'alpha', 'min_alpha', 'historial', 'mejor', 'epoca_mejor', 'sin_mejora', 'detenido'):
+            setattr(self, clave, estado[clave])
+        self._mejores = mejores
+
+    def on_train_begin(self, modelo):
+        self._perdida = 0.0  # get_latest_training_loss acumula desde el inicio de cada train()
+
+    def on_epoch_begin(self, modelo):
+        self._inicio = time.perf_counter()
+
+    def on_epoch_end(self, modelo):
+        segundos = time.perf_counter() - self._inicio
+        self.epoca += 1
+        registro = {'epoca': self.epoca, 'segundos': segundos,
+                    'palabras_por_s': modelo.corpus_total_words / segundos if segundos else 0.0}
+        if modelo.compute_loss:
+            perdida = modelo.get_latest_training_loss()
+            registro['perdida'] = perdida - self._perdida
+            self._perdida = perdida
+        if self.validacion is not None:
+            registro[self.metrica] = self._validar(modelo)
+            self.detenido = self.sin_mejora >= self.paciencia
+        self.historial.append(registro)
+        if self.verbose:
+            self._imprimir(registro)
+
+        if self.cada_checkpoint and self.epoca % self.cada_checkpoint == 0 and self.epoca < self.epochs:
+            self.guardar_checkpoint(modelo)
+        if self.detenido:
+            raise DetenerEntrenamiento(f"{self.metrica} sin mejorar desde la época {self.epoca_mejor}")
+
+    def _validar(self, modelo):
+        corpus, indices = self.validacion
+        ks = (int(self.metrica.split('@')[1]),) if '@' in self.metrica else KS_EVALUACION
+        modelo.wv.fill_norms(force=True)  # Las normas en caché son de la época anterior
+        with cronometrar('validacion'):
+            valor = evaluar(modelo.wv, corpus, indices, tareas=('siguiente',), ks=ks,
+                            max_consultas=self.max_consultas)['siguiente'].get(self.metrica, 0.0)
+
+        if self.mejor is None or valor > self.mejor + self.mejora_minima:
+            self.mejor, self.epoca_mejor, self.sin_mejora = valor, self.epoca, 0
+            syn1neg = getattr(modelo, 'syn1neg', None)
+            self._mejores = (modelo.wv.vectors.copy(), None if syn1neg is None else syn1neg.copy())
+        else:
+            self.sin_mejora += 1
+        return valor
+
+    def _imprimir(self, registro):
+        partes = [f"{registro['palabras_por_s']:,.0f} palabras/s", f"{registro['segundos']:.1f} s"]
+        if 'perdida' in registro:
+            partes.insert(0, f"pérdida={registro['perdida']:,.0f}")
+        if self.metrica in registro:
+            partes.append(f"{self.metrica}={registro[self.metrica]:.4f}"
+                          + (' ★' if self.epoca_mejor == self.epoca else f' ({self.sin_mejora}/{self.paciencia})'))
+        print(f"   Época {self.epoca}/{self.epochs}: " + ', '.join(partes))
+
+    def restaurar_mejores(self, modelo):
+        """Devuelve al modelo los vectores de la mejor época de validación"""
+        if self._mejores is None or self.epoca_mejor == self.epoca:
+            return
+        vectores, syn1neg = self._mejores
+        modelo.wv.vectors[...] = vectores
+        if syn1neg is not None:
+            modelo.syn1neg[...] = syn1neg
+        modelo.wv.fill_norms(force=True)
+
+    def guardar_checkpoint(self, modelo):
+        """Modelo completo, estado del seguimiento y mejores vectores en ruta_checkpoint"""
+        with cronometrar('checkpoint'):
+            ruta_tmp = f"{self.ruta_checkpoint}.tmp"
+            if os.path.exists(ruta_tmp):
+                shutil.rmtree(ruta_tmp)
+            os.makedirs(ruta_tmp)
+            modelo.save(os.path.join(ruta_tmp, 'word2vec.model'))
+            if self._mejores is not None:
+                np.save(os.path.join(ruta_tmp, 'mejores_vectores.npy'), self._mejores[0])
+                if self._mejores[1] is not None:
+                    np.save(os.path.join(ruta_tmp, 'mejores_syn1neg.npy'), self._mejores[1])
+            with open(os.path.join(ruta_tmp, 'estado.json'), 'w', encoding='utf-8') as f:
+                json.dump({**self.estado(), 'fecha': time.strftime('%Y%m%d-%H%M%S')}, f, indent=2)
+
+            if os.path.exists(self.ruta_checkpoint):
+                shutil.rmtree(self.ruta_checkpoint)
+            os.replace(ruta_tmp, self.ruta_checkpoint)
+        if self.verbose:
+            print(f"   💾 Checkpoint de la época {self.epoca} en: {self.ruta_checkpoint}/")
+
+
+def _entrenar_epocas(modelo, fuente, seguimiento):
+    """
+    train() de las épocas que faltan; el learning rate continúa la rampa lineal
+    del entrenamiento completo desde seguimiento.epoca
+    """
+    if seguimiento.alpha is None:
+        seguimiento.alpha, seguimiento.min_alpha = modelo.alpha, modelo.min_alpha
+    hechas = seguimiento.epoca
+    alpha_inicial = seguimiento.alpha - (seguimiento.alpha - seguimiento.min_alpha) * hechas / seguimiento.epochs
+
+    inicio = time.perf_counter()
+    efectivas = palabras = 0
+    if hechas < seguimiento.epochs and not seguimiento.detenido:
+        with cronometrar('entrenar'):
+            try:
+                efectivas, palabras = modelo.train(
+                    **fuente, total_examples=modelo.corpus_count, total_words=modelo.corpus_total_words,
+                    epochs=seguimiento.epochs - hechas, start_alpha=alpha_inicial,
+                    end_alpha=seguimiento.min_alpha, compute_loss=modelo.compute_loss, callbacks=[seguimiento],
+                )
+            except DetenerEntrenamiento as parada:
+                if seguimiento.verbose:
+                    print(f"⏹️  Parada temprana en la época {seguimiento.epoca}: {parada}")
+                palabras = modelo.corpus_total_words * (seguimiento.epoca - hechas)
+                efectivas = None
+    segundos = time.perf_counter() - inicio
+    seguimiento.restaurar_mejores(modelo)
+    modelo.alpha, modelo.min_alpha = seguimiento.alpha, seguimiento.min_alpha
+
+    return {
+        'modo': 'corpus_file' if 'corpus_file' in fuente else 'iterable',
+        'workers': modelo.workers,
+        'palabras': int(palabras),
+        'palabras_efectivas': None if efectivas is None else int(efectivas),
+        'segundos': segundos,
+        'palabras_por_s': palabras / segundos if segundos else 0.0,
+        'palabras_por_s_worker': palabras / segundos / modelo.workers if segundos else 0.0,
+        'epocas': seguimiento.epoca,
+        'detenido': seguimiento.detenido,
+        'mejor': seguimiento.mejor,
+        'epoca_mejor': seguimiento.epoca_mejor,
+        'historial': seguimiento.historial,
+    }
+
+
+def _vocabulario_y_entrenamiento(modelo, fuente, seguimiento, actualizar=False):
+    """build_vocab + train midiendo cada fase; devuelve las estadísticas de velocidad"""
+    inicio = time.perf_counter()
+    with cronometrar('vocabulario'):
+        modelo.build_vocab(**fuente, update=actualizar)
+    segundos_vocabulario = time.perf_counter() - inicio
+    return {**_entrenar_epocas(modelo, fuente, seguimiento), 'segundos_vocabulario': segundos_vocabulario}
+
+
+def _imprimir_velocidad(estadisticas):
+    print(f"⚡ Entrenamiento ({estadisticas['modo']}, {estadisticas['workers']} workers): "
+          f"{estadisticas['palabras']:,} palabras en {estadisticas['segundos']:.1f} s → "
+          f"{estadisticas['palabras_por_s']:,.0f} palabras/s "
+          f"({estadisticas['palabras_por_s_worker']:,.0f} por worker)")
+
+
+def entrenar(corpus, params=PARAMS, modo=MODO_ENTRENAMIENTO, workers=None, verbose=True, validacion=None,
+             cada_checkpoint=None, ruta_checkpoint=RUTA_CHECKPOINT):
+    """
+    Construye el vocabulario y entrena un Word2Vec
+
+    Args:
+        corpus: CorpusPlaylists
+        params: Parámetros de Word2Vec (settings.PARAMS)
+        modo: 'corpus_file' o 'iterable'
+        workers: Hilos de entrenamiento (None = params['workers'] o todos los núcleos)
+        verbose: Si es True, imprime cada época y el resumen de velocidad
+        validacion: Tupla (corpus completo, índices de playlists fuera de `corpus`)
+            para la parada temprana, o None para entrenar todas las épocas
+        cada_checkpoint: Épocas entre checkpoints (None = sin checkpoints)
+        ruta_checkpoint: Carpeta del checkpoint
+
+    Returns:
+        Tupla (modelo, estadisticas) con estadisticas = {modo, workers,
+        palabras, palabras_efectivas, segundos_vocabulario, segundos,
+        palabras_por_s, palabras_por_s_worker, epocas, detenido, mejor,
+        epoca_mejor, historial}
+    """
+    fuente = _fuente(corpus, modo)
+    modelo = Word2Vec(**{**params, 'workers': workers_automaticos(workers or params.get('workers'))})
+    seguimiento = SeguimientoEntrenamiento(modelo.epochs, validacion, cada_checkpoint, ruta_checkpoint,
+                                           verbose=verbose)
+    estadisticas = _vocabulario_y_entrenamiento(modelo, fuente, seguimiento)
+    if verbose:
+        _imprimir_velocidad(estadisticas)
+    return modelo, estadisticas
+
+
+def existe_checkpoint(ruta=RUTA_CHECKPOINT):
+    return os.path.exists(os.path.join(ruta, 'estado.json'))
+
+
+def cargar_checkpoint(ruta=RUTA_CHECKPOINT):
+    """
+    Returns:
+        Tupla (modelo Word2Vec, estado del seguimiento, (vectores, syn1neg) de
+        la mejor época o None)
+    """
+    modelo = Word2Vec.load(os.path.join(ruta, 'word2vec.model'))
+    with open(os.path.join(ruta, 'estado.json'), encoding='utf-8') as f:
+        estado = json.load(f)
+    mejores = None
+    if os.path.exists(os.path.join(ruta, 'mejores_vectores.npy')):
+        ruta_syn1neg = os.path.join(ruta, 'mejores_syn1neg.npy')
+        mejores = (np.load(os.path.join(ruta, 'mejores_vectores.npy')),
+                   np.load(ruta_syn1neg) if os.path.exists(ruta_syn1neg) else None)
+    return modelo, estado, mejores
+
+
+def reanudar(corpus, ruta_checkpoint=RUTA_CHECKPOINT, modo=MODO_ENTRENAMIENTO, workers=None, verbose=True,
+             validacion=None, cada_checkpoint=None):
+    """
+    Continúa un entrenamiento interrumpido desde su último checkpoint
+
+    Args:
+        corpus: El mismo CorpusPlaylists con el que se empezó
+        validacion: Las mismas playlists de validación (o None)
+        Resto: como en entrenar
+
+    Returns:
+        Tupla (modelo, estadisticas) como en entrenar
+    """
+    modelo, estado, mejores = cargar_checkpoint(ruta_checkpoint)
+    modelo.workers = workers_automaticos(workers or PARAMS.get('workers'))
+    seguimiento = SeguimientoEntrenamiento(estado['epochs'], validacion, cada_checkpoint, ruta_checkpoint,
+                                           metrica=estado['metrica'], verbose=verbose)
+    seguimiento.restaurar(estado, mejores)
+    if verbose:
+        print(f"↻ Reanudando desde la época {seguimiento.epoca}/{seguimiento.epochs} ({ruta_checkpoint}/)")
+
+    estadisticas = {**_entrenar_epocas(modelo, _fuente(corpus, modo), seguimiento), 'segundos_vocabulario': 0.0}
+    if verbose:
+        _imprimir_velocidad(estadisticas)
+    return modelo, estadisticas
+
+
+def guardar_modelo(modelo, corpus, ruta=RUTA_MODELO_COMPLETO):
+    """
+    Guarda el modelo completo y las huellas de las playlists con las que se entrenó
+
+    Args:
+        modelo: Word2Vec entrenado
+        corpus: CorpusPlaylists que ya refleja el modelo
+        ruta: Carpeta de destino (se reemplaza de forma atómica)
+    """
+    ruta_tmp = f"{ruta}.tmp"
+    if os.path.exists(ruta_tmp):
+        shutil.rmtree(ruta_tmp)
+    os.makedirs(ruta_tmp)
+    modelo.save(os.path.join(ruta_tmp, 'word2vec.model'))
+    np.save(os.path.join(ruta_tmp, 'huellas.npy'), corpus.huellas())
+    with open(os.path.join(ruta_tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'fecha': time.strftime('%Y%m%d-%H%M%S'), 'playlists': len(corpus),
+                   'vocabulario': len(modelo.wv)}, f, indent=2)
+
+    if os.path.exists(ruta):
+        shutil.rmtree(ruta)
+    os.replace(ruta_tmp, ruta)
+    print(f"✓ Modelo completo guardado en: {ruta}/")
+
+
+def existe_modelo(ruta=RUTA_MODELO_COMPLETO):
+    return os.path.exists(os.path.join(ruta, 'meta.json'))
+
+
+def cargar_modelo(ruta=RUTA_MODELO_COMPLETO):
+    """
+    Returns:
+        Tupla (modelo Word2Vec, huellas uint64 de las playlists ya entrenadas)
+    """
+    modelo = Word2Vec.load(os.path.join(ruta, 'word2vec.model'))
+    return modelo, np.load(os.path.join(ruta, 'huellas.npy'))
+
+
+def actualizar(corpus, ruta_modelo=RUTA_MODELO_COMPLETO, epochs=EPOCHS_ACTUALIZACION,
+               replay=REPLAY_ACTUALIZACION, modo=MODO_ENTRENAMIENTO, workers=None, semilla=42,
+               verbose=True):
+    """
+    Actualiza el modelo guardado con las playlists nuevas o modificadas
+
+    Args:
+        corpus: CorpusPlaylists completo (el resultado del último crawl)
+        ruta_modelo: Carpeta del modelo completo (ver guardar_modelo)
+        epochs: Épocas sobre el subconjunto a entrenar
+        replay: Playlists antiguas repasadas por cada nueva o modificada
+        modo: 'corpus_file' o 'iterable'
+        workers: Hilos de entrenamiento (None = todos los núcleos)
+        semilla: Semilla de la muestra de replay
+        verbose: Si es True, imprime el resumen
+
+    Returns:
+        Tupla (modelo, estadisticas); estadisticas es None si no había
+        playlists nuevas (el modelo no se toca). Además de las claves de
+        entrenar: playlists_nuevas, playlists_replay, tokens_nuevos
+    """
+    modelo, huellas_entrenadas = cargar_modelo(ruta_modelo)
+    huellas = corpus.huellas()
+    nuevas = np.flatnonzero(~np.isin(huellas, huellas_entrenadas))
+    if len(nuevas) == 0:
+        if verbose:
+            print("✓ El modelo ya incluye todas las playlists del corpus; nada que actualizar")
+        return modelo, None
+
+    antiguas = np.setdiff1d(np.arange(len(corpus)), nuevas)
+    rng = np.random.default_rng(semilla)
+    n_replay = min(len(antiguas), int(round(replay * len(nuevas))))
+    repaso = rng.choice(antiguas, n_replay, replace=False) if n_replay else np.zeros(0, dtype=np.int64)
+    seleccion = rng.permutation(np.concatenate([nuevas, repaso]))
+
+    # Subcorpus temporal en el formato compacto (así corpus_file también sirve aquí)
+    ruta_subcorpus = f"{ruta_modelo}.actualizacion"
+    subcorpus = escribir_subcorpus(corpus, seleccion, ruta_subcorpus)
+    try:
+        vocabulario_anterior = len(modelo.wv)
+        modelo.workers = workers_automaticos(workers or PARAMS.get('workers'))
+        seguimiento = SeguimientoEntrenamiento(epochs, verbose=verbose)
+        estadisticas = _vocabulario_y_entrenamiento(modelo, _fuente(subcorpus, modo), seguimiento, actualizar=True)
+    finally:
+        shutil.rmtree(ruta_subcorpus, ignore_errors=True)
+
+    estadisticas.update(playlists_nuevas=int(len(nuevas)), playlists_replay=int(n_replay),
+                        tokens_nuevos=len(modelo.wv) - vocabulario_anterior)
+    if verbose:
+        print(f"↻ Actualización: {estadisticas['playlists_nuevas']} playlists nuevas o modificadas, "
+              f"{estadisticas['playlists_replay']} de repaso, {estadisticas['tokens_nuevos']} tokens nuevos")
+        _imprimir_velocidad(estadisticas)
+    return modelo, estadisticas
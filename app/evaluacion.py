@@ -0,0 +1,375 @@
+"""
+Evaluación offline de las recomendaciones sobre playlists reservadas.
+
+El corpus se divide en playlists de entrenamiento y de prueba; el modelo se
+entrena solo con las primeras y se mide sobre las segundas con dos tareas:
+
+    siguiente         Con las CONTEXTO_SIGUIENTE canciones anteriores de la
+                      playlist, predecir la siguiente (todas las posiciones)
+    dejar_uno_fuera   Se quita una canción al azar de cada playlist y se
+                      predice a partir de la media del resto
+
+Métricas por tarea:
+    hit@k         Fracción de consultas cuya canción objetivo está en el top-k
+    mrr           Media de 1 / rango del objetivo en el ranking completo
+    mrr@K         Igual, pero 0 si el objetivo no está en el top-K (K = max ks)
+    cobertura@k   Fracción del vocabulario que aparece en algún top-k
+
+Las consultas cuyo objetivo o contexto no está en el vocabulario del modelo
+(canciones que solo aparecen en playlists de prueba) se cuentan como
+omitidas.
+
+Todo se calcula en lote: las consultas se agrupan en bloques y cada bloque
+se compara con todos los vectores por bloques de columnas (un producto de
+matrices por bloque, en varios hilos). En la misma pasada se cuenta cuántas
+canciones superan al objetivo (su rango) y se mantiene el top-K. Las
+canciones de la consulta se excluyen del ranking.
+
+Con un índice ANN o cuantizado (`indice`), el top-K sale del índice y se
+compara con la búsqueda exacta sobre las mismas consultas.
+
+Uso:
+    python app/evaluacion.py                   # Entrena con el 90% y evalúa el 10%
+    python app/evaluacion.py --epochs 5 --indice int8
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from embeddings import productos_por_bloques, TopKPorBloques
+from settings import (FRACCION_PRUEBA, KS_EVALUACION, CONTEXTO_SIGUIENTE, MAX_CONSULTAS_EVALUACION,
+                      BLOQUE_CONSULTAS_EVALUACION, BLOQUE_COLUMNAS_VECINOS, RUTA_REPORTE_EVALUACION,
+                      RUTA_CORPUS)
+
+TAREAS = ('siguiente', 'dejar_uno_fuera')
+
+
+def dividir_corpus(corpus, fraccion_prueba=FRACCION_PRUEBA, semilla=42):
+    """
+    Reparte las playlists al azar entre entrenamiento y prueba
+
+    Returns:
+        Tupla (indices_entrenamiento, indices_prueba), arrays int64 ordenados
+    """
+    rng = np.random.default_rng(semilla)
+    orden = rng.permutation(len(corpus))
+    n_prueba = int(round(fraccion_prueba * len(corpus)))
+    return np.sort(orden[n_prueba:]), np.sort(orden[:n_prueba])
+
+
+def vectores_y_filas(modelo):
+    """
+    Vectores normalizados y fila de cada token de unos Embeddings o de un
+    KeyedVectors de gensim (sin exportarlo)
+
+    Returns:
+        Tupla (vectores float32 (n, d), filas int32 (max_token + 1,) con -1 si no existe)
+    """
+    if hasattr(modelo, 'get_normed_vectors'):
+        vectores = np.ascontiguousarray(modelo.get_normed_vectors(), dtype=np.float32)
+        claves = np.asarray([int(clave) for clave in modelo.index_to_key], dtype=np.int64)
+        filas = np.full(int(claves.max(initial=0)) + 1, -1, dtype=np.int32)
+        filas[claves] = np.arange(len(claves), dtype=np.int32)
+        return vectores, filas
+    return modelo.vectores, np.asarray(modelo.filas)
+
+
+def _posiciones(corpus, indices, filas):
+    """
+    Todas las canciones de las playlists `indices`, aplanadas
+
+    Returns:
+        Tupla (playlist, posicion, fila) de arrays del mismo tamaño: número de
+        playlist (0..len(indices)-1), posición dentro de ella y fila del
+        vector (-1 si el token no está en el vocabulario)
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    inicios = np.asarray(corpus.offsets[indices], dtype=np.int64)
+    longitudes = np.asarray(corpus.offsets[indices + 1], dtype=np.int64) - inicios
+    playlist = np.repeat(np.arange(len(indices)), longitudes)
+    posicion = np.arange(longitudes.sum()) - np.repeat(np.cumsum(longitudes) - longitudes, longitudes)
+    tokens = np.asarray(corpus.tokens[np.repeat(inicios, longitudes) + posicion], dtype=np.int64)
+    fila = np.full(len(tokens), -1, dtype=np.int64)
+    conocidos = tokens < len(filas)
+    fila[conocidos] = filas[tokens[conocidos]]
+    return playlist, posicion, fila
+
+
+def _normalizar(consultas):
+    normas = np.linalg.norm(consultas, axis=1, keepdims=True)
+    return (consultas / np.maximum(normas, 1e-12)).astype(np.float32)
+
+
+def _muestrear(rng, n, maximo):
+    return np.arange(n) if maximo is None or n <= maximo else np.sort(rng.choice(n, maximo, replace=False))
+
+
+def _sumar_tramos(vectores, fila, inicios, longitudes, bloque=4096):
+    """Suma de vectores[fila[i:i+l]] de cada tramo (l >= 1), por bloques para acotar la memoria"""
+    sumas = np.zeros((len(inicios), vectores.shape[1]), dtype=np.float32)
+    for a in range(0, len(inicios), bloque):
+        b = min(a + bloque, len(inicios))
+        longitudes_bloque = longitudes[a:b]
+        posiciones = np.repeat(inicios[a:b] - np.cumsum(longitudes_bloque) + longitudes_bloque,
+                               longitudes_bloque) + np.arange(longitudes_bloque.sum())
+        sumas[a:b] = np.add.reduceat(vectores[fila[posiciones]], np.cumsum(longitudes_bloque) - longitudes_bloque,
+                                     axis=0)
+    return sumas
+
+
+def consultas_siguiente(corpus, indices, vectores, filas, contexto=CONTEXTO_SIGUIENTE,
+                        max_consultas=MAX_CONSULTAS_EVALUACION, semilla=42):
+    """
+    Consultas de "siguiente canción": la media de las `contexto` canciones
+    anteriores predice la actual
+
+    Returns:
+        Diccionario {consultas (q, d), objetivos (q,), excluir_consulta,
+        excluir_fila (pares a excluir del ranking), omitidas}
+    """
+    _, posicion, fila = _posiciones(corpus, indices, filas)
+    con_contexto = np.zeros(len(fila), dtype=bool)
+    for desplazamiento in range(1, contexto + 1):
+        usable = posicion >= desplazamiento
+        usable[usable] = fila[np.flatnonzero(usable) - desplazamiento] >= 0
+        con_contexto |= usable
+
+    candidatas = np.flatnonzero(con_contexto & (fila >= 0))
+    elegidas = candidatas[_muestrear(np.random.default_rng(semilla), len(candidatas), max_consultas)]
+
+    # Consulta = suma de las canciones previas conocidas; se excluyen del ranking
+    suma = np.zeros((len(elegidas), vectores.shape[1]), dtype=np.float32)
+    excluir_consulta, excluir_fila = [], []
+    for desplazamiento in range(1, contexto + 1):
+        usable = posicion[elegidas] >= desplazamiento
+        previas = fila[elegidas[usable] - desplazamiento]
+        usable[usable] = previas >= 0
+        previas = fila[elegidas[usable] - desplazamiento]
+        suma[usable] += vectores[previas]
+        excluir_consulta.append(np.flatnonzero(usable))
+        excluir_fila.append(previas)
+
+    excluir_consulta, excluir_fila = np.concatenate(excluir_consulta), np.concatenate(excluir_fila)
+    objetivos = fila[elegidas]
+    distinto = excluir_fila != objetivos[excluir_consulta]  # Una repetición del objetivo no se excluye
+    return {
+        'consultas': _normalizar(suma),
+        'objetivos': objetivos,
+        'excluir_consulta': excluir_consulta[distinto],
+        'excluir_fila': excluir_fila[distinto],
+        'omitidas': int(np.count_nonzero(posicion >= 1) - len(candidatas)),
+    }
+
+
+def consultas_dejar_uno_fuera(corpus, indices, vectores, filas, max_consultas=MAX_CONSULTAS_EVALUACION,
+                              semilla=42):
+    """
+    Consultas de "dejar uno fuera": una canción al azar de cada playlist se
+    predice con la media del resto
+
+    Returns:
+        Mismo formato que consultas_siguiente
+    """
+    rng = np.random.default_rng(semilla)
+    playlist, _, fila = _posiciones(corpus, indices, filas)
+    validas = fila >= 0
+    playlist, fila = playlist[validas], fila[validas]
+    conteo = np.bincount(playlist, minlength=len(indices))
+    inicio = np.cumsum(conteo) - conteo
+    aptas = np.flatnonzero(conteo >= 2)
+    omitidas = int(len(indices) - len(aptas))
+    aptas = aptas[_muestrear(rng, len(aptas), max_consultas)]
+
+    objetivo_pos = inicio[aptas] + rng.integers(0, conteo[aptas])
+    objetivos = fila[objetivo_pos]
+    sumas = _sumar_tramos(vectores, fila, inicio[aptas], conteo[aptas]) - vectores[objetivos]
+
+    # El resto de la playlist se excluye del ranking (salvo repeticiones del objetivo)
+    numero = np.full(len(indices), -1, dtype=np.int64)
+    numero[aptas] = np.arange(len(aptas))
+    excluir = numero[playlist] >= 0
+    excluir[objetivo_pos] = False
+    excluir_consulta, excluir_fila = numero[playlist[excluir]], fila[excluir]
+    distinto = excluir_fila != objetivos[excluir_consulta]
+    return {
+        'consultas': _normalizar(sumas),
+        'objetivos': objetivos,
+        'excluir_consulta': excluir_consulta[distinto],
+        'excluir_fila': excluir_fila[distinto],
+        'omitidas': omitidas,
+    }
+
+
+def _evaluar_exacto(vectores, consultas, objetivos, excluir_consulta, excluir_fila, k,
+                    bloque_consultas, bloque_columnas, workers):
+    """Rango completo del objetivo y top-k de cada consulta con GEMM por bloques"""
+    n_consultas = len(consultas)
+    rangos = np.zeros(n_consultas, dtype=np.int64)
+    top = np.zeros((n_consultas, k), dtype=np.int64)
+    orden = np.argsort(excluir_consulta, kind='stable')
+    excluir_consulta, excluir_fila = excluir_consulta[orden], excluir_fila[orden]
+
+    def procesar(inicio):
+        fin = min(inicio + bloque_consultas, n_consultas)
+        q = consultas[inicio:fin]
+        filas_objetivo = objetivos[inicio:fin]
+        objetivo = np.einsum('qd,qd->q', q, vectores[filas_objetivo])
+        a, b = np.searchsorted(excluir_consulta, [inicio, fin])
+        pares_q, pares_f = excluir_consulta[a:b] - inicio, excluir_fila[a:b]
+        mayores = np.zeros(fin - inicio, dtype=np.int64)
+        acumulado = TopKPorBloques(fin - inicio, k)
+
+        for col, scores in productos_por_bloques(q, vectores, bloque_columnas):
+            col_fin = col + scores.shape[1]
+            dentro = (pares_f >= col) & (pares_f < col_fin)
+            scores[pares_q[dentro], pares_f[dentro] - col] = -np.inf
+            # einsum y el GEMM redondean distinto: la columna del propio objetivo no cuenta
+            mayor = scores > objetivo[:, None]
+            propio = np.flatnonzero((filas_objetivo >= col) & (filas_objetivo < col_fin))
+            mayor[propio, filas_objetivo[propio] - col] = False
+            mayores += np.count_nonzero(mayor, axis=1)
+            acumulado.anadir(col, scores)
+
+        rangos[inicio:fin] = mayores
+        top[inicio:fin] = acumulado.resultado()[0]
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        list(executor.map(procesar, range(0, n_consultas, bloque_consultas)))
+    return rangos, top
+
+
+def _evaluar_indice(indice, consultas, excluir_consulta, excluir_fila, k):
+    """Top-k de cada consulta con un índice ANN (una búsqueda por consulta)"""
+    orden = np.argsort(excluir_consulta, kind='stable')
+    excluir_consulta, excluir_fila = excluir_consulta[orden], excluir_fila[orden]
+    limites = np.searchsorted(excluir_consulta, np.arange(len(consultas) + 1))
+    top = np.full((len(consultas), k), -1, dtype=np.int64)
+    for i, consulta in enumerate(consultas):
+        excluidas = excluir_fila[limites[i]:limites[i + 1]]
+        filas, _ = indice.buscar(consulta, k + len(excluidas))
+        filas = np.asarray(filas)[~np.isin(filas, excluidas)][:k]
+        top[i, :len(filas)] = filas
+    return top
+
+
+def metricas_consultas(vectores, datos, ks=KS_EVALUACION, indice=None, bloque_consultas=BLOQUE_CONSULTAS_EVALUACION,
+                       bloque_columnas=BLOQUE_COLUMNAS_VECINOS, workers=None):
+    """
+    hit@k, MRR y cobertura@k de un conjunto de consultas
+
+    Args:
+        vectores: Matriz (n, d) de vectores normalizados
+        datos: Resultado de consultas_siguiente o consultas_dejar_uno_fuera
+        ks: Valores de k
+        indice: Índice ANN o cuantizado (None = búsqueda exacta)
+
+    Returns:
+        Diccionario de métricas (mrr solo con búsqueda exacta)
+    """
+    k_max = max(ks)
+    consultas, objetivos = datos['consultas'], datos['objetivos']
+    excluir_consulta, excluir_fila = datos['excluir_consulta'], datos['excluir_fila']
+    resultado = {'consultas': int(len(consultas)), 'omitidas': datos['omitidas']}
+    if len(consultas) == 0:
+        return resultado
+
+    inicio = time.perf_counter()
+    if indice is None:
+        rangos, top = _evaluar_exacto(vectores, consultas, objetivos, excluir_consulta, excluir_fila, k_max,
+                                      bloque_consultas, bloque_columnas, workers)
+        resultado['mrr'] = float(np.mean(1.0 / (rangos + 1)))
+    else:
+        top = _evaluar_indice(indice, consultas, excluir_consulta, excluir_fila, k_max)
+    segundos = time.perf_counter() - inicio
+
+    aciertos = top == objetivos[:, None]
+    posicion = np.where(aciertos.any(axis=1), aciertos.argmax(axis=1), k_max)
+    for k in ks:
+        resultado[f'hit@{k}'] = float(np.mean(posicion < k))
+    resultado[f'mrr@{k_max}'] = float(np.mean(np.where(posicion < k_max, 1.0 / (posicion + 1), 0.0)))
+    for k in ks:
+        distintas = np.unique(top[:, :k])
+        resultado[f'cobertura@{k}'] = float(np.count_nonzero(distintas >= 0) / len(vectores))
+    resultado.update(segundos=segundos, consultas_por_s=len(consultas) / max(segundos, 1e-9))
+    return resultado
+
+
+def evaluar(modelo, corpus, indices_prueba, tareas=TAREAS, ks=KS_EVALUACION, contexto=CONTEXTO_SIGUIENTE,
+            max_consultas=MAX_CONSULTAS_EVALUACION, indice=None, semilla=42, workers=None):
+    """
+    Evalúa un modelo sobre las playlists reservadas
+
+    Args:
+        modelo: Embeddings o KeyedVectors de gensim (entrenados sin las playlists de prueba)
+        corpus: CorpusPlaylists completo
+        indices_prueba: Playlists reservadas (ver dividir_corpus)
+        tareas: Subconjunto de TAREAS
+        indice: Índice ANN o cuantizado sobre los mismos vectores (None = exacto)
+
+    Returns:
+        Diccionario {tarea: métricas}
+    """
+    vectores, filas = vectores_y_filas(modelo)
+    generadores = {
+        'siguiente': lambda: consultas_siguiente(corpus, indices_prueba, vectores, filas, contexto,
+                                                 max_consultas, semilla),
+        'dejar_uno_fuera': lambda: consultas_dejar_uno_fuera(corpus, indices_prueba, vectores, filas,
+                                                             max_consultas, semilla),
+    }
+    return {tarea: metricas_consultas(vectores, generadores[tarea](), ks, indice, workers=workers)
+            for tarea in tareas}
+
+
+def imprimir_metricas(resultados, titulo='EVALUACIÓN'):
+    print(f"\n=== {titulo} ===\n")
+    for tarea, metricas in resultados.items():
+        print(f"{tarea} ({metricas['consultas']:,} consultas, {metricas.get('consultas_por_s', 0):,.0f}/s):")
+        print('   ' + '  '.join(f"{nombre}={valor:.4f}" for nombre, valor in metricas.items()
+                                if nombre.startswith(('hit@', 'mrr', 'cobertura@'))))
+
+
+if __name__ == '__main__':
+    from corpus import CorpusPlaylists, escribir_subcorpus
+    from entrenamiento import entrenar
+    from indices_ann import tipos_indice
+    from settings import PARAMS, PARAMS_ANN
+
+    parser = argparse.ArgumentParser(description='Evalúa el modelo sobre playlists reservadas')
+    parser.add_argument('--corpus', default=RUTA_CORPUS)
+    parser.add_argument('--prueba', type=float, default=FRACCION_PRUEBA, help='Fracción de playlists reservadas')
+    parser.add_argument('--epochs', type=int, help='Épocas de Word2Vec (por defecto settings.PARAMS)')
+    parser.add_argument('--contexto', type=int, default=CONTEXTO_SIGUIENTE)
+    parser.add_argument('--max-consultas', type=int, default=MAX_CONSULTAS_EVALUACION)
+    parser.add_argument('--indice', choices=sorted(PARAMS_ANN), help='Compara también con este índice')
+    parser.add_argument('--salida', default=RUTA_REPORTE_EVALUACION)
+    args = parser.parse_args()
+
+    corpus = CorpusPlaylists(args.corpus)
+    entrenamiento, prueba = dividir_corpus(corpus, args.prueba)
+    print(f"✓ {len(entrenamiento)} playlists de entrenamiento, {len(prueba)} reservadas")
+
+    ruta_entrenamiento = f"{args.corpus}.evaluacion"
+    try:
+        params = {**PARAMS, 'epochs': args.epochs or PARAMS['epochs']}
+        modelo, _ = entrenar(escribir_subcorpus(corpus, entrenamiento, ruta_entrenamiento), params)
+    finally:
+        shutil.rmtree(ruta_entrenamiento, ignore_errors=True)
+
+    reporte = {'exacta': evaluar(modelo.wv, corpus, prueba, contexto=args.contexto,
+                                 max_consultas=args.max_consultas)}
+    imprimir_metricas(reporte['exacta'], 'EVALUACIÓN (búsqueda exacta)')
+    if args.indice:
+        vectores, _ = vectores_y_filas(modelo.wv)
+        indice = tipos_indice()[args.indice](vectores, **PARAMS_ANN[args.indice])
+        indice.construir()
+        reporte[args.indice] = evaluar(modelo.wv, corpus, prueba, contexto=args.contexto,
+                                       max_consultas=args.max_consultas, indice=indice)
+        imprimir_metricas(reporte[args.indice], f'EVALUACIÓN (índice {args.indice})')
+
+    os.makedirs(os.path.dirname(args.salida) or '.', exist_ok=True)
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump({'fraccion_prueba': args.prueba, 'epochs': params['epochs'], 'resultados': reporte}, f, indent=2)
+    print(f"\n✓ Reporte guardado en: {args.salida}")
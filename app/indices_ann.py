@@ -0,0 +1,672 @@
+"""
+Índices de vecinos aproximados (ANN) sobre los embeddings de servicio.
+
+Sustituyen el producto punto contra todos los vectores de most_similar cuando
+el vocabulario llega a millones de canciones. Hay dos backends:
+
+    IndiceIVF    Cuantizador grueso k-means: solo se recorren las n_probe
+                 listas más cercanas a la consulta
+    IndiceHNSW   Grafo navegable jerárquico (Hierarchical Navigable Small World)
+
+Los índices cuantizados (int8 y PQ) de cuantizacion.py implementan la misma
+interfaz y se eligen igual, con settings.INDICE_ANN.
+
+Ambos trabajan con los vectores normalizados de Embeddings (similitud coseno
+= producto punto), se guardan en disco y se pueden ajustar en recall/latencia
+(n_probe en IVF, ef_busqueda en HNSW). Al construir un índice se mide su
+recall@k frente a la búsqueda exacta, junto al tiempo de construcción.
+
+Uso:
+    python app/indices_ann.py --tipo ivf
+    python app/indices_ann.py --tipo hnsw --M 16 --listas-construccion 16
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+import shutil
+import time
+import numpy as np
+from embeddings import leer_version, top_k_similares
+from settings import RUTA_EMBEDDINGS, RUTA_INDICE_ANN, PARAMS_ANN
+
+TAM_BLOQUE = 65536  # Filas por bloque al multiplicar matrices grandes
+TAM_BLOQUE_HEURISTICA = 2048  # Nodos por bloque en la selección de vecinos de HNSW
+
+
+def asignar(datos, centroides, esferico=True, tam_bloque=TAM_BLOQUE):
+    """
+    Centroide más cercano de cada fila de `datos`
+
+    Args:
+        datos: Matriz (n, d)
+        centroides: Matriz (k, d)
+        esferico: True = máxima similitud coseno; False = mínima distancia euclídea
+
+    Returns:
+        Array int32 (n,) con el índice del centroide de cada fila
+    """
+    asignacion = np.empty(len(datos), dtype=np.int32)
+    sesgo = None if esferico else -0.5 * np.einsum('ij,ij->i', centroides, centroides)
+    for inicio in range(0, len(datos), tam_bloque):
+        bloque = np.asarray(datos[inicio:inicio + tam_bloque], dtype=np.float32)
+        scores = bloque @ centroides.T
+        if sesgo is not None:
+            scores += sesgo
+        asignacion[inicio:inicio + len(bloque)] = scores.argmax(axis=1)
+    return asignacion
+
+
+def kmeans(datos, k, iteraciones=20, esferico=True, semilla=42):
+    """
+    K-means en NumPy (esférico para vectores normalizados, euclídeo para PQ)
+
+    Args:
+        datos: Matriz (n, d) de entrenamiento
+        k: Número de centroides
+        iteraciones: Iteraciones de Lloyd
+        esferico: Si es True, los centroides se renormalizan a norma 1
+        semilla: Semilla aleatoria
+
+    Returns:
+        Centroides float32 (k, d)
+    """
+    datos = np.asarray(datos, dtype=np.float32)
+    rng = np.random.default_rng(semilla)
+    k = min(k, len(datos))
+    centroides = datos[rng.choice(len(datos), k, replace=False)].copy()
+
+    for _ in range(iteraciones):
+        asignacion = asignar(datos, centroides, esferico)
+        conteos = np.bincount(asignacion, minlength=k)
+        sumas = np.zeros_like(centroides)
+        np.add.at(sumas, asignacion, datos)
+
+        vacios = conteos == 0
+        centroides[~vacios] = sumas[~vacios] / conteos[~vacios, None]
+        # Reiniciar centroides vacíos con puntos aleatorios
+        if vacios.any():
+            centroides[vacios] = datos[rng.choice(len(datos), int(vacios.sum()), replace=False)]
+        if esferico:
+            centroides /= np.maximum(np.linalg.norm(centroides, axis=1, keepdims=True), 1e-12)
+
+    return centroides
+
+
+def top_k(scores, k):
+    """Índices de los k mayores scores, ordenados de mayor a menor"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidatos = np.argpartition(-scores, k - 1)[:k]
+    return candidatos[np.argsort(-scores[candidatos])]
+
+
+class IndiceANN:
+    """
+    Interfaz común de los índices ANN
+
+    Args:
+        vectores: Matriz (n, d) de vectores normalizados (puede ser memory-map)
+    """
+    tipo = None
+    # Parámetro de búsqueda que se barre en el reporte recall@k y sus valores
+    barrido = (None, ())
+
+    def __init__(self, vectores):
+        self.vectores = vectores
+
+    def construir(self):
+        raise NotImplementedError
+
+    def buscar(self, consulta, k):
+        """
+        Vecinos aproximados de un vector
+
+        Returns:
+            Tupla (filas, scores) ordenada de mayor a menor similitud
+        """
+        raise NotImplementedError
+
+    def parametros(self):
+        raise NotImplementedError
+
+    def _guardar_arrays(self, ruta):
+        raise NotImplementedError
+
+    def guardar(self, ruta=RUTA_INDICE_ANN, reporte=None, version_embeddings=None):
+        """
+        Guarda el índice en una carpeta (reemplazo atómico)
+
+        Args:
+            ruta: Carpeta de destino
+            reporte: Reporte recall@k de construir_indice
+            version_embeddings: Versión de los embeddings con los que se construyó
+                (las filas del índice solo valen para esa versión)
+        """
+        ruta_tmp = f"{ruta}.tmp"
+        os.makedirs(ruta_tmp, exist_ok=True)
+        self._guardar_arrays(ruta_tmp)
+        with open(os.path.join(ruta_tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'tipo': self.tipo, 'parametros': self.parametros(), 'version_embeddings': version_embeddings,
+                       'reporte': reporte}, f, indent=2)
+        if os.path.exists(ruta):
+            shutil.rmtree(ruta)
+        os.replace(ruta_tmp, ruta)
+
+
+class IndiceIVF(IndiceANN):
+    """
+    Índice de archivo invertido (IVF) con cuantizador grueso k-means
+
+    Args:
+        vectores: Matriz (n, d) de vectores normalizados
+        n_listas: Número de listas (centroides); por defecto 4·√n
+        n_probe: Listas que se recorren por consulta (más = más recall, más latencia)
+        semilla: Semilla del k-means
+    """
+    tipo = 'ivf'
+    barrido = ('n_probe', (1, 4, 8, 16, 32))
+
+    def __init__(self, vectores, n_listas=None, n_probe=8, semilla=42):
+        super().__init__(vectores)
+        self.n_listas = n_listas or max(1, int(4 * math.sqrt(len(vectores))))
+        self.n_probe = n_probe
+        self.semilla = semilla
+        self.centroides = None
+        self.orden = None    # Filas ordenadas por lista
+        self.offsets = None  # La lista l es orden[offsets[l]:offsets[l+1]]
+
+    def construir(self):
+        n = len(self.vectores)
+        self.n_listas = min(self.n_listas, n)
+        # El k-means se entrena con una muestra (64 puntos por lista bastan)
+        rng = np.random.default_rng(self.semilla)
+        muestra = np.sort(rng.choice(n, min(n, self.n_listas * 64), replace=False))
+        self.centroides = kmeans(self.vectores[muestra], self.n_listas, semilla=self.semilla)
+
+        asignacion = asignar(self.vectores, self.centroides)
+        self.orden = np.argsort(asignacion, kind='stable').astype(np.int32)
+        self.offsets = np.zeros(self.n_listas + 1, dtype=np.int64)
+        np.cumsum(np.bincount(asignacion, minlength=self.n_listas), out=self.offsets[1:])
+        return self
+
+    def buscar(self, consulta, k, n_probe=None):
+        n_probe = min(n_probe or self.n_probe, self.n_listas)
+        listas = top_k(self.centroides @ consulta, n_probe)
+        filas = np.concatenate([self.orden[self.offsets[l]:self.offsets[l + 1]] for l in listas])
+        scores = self.vectores[filas] @ consulta
+        mejores = top_k(scores, k)
+        return filas[mejores], scores[mejores]
+
+    def parametros(self):
+        return {'n_listas': self.n_listas, 'n_probe': self.n_probe, 'semilla': self.semilla}
+
+    def _guardar_arrays(self, ruta):
+        np.save(os.path.join(ruta, 'centroides.npy'), self.centroides)
+        np.save(os.path.join(ruta, 'orden.npy'), self.orden)
+        np.save(os.path.join(ruta, 'offsets.npy'), self.offsets)
+
+    @classmethod
+    def cargar(cls, ruta, vectores, parametros):
+        indice = cls(vectores, **parametros)
+        indice.centroides = np.load(os.path.join(ruta, 'centroides.npy'))
+        indice.orden = np.load(os.path.join(ruta, 'orden.npy'), mmap_mode='r')
+        indice.offsets = np.load(os.path.join(ruta, 'offsets.npy'))
+        return indice
+
+
+class IndiceHNSW(IndiceANN):
+    """
+    Grafo HNSW (Malkov & Yashunin) implementado en NumPy
+
+    La búsqueda es la de HNSW: descenso voraz por los niveles superiores y
+    búsqueda con lista de candidatos ef en el nivel 0. La construcción no
+    inserta nodo a nodo (un recorrido del grafo en Python por inserción no
+    escala a millones de canciones): cada nivel se construye en bloque. Los
+    nodos se reparten en listas con k-means y cada lista se compara con sus
+    `listas_construccion` listas más cercanas con un producto de matrices; de
+    ahí salen las candidatas de cada nodo (sus k vecinos aproximados y la
+    más similar de cada lista vecina). Sobre ellas se aplica la heurística
+    de selección de vecinos de HNSW y se añaden las aristas inversas, con
+    2·M vecinos como mucho en el nivel 0 y M en los superiores.
+
+    Args:
+        vectores: Matriz (n, d) de vectores normalizados
+        M: Vecinos por nodo en los niveles superiores (2·M en el nivel 0)
+        listas_construccion: Listas de k-means vecinas que se comparan al
+            construir (más = grafo más preciso, construcción más lenta)
+        ef_busqueda: Tamaño de la lista de candidatos al buscar (recall/latencia)
+        semilla: Semilla para sortear el nivel de cada nodo y para el k-means
+    """
+    tipo = 'hnsw'
+    barrido = ('ef_busqueda', (16, 32, 64, 128, 256))
+
+    def __init__(self, vectores, M=16, listas_construccion=16, ef_busqueda=64, semilla=42):
+        super().__init__(vectores)
+        self.M = M
+        self.listas_construccion = listas_construccion
+        self.ef_busqueda = ef_busqueda
+        self.semilla = semilla
+        self.vecinos0 = None      # (n, 2M) int32, -1 = hueco
+        self.vecinos_sup = []     # Nivel l >= 1: dict nodo -> array de vecinos
+        self.punto_entrada = -1
+        self.nivel_max = -1
+
+    def _vecinos(self, nodo, nivel):
+        if nivel == 0:
+            vecinos = self.vecinos0[nodo]
+            return vecinos[vecinos >= 0]
+        return self.vecinos_sup[nivel - 1].get(nodo, ())
+
+    def _buscar_capa(self, consulta, entradas, ef, nivel):
+        """Búsqueda voraz con lista de candidatos de tamaño ef en un nivel del grafo"""
+        visitados = set(entradas)
+        scores = self.vectores[list(entradas)] @ consulta
+        candidatos = [(-float(s), int(e)) for s, e in zip(scores, entradas)]
+        resultados = [(float(s), int(e)) for s, e in zip(scores, entradas)]
+        heapq.heapify(candidatos)
+        heapq.heapify(resultados)
+
+        while candidatos:
+            score_neg, actual = heapq.heappop(candidatos)
+            if len(resultados) >= ef and -score_neg < resultados[0][0]:
+                break
+            nuevos = [int(v) for v in self._vecinos(actual, nivel) if v not in visitados]
+            if not nuevos:
+                continue
+            visitados.update(nuevos)
+            for vecino, score in zip(nuevos, (self.vectores[nuevos] @ consulta).tolist()):
+                if len(resultados) < ef or score > resultados[0][0]:
+                    heapq.heappush(candidatos, (-score, vecino))
+                    heapq.heappush(resultados, (score, vecino))
+                    if len(resultados) > ef:
+                        heapq.heappop(resultados)
+
+        return sorted(resultados, reverse=True)
+
+    def _vecinos_aproximados(self, vectores, k):
+        """
+        k vecinos aproximados de cada fila entre las demás filas, más la fila
+        más similar de cada lista de k-means vecina (candidatas lejanas: sin
+        ellas el grafo de un conjunto con grupos separados queda partido)
+
+        Returns:
+            Tupla (filas int32, scores float32), arrays (m, k + listas_construccion)
+            con -1 / -inf en los huecos
+        """
+        m = len(vectores)
+        k = min(k, m - 1)
+        n_listas = int(math.sqrt(m))
+        if n_listas <= self.listas_construccion:
+            # Pocos nodos: vecinos exactos
+            filas, scores = top_k_similares(vectores, vectores, k, excluir=np.arange(m))
+            return filas.astype(np.int32), scores
+
+        rng = np.random.default_rng(self.semilla)
+        muestra = np.sort(rng.choice(m, min(m, n_listas * 64), replace=False))
+        centroides = kmeans(vectores[muestra], n_listas, iteraciones=10, semilla=self.semilla)
+        asignacion = asignar(vectores, centroides)
+        orden = np.argsort(asignacion, kind='stable').astype(np.int32)
+        offsets = np.zeros(n_listas + 1, dtype=np.int64)
+        np.cumsum(np.bincount(asignacion, minlength=n_listas), out=offsets[1:])
+        cercanas = np.argpartition(-(centroides @ centroides.T), self.listas_construccion - 1,
+                                   axis=1)[:, :self.listas_construccion]
+
+        filas = np.full((m, k + self.listas_construccion), -1, dtype=np.int32)
+        scores = np.full(filas.shape, -np.inf, dtype=np.float32)
+        for lista in range(n_listas):
+            miembros = orden[offsets[lista]:offsets[lista + 1]]
+            if len(miembros) == 0:
+                continue
+            segmentos = [orden[offsets[c]:offsets[c + 1]] for c in cercanas[lista]]
+            candidatos = np.concatenate(segmentos)
+            similitudes = np.asarray(vectores[miembros], dtype=np.float32) @ \
+                np.asarray(vectores[candidatos], dtype=np.float32).T
+            similitudes[candidatos[None, :] == miembros[:, None]] = -np.inf
+            k_lista = min(k, len(candidatos) - 1)
+            if k_lista <= 0:
+                continue
+            mejores = np.argpartition(-similitudes, k_lista - 1, axis=1)[:, :k_lista]
+            filas[miembros, :k_lista] = candidatos[mejores]
+            scores[miembros, :k_lista] = np.take_along_axis(similitudes, mejores, axis=1)
+            inicio = 0
+            for j, segmento in enumerate(segmentos):
+                fin = inicio + len(segmento)
+                if fin > inicio:
+                    mejor = inicio + np.argmax(similitudes[:, inicio:fin], axis=1)
+                    filas[miembros, k + j] = candidatos[mejor]
+                    scores[miembros, k + j] = similitudes[np.arange(len(miembros)), mejor]
+                inicio = fin
+        return filas, scores
+
+    def _diversificar(self, vectores, candidatas, maximo):
+        """
+        Heurística de selección de vecinos de HNSW, vectorizada por bloques de nodos
+
+        Cada nodo recorre sus candidatas de más a menos similar y conserva una
+        si es más similar al nodo que a todas las ya conservadas; así quedan
+        aristas hacia otras zonas del espacio en vez de `maximo` vecinos casi
+        idénticos entre sí. Un bucle por posición (no por nodo) y productos de
+        matrices por lotes.
+
+        Args:
+            vectores: Matriz (m, d) de los nodos del nivel
+            candidatas: Matriz (m, c) int32 de filas ordenadas por similitud, -1 = hueco
+            maximo: Vecinos que se conservan como mucho
+
+        Returns:
+            Tupla (filas int32, scores float32), matrices (m, maximo) con -1 / -inf en los huecos
+        """
+        m, ancho = candidatas.shape
+        seleccion = np.full((m, maximo), -1, dtype=np.int32)
+        scores = np.full((m, maximo), -np.inf, dtype=np.float32)
+        for inicio in range(0, m, TAM_BLOQUE_HEURISTICA):
+            fin = min(inicio + TAM_BLOQUE_HEURISTICA, m)
+            bloque = candidatas[inicio:fin]
+            validas = bloque >= 0
+            v_candidatas = np.asarray(vectores[np.where(validas, bloque, 0)], dtype=np.float32)
+            al_nodo = np.einsum('bcd,bd->bc', v_candidatas, np.asarray(vectores[inicio:fin], dtype=np.float32))
+            entre = np.matmul(v_candidatas, v_candidatas.transpose(0, 2, 1))
+            conservadas = np.zeros(bloque.shape, dtype=bool)
+            for j in range(ancho):
+                dominada = np.any(conservadas[:, :j] & (entre[:, j, :j] > al_nodo[:, j, None]), axis=1)
+                conservadas[:, j] = validas[:, j] & ~dominada & (conservadas[:, :j].sum(axis=1) < maximo)
+            # Las conservadas, compactadas a la izquierda en su orden de similitud
+            posicion = np.cumsum(conservadas, axis=1) - 1
+            fila, col = np.nonzero(conservadas)
+            seleccion[inicio + fila, posicion[fila, col]] = bloque[fila, col]
+            scores[inicio + fila, posicion[fila, col]] = al_nodo[fila, col]
+        return seleccion, scores
+
+    @staticmethod
+    def _con_inversas(filas, scores, ancho):
+        """
+        Añade a cada nodo sus aristas inversas y se queda con las `ancho` de
+        mayor score, sin repetidas. Todo con matrices por nodo (las listas de
+        aristas de millones de nodos no caben en memoria con np.unique)
+
+        Args:
+            filas: Matriz (m, c) int32 de vecinos, -1 = hueco
+            scores: Matriz (m, c) float32 de similitudes
+            ancho: Vecinos por nodo en el resultado
+
+        Returns:
+            Tupla (filas int32, scores float32), matrices (m, ancho) ordenadas de
+            mayor a menor score, con -1 / -inf en los huecos
+        """
+        m, c = filas.shape
+        aristas = np.flatnonzero(filas.ravel() >= 0)
+        destino = filas.ravel()[aristas]
+        score = scores.ravel()[aristas]
+        # Aristas agrupadas por destino, de mayor a menor score: las `ancho` primeras de cada destino
+        orden = np.lexsort((-score, destino))
+        destino = destino[orden]
+        posicion = np.arange(len(destino)) - np.searchsorted(destino, destino)
+        quedan = posicion < ancho
+        orden, destino, posicion = orden[quedan], destino[quedan], posicion[quedan]
+        inversas = np.full((m, ancho), -1, dtype=np.int32)
+        scores_inversas = np.full((m, ancho), -np.inf, dtype=np.float32)
+        inversas[destino, posicion] = aristas[orden] // c
+        scores_inversas[destino, posicion] = score[orden]
+        del aristas, score, orden, destino, posicion, quedan
+
+        resultado = np.full((m, ancho), -1, dtype=np.int32)
+        scores_resultado = np.full((m, ancho), -np.inf, dtype=np.float32)
+        for inicio in range(0, m, TAM_BLOQUE):
+            fin = min(inicio + TAM_BLOQUE, m)
+            todas = np.concatenate([filas[inicio:fin], inversas[inicio:fin]], axis=1)
+            s_todas = np.concatenate([scores[inicio:fin], scores_inversas[inicio:fin]], axis=1)
+            # Repetidas (la arista y su inversa): se anula la segunda aparición
+            por_id = np.argsort(todas, axis=1, kind='stable')
+            ids = np.take_along_axis(todas, por_id, axis=1)
+            repetida = np.zeros(todas.shape, dtype=bool)
+            repetida[:, 1:] = ids[:, 1:] == ids[:, :-1]
+            np.put_along_axis(s_todas, por_id, np.where(repetida | (ids < 0), -np.inf,
+                                                        np.take_along_axis(s_todas, por_id, axis=1)), axis=1)
+            mejores = np.argsort(-s_todas, axis=1, kind='stable')[:, :ancho]
+            s_mejores = np.take_along_axis(s_todas, mejores, axis=1)
+            resultado[inicio:fin] = np.where(np.isfinite(s_mejores), np.take_along_axis(todas, mejores, axis=1), -1)
+            scores_resultado[inicio:fin] = s_mejores
+        return resultado, scores_resultado
+
+    def _nivel(self, nodos, maximo):
+        """
+        Vecinos de los nodos de un nivel: candidatas de _vecinos_aproximados
+        más sus aristas inversas, heurística de HNSW, y de nuevo aristas
+        inversas recortadas a `maximo` por nodo
+
+        Returns:
+            Matriz (len(nodos), maximo) int32 de nodos globales, -1 = hueco
+        """
+        m = len(nodos)
+        matriz = np.full((m, maximo), -1, dtype=np.int32)
+        if m < 2:
+            return matriz
+        vectores = self.vectores if m == len(self.vectores) else np.asarray(self.vectores[nodos], dtype=np.float32)
+        filas, scores = self._vecinos_aproximados(vectores, maximo)
+        filas[(filas == np.arange(m)[:, None]) | ~np.isfinite(scores)] = -1
+
+        candidatas, _ = self._con_inversas(filas, scores, 2 * maximo)
+        del filas, scores
+        seleccion, scores = self._diversificar(vectores, candidatas, maximo)
+        del candidatas
+        final, _ = self._con_inversas(seleccion, scores, maximo)
+
+        huecos = final < 0
+        matriz[:] = np.asarray(nodos)[np.where(huecos, 0, final)]
+        matriz[huecos] = -1
+        return matriz
+
+    def construir(self):
+        n = len(self.vectores)
+        rng = np.random.default_rng(self.semilla)
+        mult_nivel = 1 / math.log(max(self.M, 2))
+        niveles = np.floor(-np.log(rng.random(n).clip(1e-12)) * mult_nivel).astype(np.int64)
+        self.nivel_max = int(niveles.max(initial=-1))
+        self.punto_entrada = int(np.argmax(niveles)) if n else -1
+
+        self.vecinos0 = self._nivel(np.arange(n), 2 * self.M)
+        self.vecinos_sup = []
+        for nivel in range(1, self.nivel_max + 1):
+            nodos = np.flatnonzero(niveles >= nivel)
+            matriz = self._nivel(nodos, self.M)
+            self.vecinos_sup.append({int(nodo): fila[fila >= 0] for nodo, fila in zip(nodos.tolist(), matriz)})
+        return self
+
+    def buscar(self, consulta, k, ef_busqueda=None):
+        if self.punto_entrada < 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        consulta = np.asarray(consulta, dtype=np.float32)
+        entrada = self.punto_entrada
+        for nivel in range(self.nivel_max, 0, -1):
+            entrada = self._buscar_capa(consulta, [entrada], 1, nivel)[0][1]
+        encontrados = self._buscar_capa(consulta, [entrada], max(ef_busqueda or self.ef_busqueda, k), 0)[:k]
+        filas = np.asarray([v for _, v in encontrados], dtype=np.int64)
+        scores = np.asarray([s for s, _ in encontrados], dtype=np.float32)
+        return filas, scores
+
+    def parametros(self):
+        return {'M': self.M, 'listas_construccion': self.listas_construccion,
+                'ef_busqueda': self.ef_busqueda, 'semilla': self.semilla}
+
+    def _guardar_arrays(self, ruta):
+        np.save(os.path.join(ruta, 'vecinos0.npy'), self.vecinos0)
+        for nivel, vecinos in enumerate(self.vecinos_sup, 1):
+            nodos = np.asarray(sorted(vecinos), dtype=np.int32)
+            matriz = np.full((len(nodos), self.M), -1, dtype=np.int32)
+            for i, nodo in enumerate(nodos.tolist()):
+                matriz[i, :len(vecinos[nodo])] = vecinos[nodo]
+            np.save(os.path.join(ruta, f"nivel{nivel}_nodos.npy"), nodos)
+            np.save(os.path.join(ruta, f"nivel{nivel}_vecinos.npy"), matriz)
+        with open(os.path.join(ruta, 'grafo.json'), 'w', encoding='utf-8') as f:
+            json.dump({'punto_entrada': int(self.punto_entrada), 'nivel_max': int(self.nivel_max),
+                       'niveles_superiores': len(self.vecinos_sup)}, f)
+
+    @classmethod
+    def cargar(cls, ruta, vectores, parametros):
+        # Los índices construidos nodo a nodo guardaban ef_construction; el grafo es el mismo
+        parametros = {clave: valor for clave, valor in parametros.items() if clave != 'ef_construction'}
+        indice = cls(vectores, **parametros)
+        indice.vecinos0 = np.load(os.path.join(ruta, 'vecinos0.npy'), mmap_mode='r')
+        with open(os.path.join(ruta, 'grafo.json'), 'r', encoding='utf-8') as f:
+            grafo = json.load(f)
+        indice.punto_entrada = grafo['punto_entrada']
+        indice.nivel_max = grafo['nivel_max']
+        # Los niveles superiores tienen ~n/M nodos: se cargan como diccionarios
+        for nivel in range(1, grafo['niveles_superiores'] + 1):
+            nodos = np.load(os.path.join(ruta, f"nivel{nivel}_nodos.npy"))
+            matriz = np.load(os.path.join(ruta, f"nivel{nivel}_vecinos.npy"))
+            indice.vecinos_sup.append({
+                int(nodo): fila[fila >= 0] for nodo, fila in zip(nodos.tolist(), matriz)
+            })
+        return indice
+
+
+def tipos_indice():
+    """Backends disponibles por nombre (incluye los índices cuantizados)"""
+    from cuantizacion import IndiceInt8, IndicePQ
+    return {clase.tipo: clase for clase in (IndiceIVF, IndiceHNSW, IndiceInt8, IndicePQ)}
+
+
+def cargar_indice(vectores, ruta=RUTA_INDICE_ANN, version_embeddings=None):
+    """
+    Abre un índice guardado
+
+    Args:
+        vectores: Matriz de vectores con la que se construyó el índice
+        ruta: Carpeta del índice
+        version_embeddings: Versión de los embeddings de `vectores` (None = no comprobar)
+
+    Returns:
+        Instancia del backend guardado, o None si no existe o es de otra versión
+        de los embeddings
+    """
+    ruta_meta = os.path.join(ruta, 'meta.json')
+    if not os.path.exists(ruta_meta):
+        return None
+    with open(ruta_meta, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if version_embeddings is not None and meta.get('version_embeddings') != version_embeddings:
+        print(f"⚠️  El índice ANN de {ruta} es de otra versión de los embeddings; se ignora")
+        return None
+    return tipos_indice()[meta['tipo']].cargar(ruta, vectores, meta['parametros'])
+
+
+def busqueda_exacta(vectores, consulta, k):
+    """Top-k exacto por producto punto (referencia para medir el recall)"""
+    scores = vectores @ consulta
+    mejores = top_k(scores, k)
+    return mejores, scores[mejores]
+
+
+def evaluar_recall(indice, vectores, k=10, n_consultas=200, semilla=42, **kwargs_busqueda):
+    """
+    Mide recall@k y latencia del índice frente a la búsqueda exacta
+
+    Args:
+        indice: Índice construido
+        vectores: Matriz de vectores
+        k: Vecinos por consulta (sin contar la propia canción)
+        n_consultas: Número de consultas aleatorias
+        **kwargs_busqueda: Parámetros de búsqueda (n_probe, ef_busqueda...)
+
+    Returns:
+        Diccionario con recall, latencias (ms) y aceleración
+    """
+    rng = np.random.default_rng(semilla)
+    consultas = rng.choice(len(vectores), min(n_consultas, len(vectores)), replace=False)
+    aciertos, tiempo_ann, tiempo_exacto = 0, 0.0, 0.0
+
+    for fila in consultas.tolist():
+        consulta = np.asarray(vectores[fila], dtype=np.float32)
+
+        inicio = time.perf_counter()
+        filas_exactas, _ = busqueda_exacta(vectores, consulta, k + 1)
+        tiempo_exacto += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        filas_ann, _ = indice.buscar(consulta, k + 1, **kwargs_busqueda)
+        tiempo_ann += time.perf_counter() - inicio
+
+        exactas = set(filas_exactas.tolist()) - {fila}
+        aproximadas = set(filas_ann.tolist()) - {fila}
+        aciertos += len(exactas & aproximadas)
+
+    n = max(len(consultas), 1)
+    return {
+        'k': k,
+        'consultas': int(len(consultas)),
+        'recall': aciertos / (n * k),
+        'latencia_ann_ms': 1000 * tiempo_ann / n,
+        'latencia_exacta_ms': 1000 * tiempo_exacto / n,
+        'aceleracion': tiempo_exacto / tiempo_ann if tiempo_ann > 0 else None,
+        'busqueda': kwargs_busqueda,
+    }
+
+
+def construir_indice(tipo, vectores, ruta=RUTA_INDICE_ANN, k_recall=10, version_embeddings=None, **parametros):
+    """
+    Construye, evalúa y guarda un índice ANN
+
+    Args:
+        tipo: 'ivf', 'hnsw', 'int8' o 'pq'
+        vectores: Matriz de vectores normalizados
+        ruta: Carpeta de destino
+        k_recall: k del reporte recall@k
+        version_embeddings: Versión de los embeddings de `vectores` (por defecto
+            la guardada en RUTA_EMBEDDINGS)
+        **parametros: Parámetros del índice (por defecto settings.PARAMS_ANN[tipo])
+
+    Returns:
+        Tupla (indice, reporte)
+    """
+    parametros = {**PARAMS_ANN.get(tipo, {}), **parametros}
+    print(f"\n=== CONSTRUYENDO ÍNDICE {tipo.upper()} ({len(vectores)} vectores) ===\n")
+
+    inicio = time.perf_counter()
+    indice = tipos_indice()[tipo](vectores, **parametros).construir()
+    duracion = time.perf_counter() - inicio
+    print(f"✓ Índice construido en {duracion:.1f}s con {indice.parametros()}")
+
+    # Reporte recall@k con distintos valores del parámetro de búsqueda
+    clave, valores = indice.barrido
+    reporte = {'segundos_construccion': duracion, 'barrido': []}
+    print(f"\nBarrido de {clave} (construcción: {duracion:.1f}s, {len(vectores)} vectores)")
+    print(f"\n{'':>4}{clave:>12} {'recall@' + str(k_recall):>10} {'ANN (ms)':>10} {'exacta (ms)':>12}")
+    for valor in valores:
+        resultado = evaluar_recall(indice, vectores, k=k_recall, **{clave: valor})
+        reporte['barrido'].append(resultado)
+        marca = '→' if valor == parametros.get(clave) else ' '
+        print(f"{marca:>4}{valor:>12} {resultado['recall']:>10.3f} "
+              f"{resultado['latencia_ann_ms']:>10.3f} {resultado['latencia_exacta_ms']:>12.3f}")
+
+    if version_embeddings is None:
+        version_embeddings = leer_version()
+    indice.guardar(ruta, reporte, version_embeddings)
+    print(f"\n✓ Índice guardado en: {ruta}/")
+    return indice, reporte
+
+
+if __name__ == '__main__':
+    from embeddings import Embeddings
+
+    parser = argparse.ArgumentParser(description='Construye un índice ANN sobre los embeddings')
+    parser.add_argument('--tipo', choices=sorted(tipos_indice()), default='ivf')
+    parser.add_argument('--n-listas', type=int)
+    parser.add_argument('--n-probe', type=int)
+    parser.add_argument('--M', type=int)
+    parser.add_argument('--listas-construccion', type=int)
+    parser.add_argument('--ef-busqueda', type=int)
+    parser.add_argument('--m', type=int, help='Subespacios de PQ')
+    parser.add_argument('--reordenar', type=int, help='Candidatos que se reordenan con los vectores exactos')
+    args = parser.parse_args()
+
+    nombres = {
+        'ivf': ('n_listas', 'n_probe'), 'hnsw': ('M', 'listas_construccion', 'ef_busqueda'),
+        'int8': ('reordenar',), 'pq': ('m', 'reordenar'),
+    }[args.tipo]
+    parametros = {nombre: getattr(args, nombre) for nombre in nombres if getattr(args, nombre) is not None}
+    embeddings = Embeddings(RUTA_EMBEDDINGS)
+    construir_indice(args.tipo, embeddings.vectores, version_embeddings=embeddings.version, **parametros)
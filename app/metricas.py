@@ -0,0 +1,235 @@
+"""
+Métricas de tiempos por etapa, contadores y exportación en formato Prometheus.
+
+Todas las etapas se registran en un único histograma con la etiqueta
+`etapa` (fetch, tokenizar, entrenar, carga, busqueda, similitud,
+dataframe...). Además de los buckets de Prometheus, cada etapa guarda las
+últimas muestras para calcular p50/p95 en el panel de depuración de la app.
+
+Con METRICAS_ACTIVAS = False (o desactivar()), cronometrar devuelve un
+contexto vacío compartido y los contadores no hacen nada: el coste es una
+comprobación de un booleano.
+
+Uso:
+    with cronometrar('busqueda'):
+        ...
+
+    @cronometrado('similitud')
+    def vecinos(...):
+        ...
+
+    contar('cache_aciertos')
+    exportar_prometheus()                # Texto para /metrics
+    imprimir_resumen()                   # Tabla p50/p95 por etapa en consola
+    servir_metricas(9100)                # Servidor HTTP en un hilo (scripts)
+"""
+import bisect
+import contextlib
+import functools
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from settings import METRICAS_ACTIVAS, METRICAS_LIMITES, METRICAS_MUESTRAS, METRICAS_PREFIJO
+
+_NULO = contextlib.nullcontext()
+
+
+class _SerieTiempos:
+    """Buckets acumulados, suma, total y últimas muestras de una etapa"""
+
+    def __init__(self, limites, muestras):
+        self.buckets = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.total = 0
+        self.muestras = deque(maxlen=muestras)
+
+
+class RegistroMetricas:
+    """
+    Registro de histogramas de etapas y contadores (seguro entre hilos)
+
+    Args:
+        activo: Si es False, no se registra nada
+        limites: Límites superiores de los buckets en segundos
+        muestras: Muestras recientes por etapa para los percentiles
+    """
+
+    def __init__(self, activo=METRICAS_ACTIVAS, limites=METRICAS_LIMITES, muestras=METRICAS_MUESTRAS):
+        self.activo = activo
+        self.limites = tuple(limites)
+        self.muestras = muestras
+        self._etapas = {}
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def observar(self, etapa, segundos):
+        with self._lock:
+            serie = self._etapas.get(etapa)
+            if serie is None:
+                serie = self._etapas[etapa] = _SerieTiempos(self.limites, self.muestras)
+            serie.buckets[bisect.bisect_left(self.limites, segundos)] += 1
+            serie.suma += segundos
+            serie.total += 1
+            serie.muestras.append(segundos)
+
+    def contar(self, nombre, cantidad=1):
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + cantidad
+
+    def reiniciar(self):
+        with self._lock:
+            self._etapas.clear()
+            self._contadores.clear()
+
+    def resumen(self):
+        """
+        Percentiles por etapa y contadores, para mostrar en la app
+
+        Returns:
+            Diccionario {'etapas': {etapa: {total, p50_ms, p95_ms, media_ms}},
+                         'contadores': {...}, 'tasas_acierto': {prefijo: tasa}}
+        """
+        with self._lock:
+            etapas = {etapa: (serie.total, serie.suma, list(serie.muestras))
+                      for etapa, serie in self._etapas.items()}
+            contadores = dict(self._contadores)
+
+        resumen_etapas = {}
+        for etapa, (total, suma, muestras) in sorted(etapas.items()):
+            p50, p95 = np.percentile(np.asarray(muestras) * 1000, [50, 95]) if muestras else (0.0, 0.0)
+            resumen_etapas[etapa] = {'total': total, 'p50_ms': float(p50), 'p95_ms': float(p95),
+                                     'media_ms': 1000 * suma / total if total else 0.0}
+
+        # Tasas de acierto de las parejas <nombre>_aciertos / <nombre>_fallos
+        tasas = {}
+        for nombre, aciertos in contadores.items():
+            if nombre.endswith('_aciertos'):
+                base = nombre[:-len('_aciertos')]
+                total = aciertos + contadores.get(f"{base}_fallos", 0)
+                tasas[base] = aciertos / total if total else 0.0
+        return {'etapas': resumen_etapas, 'contadores': contadores, 'tasas_acierto': tasas}
+
+    def exportar_prometheus(self, prefijo=METRICAS_PREFIJO):
+        """Texto en el formato de exposición de Prometheus"""
+        with self._lock:
+            etapas = {etapa: (list(serie.buckets), serie.suma, serie.total)
+                      for etapa, serie in self._etapas.items()}
+            contadores = dict(self._contadores)
+
+        nombre = f"{prefijo}_etapa_segundos"
+        lineas = [f"# HELP {nombre} Duración de cada etapa en segundos",
+                  f"# TYPE {nombre} histogram"]
+        for etapa, (buckets, suma, total) in sorted(etapas.items()):
+            acumulado = 0
+            for limite, cantidad in zip(self.limites + (float('inf'),), buckets):
+                acumulado += cantidad
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                lineas.append(f'{nombre}_bucket{{etapa="{etapa}",le="{le}"}} {acumulado}')
+            lineas.append(f'{nombre}_sum{{etapa="{etapa}"}} {suma}')
+            lineas.append(f'{nombre}_count{{etapa="{etapa}"}} {total}')
+
+        for contador, valor in sorted(contadores.items()):
+            lineas.append(f"# TYPE {prefijo}_{contador}_total counter")
+            lineas.append(f"{prefijo}_{contador}_total {valor}")
+        return '\n'.join(lineas) + '\n'
+
+
+REGISTRO = RegistroMetricas()
+
+
+class _Cronometro:
+    __slots__ = ('etapa', 'inicio')
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        REGISTRO.observar(self.etapa, time.perf_counter() - self.inicio)
+
+
+def cronometrar(etapa):
+    """Contexto que mide la duración de una etapa (vacío si las métricas están desactivadas)"""
+    return _Cronometro(etapa) if REGISTRO.activo else _NULO
+
+
+def cronometrado(etapa):
+    """Decorador equivalente a envolver la función en cronometrar(etapa)"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not REGISTRO.activo:
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                REGISTRO.observar(etapa, time.perf_counter() - inicio)
+        return envoltura
+    return decorador
+
+
+def contar(nombre, cantidad=1):
+    if REGISTRO.activo:
+        REGISTRO.contar(nombre, cantidad)
+
+
+def activar():
+    REGISTRO.activo = True
+
+
+def desactivar():
+    REGISTRO.activo = False
+
+
+def resumen():
+    return REGISTRO.resumen()
+
+
+def exportar_prometheus():
+    return REGISTRO.exportar_prometheus()
+
+
+def imprimir_resumen():
+    """Tabla de tiempos por etapa (al final de los scripts)"""
+    etapas = resumen()['etapas']
+    if not etapas:
+        return
+    print(f"\n⏱️  {'Etapa':<24}{'n':>8}{'p50 ms':>12}{'p95 ms':>12}{'total s':>12}")
+    for etapa, datos in etapas.items():
+        print(f"   {etapa:<24}{datos['total']:>8}{datos['p50_ms']:>12.2f}{datos['p95_ms']:>12.2f}"
+              f"{datos['media_ms'] * datos['total'] / 1000:>12.2f}")
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        datos = exportar_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, *args):
+        pass
+
+
+def servir_metricas(puerto, host='0.0.0.0'):
+    """
+    Expone /metrics en un hilo en segundo plano (para scripts como data_extractor.py)
+
+    Returns:
+        ThreadingHTTPServer (llamar a shutdown() para detenerlo)
+    """
+    servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    print(f"📈 Métricas en http://{host}:{servidor.server_address[1]}/metrics")
+    return servidor
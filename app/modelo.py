@@ -1,33 +1,102 @@
-import pickle
+import argparse
+import shutil
 import pandas as pd
-from gensim.models import Word2Vec
 import numpy as np
-from settings import PARAMS
+from settings import (INDICE_ANN, MODO_ENTRENAMIENTO, RUTA_CORPUS, RUTA_CHECKPOINT, EPOCHS_CHECKPOINT,
+                      PARADA_TEMPRANA, FRACCION_VALIDACION, PARAMS)
+from corpus import CorpusPlaylists, escribir_subcorpus
+from catalogo import cargar_catalogo
+from embeddings import Embeddings, exportar_embeddings, leer_version
+from indices_ann import construir_indice
+from tabla_vecinos import calcular_tabla_vecinos, actualizar_tabla_vecinos
 from recommendations import print_recommendations
+from entrenamiento import (MODOS, entrenar, reanudar, actualizar, guardar_modelo, existe_modelo,
+                           existe_checkpoint)
+from evaluacion import dividir_corpus
+from metricas import cronometrar, imprimir_resumen
 
-with open('data/datos_tokenizacion.pkl', 'rb') as f:
-    datos = pickle.load(f)
-    playlists_tokenizadas = datos['playlists_tokenizadas']
-    canciones_a_tokens = datos['canciones_a_tokens']
-    tokens_a_canciones = datos['tokens_a_canciones']
-
-# Crear DataFrame con columnas separadas: cancion, artista, token
-songs_df = []
-for token, info in tokens_a_canciones.items():
-    songs_df.append({
-        'cancion': info['cancion'],
-        'artista': info['artista'],
-        'token': token
-    })
-
-songs_df = pd.DataFrame(songs_df)
+parser = argparse.ArgumentParser(description='Entrena Word2Vec y exporta los artefactos de servicio')
+parser.add_argument('--modo', choices=MODOS, default=MODO_ENTRENAMIENTO,
+                    help='corpus_file escala con los núcleos; iterable lee el corpus desde Python')
+parser.add_argument('--workers', type=int, default=None,
+                    help='Hilos de entrenamiento (por defecto, todos los núcleos)')
+parser.add_argument('--actualizar', action='store_true',
+                    help='Parte del modelo guardado y entrena solo las playlists nuevas o modificadas')
+parser.add_argument('--reanudar', action='store_true',
+                    help=f'Continúa un entrenamiento interrumpido desde {RUTA_CHECKPOINT}/')
+parser.add_argument('--parada-temprana', action='store_true', default=PARADA_TEMPRANA,
+                    help='Elige el número de épocas con playlists de validación y reentrena con todas')
+args = parser.parse_args()
+
+# Corpus compacto con memory-map: Word2Vec lo recorre playlist a playlist
+playlists_tokenizadas = CorpusPlaylists()
+
+# Catálogo columnar: columnas cancion, artista, token
+catalogo = cargar_catalogo()
+songs_df = catalogo.a_dataframe()
 print(songs_df)
 
-model = Word2Vec(
-    playlists_tokenizadas, **PARAMS
-)
+# Actualización incremental: build_vocab(update=True) + playlists nuevas y una muestra de repaso
+incremental = args.actualizar and existe_modelo() and leer_version() is not None
+if args.actualizar and not incremental:
+    print("⚠️  No hay modelo guardado para actualizar; se entrena desde cero")
+
+corpus_entrenamiento = playlists_tokenizadas
+if incremental:
+    model, estadisticas_entrenamiento = actualizar(playlists_tokenizadas, modo=args.modo, workers=args.workers)
+else:
+    # Parada temprana: se reserva FRACCION_VALIDACION de las playlists (el reparto es el mismo al
+    # reanudar) solo para elegir el número de épocas; el modelo final se entrena con todas
+    validacion = None
+    if args.parada_temprana:
+        indices_entrenamiento, indices_validacion = dividir_corpus(playlists_tokenizadas, FRACCION_VALIDACION)
+        corpus_entrenamiento = escribir_subcorpus(playlists_tokenizadas, indices_entrenamiento,
+                                                  f"{RUTA_CORPUS}.entrenamiento")
+        validacion = (playlists_tokenizadas, indices_validacion)
+
+    # En modo corpus_file cada worker lee su tramo de corpus.txt (se genera una vez)
+    opciones = {'modo': args.modo, 'workers': args.workers, 'validacion': validacion,
+                'cada_checkpoint': EPOCHS_CHECKPOINT}
+    if args.reanudar and existe_checkpoint():
+        model, estadisticas_entrenamiento = reanudar(corpus_entrenamiento, **opciones)
+    else:
+        if args.reanudar:
+            print("⚠️  No hay checkpoint para reanudar; se entrena desde cero")
+        model, estadisticas_entrenamiento = entrenar(corpus_entrenamiento, **opciones)
+
+    if validacion is not None:
+        epocas = estadisticas_entrenamiento['epoca_mejor'] or PARAMS['epochs']
+        print(f"\n✓ Épocas elegidas con validación: {epocas}; se reentrena con todas las playlists")
+        shutil.rmtree(corpus_entrenamiento.ruta, ignore_errors=True)
+        shutil.rmtree(RUTA_CHECKPOINT, ignore_errors=True)
+        corpus_entrenamiento = playlists_tokenizadas
+        model, estadisticas_entrenamiento = entrenar(playlists_tokenizadas, {**PARAMS, 'epochs': epocas},
+                                                     modo=args.modo, workers=args.workers)
+
+if incremental and estadisticas_entrenamiento is None:
+    imprimir_resumen()
+    raise SystemExit(0)
+
+# Modelo completo (para la próxima actualización) y solo los vectores normalizados para servir;
+# en una actualización se guardan además los tokens cuyo vector cambió
+guardar_modelo(model, corpus_entrenamiento)
+shutil.rmtree(RUTA_CHECKPOINT, ignore_errors=True)
+with cronometrar('exportar_embeddings'):
+    exportar_embeddings(model.wv, anterior=Embeddings() if incremental else None)
+
+# Índice ANN opcional (incluye el reporte recall@k frente a la búsqueda exacta)
+if INDICE_ANN is not None:
+    with cronometrar('indice_ann'):
+        embeddings = Embeddings()
+        construir_indice(INDICE_ANN, embeddings.vectores, version_embeddings=embeddings.version)
 
-with open('model/modelo.pkl', 'wb') as f:
-    pickle.dump(model, f)
+# Vecinos precalculados: las recomendaciones pasan a ser un slice de la tabla. En una
+# actualización solo se recalculan las filas afectadas por los vectores cambiados
+with cronometrar('tabla_vecinos'):
+    if incremental:
+        actualizar_tabla_vecinos(Embeddings())
+    else:
+        calcular_tabla_vecinos(Embeddings())
 
-print(print_recommendations(1))
\ No newline at end of file
+print(print_recommendations(1))
+imprimir_resumen()
@@ -0,0 +1,423 @@
+import threading
+import numpy as np
+from catalogo import cargar_catalogo
+from busqueda import cargar_indice_busqueda
+from embeddings import Embeddings, leer_version
+from indices_ann import cargar_indice
+from tabla_vecinos import cargar_tabla_vecinos
+from sesion import SesionRecomendacion, vector_consulta, recomendar_con_mascara
+from cache_resultados import CacheRecomendaciones
+from metricas import cronometrar, cronometrado
+from settings import (RUTA_CATALOGO, RUTA_EMBEDDINGS, INDICE_ANN, RUTA_INDICE_ANN, RUTA_TABLA_VECINOS,
+                      TAM_LOTE_RECOMENDACIONES, PESO_SEMILLA_NEGATIVA, CACHE_PRECALENTAR)
+
+
+class RecommenderEngine:
+    """
+    Motor de recomendaciones compartido por la app, el script de
+    recomendaciones y cualquier servicio futuro.
+
+    Los artefactos (catálogo y embeddings) se cargan de forma perezosa la
+    primera vez que se necesitan y una sola vez por proceso. La carga está
+    protegida con un lock, así que el motor se puede usar desde varias
+    sesiones concurrentes.
+
+    Args:
+        ruta_catalogo: Carpeta del catálogo columnar
+        ruta_embeddings: Carpeta de los embeddings de servicio
+        usar_indice: Si es True y existe un índice ANN, se usa para buscar vecinos
+        ruta_indice: Carpeta del índice ANN
+        ruta_tabla_vecinos: Carpeta de la tabla de vecinos precalculada
+        cache: CacheRecomendaciones para los resultados (None = sin caché)
+    """
+
+    def __init__(self, ruta_catalogo=RUTA_CATALOGO, ruta_embeddings=RUTA_EMBEDDINGS,
+                 usar_indice=INDICE_ANN is not None, ruta_indice=RUTA_INDICE_ANN,
+                 ruta_tabla_vecinos=RUTA_TABLA_VECINOS, cache=None):
+        self.ruta_catalogo = ruta_catalogo
+        self.ruta_embeddings = ruta_embeddings
+        self.usar_indice = usar_indice
+        self.ruta_indice = ruta_indice
+        self.ruta_tabla_vecinos = ruta_tabla_vecinos
+        self.cache = cache
+        self._lock = threading.RLock()
+        self._catalogo = None
+        self._embeddings = None
+        self._songs_df = None
+        self._busqueda = None
+        self._indice = None
+        self._indice_cargado = False
+        self._tabla_vecinos = None
+        self._tabla_cargada = False
+
+    @property
+    def catalogo(self):
+        if self._catalogo is None:
+            with self._lock:
+                if self._catalogo is None:
+                    with cronometrar('carga_catalogo'):
+                        self._catalogo = cargar_catalogo(self.ruta_catalogo)
+        return self._catalogo
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    with cronometrar('carga_embeddings'):
+                        self._embeddings = Embeddings(self.ruta_embeddings)
+        return self._embeddings
+
+    @property
+    def indice(self):
+        """Índice ANN (IVF o HNSW) o None si no está activado, no se ha construido o es de otros embeddings"""
+        if not self._indice_cargado:
+            with self._lock:
+                if not self._indice_cargado:
+                    if self.usar_indice:
+                        embeddings = self.embeddings
+                        with cronometrar('carga_indice_ann'):
+                            self._indice = cargar_indice(embeddings.vectores, self.ruta_indice, embeddings.version)
+                    self._indice_cargado = True
+        return self._indice
+
+    @property
+    def tabla_vecinos(self):
+        """Tabla de vecinos precalculada o None si no existe o es de otros embeddings"""
+        if not self._tabla_cargada:
+            with self._lock:
+                if not self._tabla_cargada:
+                    embeddings = self.embeddings
+                    with cronometrar('carga_tabla_vecinos'):
+                        self._tabla_vecinos = cargar_tabla_vecinos(embeddings, self.ruta_tabla_vecinos)
+                    self._tabla_cargada = True
+        return self._tabla_vecinos
+
+    @property
+    def busqueda(self):
+        """Índice de búsqueda por nombre (trigramas + prefijos, ver busqueda.py)"""
+        if self._busqueda is None:
+            with self._lock:
+                if self._busqueda is None:
+                    catalogo = self.catalogo
+                    with cronometrar('carga_busqueda'):
+                        self._busqueda = cargar_indice_busqueda(catalogo)
+        return self._busqueda
+
+    @property
+    def songs_df(self):
+        """DataFrame con columnas cancion, artista, token (para búsquedas por nombre)"""
+        if self._songs_df is None:
+            with self._lock:
+                if self._songs_df is None:
+                    self._songs_df = self.catalogo.a_dataframe()
+        return self._songs_df
+
+    def cargar(self):
+        """Fuerza la carga de todos los artefactos (útil para precalentar un proceso)"""
+        self.catalogo, self.embeddings, self.indice, self.tabla_vecinos, self.busqueda
+        return self
+
+    def recargar(self, conservar_cache=False):
+        """
+        Descarta los artefactos cargados; se vuelven a abrir en el próximo uso.
+        La caché de resultados se vacía (sus claves son de la versión anterior)
+        salvo con conservar_cache=True
+        """
+        with self._lock:
+            if self.cache is not None and not conservar_cache:
+                self.cache.invalidar()
+            self._catalogo = None
+            self._embeddings = None
+            self._songs_df = None
+            self._busqueda = None
+            self._indice = None
+            self._indice_cargado = False
+            self._tabla_vecinos = None
+            self._tabla_cargada = False
+
+    def actualizar_si_cambia(self):
+        """
+        Recarga los artefactos si en disco hay una versión nueva de los
+        embeddings (p. ej. tras reentrenar con modelo.py)
+
+        Si la versión nueva es una actualización incremental de la cargada y
+        la tabla de vecinos se actualizó con ella, la caché conserva las
+        entradas de los tokens cuyos vecinos no cambiaron
+
+        Returns:
+            True si se recargó
+        """
+        embeddings = self._embeddings
+        if embeddings is None or leer_version(self.ruta_embeddings) in (None, embeddings.version):
+            return False
+        version_anterior = embeddings.version
+        with self._lock:
+            self.recargar(conservar_cache=True)
+            if self.cache is not None:
+                tabla = self.tabla_vecinos
+                afectados = None
+                if tabla is not None and self.cache.top_n <= tabla.k:
+                    afectados = tabla.afectados_desde(version_anterior)
+                if afectados is None:
+                    self.cache.invalidar()
+                else:
+                    self.cache.migrar(version_anterior, self.embeddings.version, afectados)
+        return True
+
+    @cronometrado('busqueda')
+    def buscar(self, query, limite=None):
+        """
+        Busca canciones por nombre (parcial o completo), sin distinguir
+        mayúsculas ni tildes
+
+        Args:
+            query: Nombre de la canción a buscar (str)
+            limite: Máximo de resultados (None = todos)
+
+        Returns:
+            Lista de diccionarios con cancion, artista y token, empezando por
+            los títulos que comienzan por la consulta y por popularidad
+        """
+        catalogo = self.catalogo
+        return [catalogo.info(token) for token in self.busqueda.buscar(query, limite).tolist()]
+
+    def sugerencias(self, query, limite=10):
+        """Sugerencias mientras se escribe (las `limite` mejores coincidencias)"""
+        return self.buscar(query, limite)
+
+    def contiene(self, token):
+        """Comprueba si un token existe en el catálogo"""
+        return self.catalogo.contiene(token)
+
+    def en_vocabulario(self, token):
+        """Comprueba si un token tiene embedding en el modelo"""
+        return self.embeddings.contiene(token)
+
+    def precalentar(self, n=CACHE_PRECALENTAR):
+        """
+        Llena la caché con las `n` canciones más populares del catálogo
+        (calculadas en lote con recomendar_muchos)
+
+        Returns:
+            Número de tokens añadidos a la caché
+        """
+        if self.cache is None or n <= 0:
+            return 0
+        popularidades = np.asarray(self.catalogo.popularidades)
+        embeddings = self.embeddings
+        tokens = np.argsort(-popularidades, kind='stable')
+        tokens = tokens[(tokens < len(embeddings.filas))]
+        tokens = tokens[embeddings.filas[tokens] >= 0][:min(n, self.cache.capacidad)]
+
+        consultas, vecinos, scores = self.recomendar_muchos(tokens.tolist(), self.cache.top_n)
+        version = embeddings.version
+        for token, fila_vecinos, fila_scores in zip(consultas.tolist(), vecinos, scores):
+            validos = fila_vecinos >= 0
+            self.cache.guardar(version, token, list(zip(fila_vecinos[validos].tolist(),
+                                                        fila_scores[validos].astype(float).tolist())))
+        return len(consultas)
+
+    def vecinos(self, token, top_n=5):
+        """
+        Tokens más similares a un token. Por orden de preferencia: caché de
+        resultados, tabla precalculada (si top_n <= K), índice ANN, búsqueda exacta
+
+        Returns:
+            Lista de tuplas (token, similitud) ordenada de mayor a menor
+        """
+        cache = self.cache
+        if cache is None or top_n > cache.top_n:
+            return self._calcular_vecinos(token, top_n)
+
+        version = self.embeddings.version
+        similares = cache.obtener(version, token, top_n)
+        if similares is None:
+            similares = self._calcular_vecinos(token, cache.top_n)
+            cache.guardar(version, token, similares)
+        return similares[:top_n]
+
+    @cronometrado('similitud')
+    def _calcular_vecinos(self, token, top_n):
+        tabla = self.tabla_vecinos
+        if tabla is not None and top_n <= tabla.k:
+            tokens, scores = tabla.consultar(self.embeddings.fila(token), top_n)
+            return list(zip(tokens.tolist(), scores.astype(float).tolist()))
+
+        indice = self.indice
+        if indice is None:
+            return self.embeddings.most_similar(token, topn=top_n)
+
+        embeddings = self.embeddings
+        fila = embeddings.fila(token)
+        filas, scores = indice.buscar(embeddings.vectores[fila], top_n + 1)
+        return [
+            (int(embeddings.claves[f]), float(score))
+            for f, score in zip(filas.tolist(), scores.tolist()) if f != fila
+        ][:top_n]
+
+    @cronometrado('recomendacion')
+    def recomendar(self, token, top_n=5):
+        """
+        Canciones más similares a un token
+
+        Args:
+            token: Token de la canción
+            top_n: Número de recomendaciones
+
+        Returns:
+            DataFrame con cancion, artista, token y similitud (ordenado),
+            o None si el token no está en el vocabulario
+        """
+        if not self.en_vocabulario(token):
+            return None
+
+        # most_similar ya devuelve los resultados ordenados por similitud
+        return self._a_dataframe(self.vecinos(token, top_n))
+
+    @cronometrado('dataframe')
+    def _a_dataframe(self, similares):
+        """DataFrame cancion, artista, token, similitud a partir de tuplas (token, score) ordenadas"""
+        catalogo = self.catalogo
+        tokens_similares = [t for t, score in similares if catalogo.contiene(t)]
+        scores_similares = dict(similares)
+
+        recomendaciones = catalogo.a_dataframe(tokens_similares)
+        recomendaciones['similitud'] = recomendaciones['token'].map(scores_similares)
+        return recomendaciones
+
+    def nueva_sesion(self):
+        """SesionRecomendacion vacía sobre los embeddings del motor (ver sesion.py)"""
+        return SesionRecomendacion(self.embeddings)
+
+    def sesion_vigente(self, sesion):
+        """
+        La sesión tal cual si se creó con los embeddings cargados; si no (el motor
+        se recargó con otra versión), trasladada a los embeddings actuales
+        """
+        if sesion is None or sesion.version == self.embeddings.version:
+            return sesion
+        return sesion.trasladar(self.embeddings)
+
+    def recomendar_desde(self, sesion, top_n=5):
+        """
+        Recomendaciones de una SesionRecomendacion mantenida por el llamador
+
+        Returns:
+            DataFrame con cancion, artista, token y similitud (ordenado)
+        """
+        tokens, scores = sesion.recomendar(top_n)
+        return self._a_dataframe(list(zip(tokens.tolist(), scores.tolist())))
+
+    def recomendar_sesion(self, semillas, pesos=None, negativas=(), vistas=(), top_n=5):
+        """
+        Canciones similares a un conjunto de canciones
+
+        Args:
+            semillas: Tokens de las canciones de partida
+            pesos: Peso de cada semilla (por defecto 1)
+            negativas: Tokens que restan a la consulta
+            vistas: Tokens que no se deben recomendar (además de las semillas)
+            top_n: Número de recomendaciones
+
+        Returns:
+            DataFrame con cancion, artista, token y similitud (ordenado),
+            o None si ninguna semilla está en el vocabulario
+        """
+        embeddings = self.embeddings
+        pesos = [1.0] * len(semillas) if pesos is None else list(pesos)
+        negativas = list(negativas)
+        tokens = np.asarray(list(semillas) + negativas, dtype=np.int64)
+        pesos = np.asarray(pesos + [PESO_SEMILLA_NEGATIVA] * len(negativas), dtype=np.float32)
+
+        _, filas = self.resolver(tokens)
+        validas = filas >= 0
+        if not validas[:len(semillas)].any():
+            return None
+
+        consulta = vector_consulta(embeddings, filas[validas], pesos[validas])
+        excluidas = np.zeros(len(embeddings), dtype=bool)
+        excluidas[filas[validas]] = True
+        _, filas_vistas = self.resolver(list(vistas))
+        excluidas[filas_vistas[filas_vistas >= 0]] = True
+
+        tokens_similares, scores = recomendar_con_mascara(embeddings, consulta, excluidas, top_n)
+        return self._a_dataframe(list(zip(tokens_similares.tolist(), scores.tolist())))
+
+    def resolver(self, consultas):
+        """
+        Filas de Embeddings de varias consultas
+
+        Args:
+            consultas: Tokens (int) o nombres de canción (str, se usa la primera coincidencia)
+
+        Returns:
+            Tupla (tokens, filas): arrays int32 / int64, -1 donde la consulta no se resuelve
+        """
+        tokens = np.full(len(consultas), -1, dtype=np.int32)
+        for i, consulta in enumerate(consultas):
+            if isinstance(consulta, str):
+                coincidencias = self.buscar(consulta)
+                if coincidencias:
+                    tokens[i] = coincidencias[0]['token']
+            elif isinstance(consulta, (int, np.integer)):
+                tokens[i] = consulta
+
+        embeddings = self.embeddings
+        filas = np.full(len(tokens), -1, dtype=np.int64)
+        validos = (tokens >= 0) & (tokens < len(embeddings.filas))
+        filas[validos] = embeddings.filas[tokens[validos]]
+        return tokens, filas
+
+    @cronometrado('recomendacion_lote')
+    def recomendar_muchos(self, consultas, top_n=5, tam_lote=TAM_LOTE_RECOMENDACIONES):
+        """
+        Recomendaciones para muchas consultas a la vez (feeds, puntuar semillas...)
+
+        Todas las consultas se resuelven primero y se responden por lotes: con
+        la tabla de vecinos si top_n <= K (un único indexado), o apilando sus
+        vectores y resolviendo cada lote con productos de matrices y top-k por
+        filas. No se construyen DataFrames: el resultado son arrays compactos.
+
+        Args:
+            consultas: Lista de tokens (int) o nombres de canción (str)
+            top_n: Recomendaciones por consulta
+            tam_lote: Consultas por producto de matrices (acota la memoria)
+
+        Returns:
+            Tupla (tokens, vecinos, scores):
+                tokens   int32 (q,): token de cada consulta, -1 si no se encontró
+                vecinos  int32 (q, top_n): tokens recomendados, -1 si no hay
+                scores   float32 (q, top_n): similitud, NaN si no hay
+        """
+        tokens, filas = self.resolver(consultas)
+        embeddings = self.embeddings
+        top_n = min(top_n, len(embeddings) - 1)
+        vecinos = np.full((len(filas), top_n), -1, dtype=np.int32)
+        scores = np.full((len(filas), top_n), np.nan, dtype=np.float32)
+
+        validas = np.flatnonzero(filas >= 0)
+        tabla = self.tabla_vecinos
+        for inicio in range(0, len(validas), tam_lote):
+            lote = validas[inicio:inicio + tam_lote]
+            if tabla is not None and top_n <= tabla.k:
+                vecinos[lote] = tabla.vecinos[filas[lote], :top_n]
+                scores[lote] = tabla.scores[filas[lote], :top_n]
+            else:
+                vecinos[lote], scores[lote] = embeddings.most_similar_lote(filas[lote], top_n)
+
+        return tokens, vecinos, scores
+
+
+_motor = None
+_lock_motor = threading.Lock()
+
+
+def obtener_motor():
+    """Devuelve el RecommenderEngine único del proceso (se crea en el primer uso)"""
+    global _motor
+    if _motor is None:
+        with _lock_motor:
+            if _motor is None:
+                _motor = RecommenderEngine(cache=CacheRecomendaciones())
+    return _motor
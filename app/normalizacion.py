@@ -0,0 +1,131 @@
+"""
+Normalización por columnas de los tracks descargados.
+
+Los items de la API se aplanan una sola vez en columnas (una lista por
+campo en lugar de un diccionario por canción) y la limpieza se aplica con
+operaciones de texto vectorizadas de pandas sobre la columna completa:
+
+    aplanar_tracks        items de cada playlist -> DataFrame (una fila por track)
+    limpiar_parentesis_serie
+                          Equivalente de utils.limpiar_parentesis para una Serie
+    normalizar_canciones  Columnas del CSV de canciones (nombres limpios, en
+                          formato título, artistas separados por comas)
+
+Los nombres se repiten mucho (la misma canción en muchas playlists), así que
+cada columna se factoriza y la limpieza se hace una vez por valor distinto.
+Los artistas de cada track se guardan unidos por SEPARADOR_ARTISTAS (un
+carácter que no aparece en los nombres ni cuenta como espacio), de modo que
+la limpieza y el .title() se aplican a todos a la vez sin mezclar el
+contenido de artistas distintos.
+
+Uso:
+    tracks, invalidos = aplanar_tracks([(genero, playlist_info), ...], tracks_por_playlist)
+    df_canciones = normalizar_canciones(tracks)
+"""
+import numpy as np
+import pandas as pd
+
+SEPARADOR_ARTISTAS = '\x01'  # No es espacio para \s y no corta los textos al factorizar (como '\x00')
+
+# Mismas expresiones que utils.limpiar_parentesis
+PATRON_PARENTESIS = r'\s*\([^)]*\)'
+PATRON_ESPACIOS = r'\s+'
+
+
+def aplanar_tracks(playlists, tracks_por_playlist, verbose=False):
+    """
+    Aplana los items de varias playlists en columnas
+
+    Args:
+        playlists: Lista de tuplas (genero, playlist_info) en el orden del crawl
+            (una misma playlist puede aparecer en varios géneros)
+        tracks_por_playlist: Diccionario playlist_id -> items de la API
+        verbose: Si es True, avisa de las playlists que no se pudieron leer
+
+    Returns:
+        Tupla (tracks, invalidos): DataFrame con una fila por track válido y
+        las columnas bloque (índice en `playlists`), genero, playlist,
+        playlist_id, nombre, artistas (unidos por SEPARADOR_ARTISTAS, sin
+        limpiar), popularidad e id; y el conjunto de bloques cuyos items no
+        se pudieron leer (no aportan filas)
+    """
+    bloques, nombres, artistas, popularidades, ids = [], [], [], [], []
+    invalidos = set()
+    for bloque, (_, playlist_info) in enumerate(playlists):
+        items = tracks_por_playlist.get(playlist_info['id']) or []
+        try:
+            validos = [item['track'] for item in items if item and item['track']]
+            columnas = (
+                [track['name'] or '' for track in validos],
+                [SEPARADOR_ARTISTAS.join([artista['name'] or '' for artista in track['artists']]) for track in validos],
+                [track.get('popularity') for track in validos],
+                [track.get('id') for track in validos],
+            )
+        except (KeyError, TypeError) as e:
+            if verbose:
+                print(f"  ✗ Items inválidos en la playlist {playlist_info.get('name')}: {e}")
+            invalidos.add(bloque)
+            continue
+        for destino, valores in zip((nombres, artistas, popularidades, ids), columnas):
+            destino.extend(valores)
+        bloques.append(np.full(len(validos), bloque, dtype=np.int64))
+
+    filas = np.concatenate(bloques) if bloques else np.zeros(0, dtype=np.int64)
+    # Columnas por playlist: un valor por bloque, repetido en cada una de sus filas
+    generos = np.asarray([genero for genero, _ in playlists], dtype=object)
+    nombres_playlist = np.asarray([info['name'] for _, info in playlists], dtype=object)
+    ids_playlist = np.asarray([info['id'] for _, info in playlists], dtype=object)
+    tracks = pd.DataFrame({
+        'bloque': filas,
+        'genero': generos[filas],
+        'playlist': nombres_playlist[filas],
+        'playlist_id': ids_playlist[filas],
+        'nombre': pd.Series(nombres, dtype=object),
+        'artistas': pd.Series(artistas, dtype=object),
+        'popularidad': pd.array(np.asarray(popularidades, dtype=np.float64), dtype='Int64'),  # None -> NA
+        'id': pd.Series(ids, dtype=object),
+    })
+    return tracks, invalidos
+
+
+def limpiar_parentesis_serie(serie):
+    """Elimina paréntesis y su contenido de cada texto de una Serie (ver utils.limpiar_parentesis)"""
+    return (serie.str.replace(PATRON_PARENTESIS, '', regex=True)
+                 .str.replace(PATRON_ESPACIOS, ' ', regex=True)
+                 .str.strip())
+
+
+def _limpiar_artistas(artistas):
+    """limpiar_parentesis(nombre.title()) de cada artista, unidos por ', '"""
+    separador = SEPARADOR_ARTISTAS
+    return (artistas.str.title()
+                    .str.replace(rf'\s*\([^){separador}]*\)', '', regex=True)
+                    .str.replace(PATRON_ESPACIOS, ' ', regex=True)
+                    .str.replace(r'^ | $', '', regex=True)
+                    .str.replace(rf' ?{separador} ?', ', ', regex=True))
+
+
+def por_valores_unicos(serie, funcion):
+    """Aplica `funcion` (de Serie a Serie) solo a los valores distintos y la expande a todas las filas"""
+    codigos, unicos = pd.factorize(serie)
+    resultado = funcion(pd.Series(unicos, dtype=object)).to_numpy(dtype=object)[codigos]
+    return pd.Series(resultado, index=serie.index, dtype=object)
+
+
+def normalizar_canciones(tracks):
+    """
+    Columnas del CSV de canciones a partir de aplanar_tracks
+
+    Returns:
+        DataFrame con genero, playlist, cancion, artista, popularidad, id y
+        playlist_id (nombres sin paréntesis y en formato título)
+    """
+    return pd.DataFrame({
+        'genero': tracks['genero'],
+        'playlist': por_valores_unicos(tracks['playlist'], lambda serie: serie.str.title()),
+        'cancion': por_valores_unicos(tracks['nombre'], lambda serie: limpiar_parentesis_serie(serie).str.title()),
+        'artista': por_valores_unicos(tracks['artistas'], _limpiar_artistas),
+        'popularidad': tracks['popularidad'],
+        'id': tracks['id'],
+        'playlist_id': tracks['playlist_id'],
+    })
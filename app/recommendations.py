@@ -1,25 +1,4 @@
-import pickle
-import pandas as pd
-
-with open('data/datos_tokenizacion.pkl', 'rb') as f:
-    datos = pickle.load(f)
-    playlists_tokenizadas = datos['playlists_tokenizadas']
-    canciones_a_tokens = datos['canciones_a_tokens']
-    tokens_a_canciones = datos['tokens_a_canciones']
-
-# Crear DataFrame con columnas separadas: cancion, artista, token
-songs_df = []
-for token, info in tokens_a_canciones.items():
-    songs_df.append({
-        'cancion': info['cancion'],
-        'artista': info['artista'],
-        'token': token
-    })
-
-songs_df = pd.DataFrame(songs_df)
-
-with open('model/modelo.pkl', 'rb') as f:
-    model = pickle.load(f)
+from motor import obtener_motor
 
 def buscar_cancion(query):
     """
@@ -31,17 +10,8 @@ def buscar_cancion(query):
     Returns:
         Lista de diccionarios con coincidencias encontradas
     """
-    query_lower = query.lower().strip()
-    
     # Buscar coincidencias parciales en el nombre de la canción
-    coincidencias = songs_df[
-        songs_df['cancion'].str.lower().str.contains(query_lower, na=False)
-    ]
-    
-    if coincidencias.empty:
-        return []
-    
-    return coincidencias.to_dict('records')
+    return obtener_motor().buscar(query)
 
 
 def seleccionar_cancion(query):
@@ -56,7 +26,7 @@ def seleccionar_cancion(query):
     """
     # Si ya es un token (int), retornarlo directamente
     if isinstance(query, int):
-        if query in songs_df['token'].values:
+        if obtener_motor().contiene(query):
             return query
         else:
             print(f"❌ Token {query} no encontrado en el vocabulario")
@@ -104,6 +74,8 @@ def print_recommendations(query, top_n=5, auto_select=True):
     Returns:
         DataFrame con las canciones recomendadas
     """
+    motor = obtener_motor()
+    
     # Obtener token
     if isinstance(query, str):
         song_id = seleccionar_cancion(query)
@@ -111,38 +83,24 @@ def print_recommendations(query, top_n=5, auto_select=True):
             return None
     else:
         song_id = query
-        if song_id not in songs_df['token'].values:
+        if not motor.contiene(song_id):
             print(f"❌ Token {song_id} no encontrado")
             return None
     
     # Verificar que el token existe en el modelo
-    if song_id not in model.wv:
+    if not motor.en_vocabulario(song_id):
         print(f"❌ Token {song_id} no está en el vocabulario del modelo")
         return None
     
-    # Obtener canciones similares con sus scores
-    similar_songs = model.wv.most_similar(positive=[song_id], topn=top_n)
-    
-    # Extraer tokens y scores
-    tokens_similares = [int(token) for token, score in similar_songs]
-    scores_similares = {int(token): score for token, score in similar_songs}
-    
-    # Filtrar DataFrame
-    recomendaciones = songs_df[songs_df.token.isin(tokens_similares)].copy()
-    
-    # Agregar columna de similitud
-    recomendaciones['similitud'] = recomendaciones['token'].map(scores_similares)
-    
-    # Ordenar por similitud
-    recomendaciones = recomendaciones.sort_values('similitud', ascending=False)
+    # Obtener canciones similares con sus scores (ya ordenadas por similitud)
+    recomendaciones = motor.recomendar(song_id, top_n=top_n)
     
     # Mostrar canción original
-    cancion_original = songs_df[songs_df['token'] == song_id][['cancion', 'artista']]
-    if not cancion_original.empty:
-        print(f"\n{'='*80}")
-        print(f"🎵 Canción original:")
-        print(f"   '{cancion_original.iloc[0]['cancion'].title()}' - {cancion_original.iloc[0]['artista']}")
-        print(f"   Token: {song_id}")
+    cancion_original = motor.catalogo.info(song_id)
+    print(f"\n{'='*80}")
+    print(f"🎵 Canción original:")
+    print(f"   '{cancion_original['cancion'].title()}' - {cancion_original['artista']}")
+    print(f"   Token: {song_id}")
     
     print(f"\n✨ Top {top_n} recomendaciones:\n")
     
@@ -153,6 +111,7 @@ def print_recommendations(query, top_n=5, auto_select=True):
     
     return recomendaciones
 
-print(print_recommendations(1))
-print_recommendations("tití me preguntó", top_n=5)
-print_recommendations("el sol", top_n=5)
\ No newline at end of file
+if __name__ == "__main__":
+    print(print_recommendations(1))
+    print_recommendations("tití me preguntó", top_n=5)
+    print_recommendations("el sol", top_n=5)
\ No newline at end of file
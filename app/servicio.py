@@ -0,0 +1,319 @@
+"""
+Servicio HTTP asíncrono de recomendaciones (API REST con JSON).
+
+Servidor de asyncio sin dependencias externas sobre el RecommenderEngine
+compartido del proceso. Las peticiones de recomendación que llegan en una
+ventana de pocos milisegundos se agrupan en un micro-lote y se resuelven
+con una sola llamada a recomendar_muchos (un producto de matrices para
+todo el lote), en un hilo aparte para no bloquear el bucle de eventos.
+
+Endpoints:
+    GET  /salud                                  Estado y versión del modelo
+    GET  /buscar?q=<texto>&limite=10             Canciones por nombre
+    GET  /recomendar?token=<int>&top_n=5         Recomendaciones de una canción
+    GET  /recomendar?q=<texto>&top_n=5           (por nombre: primera coincidencia)
+    POST /sesion                                 Recomendaciones de varias semillas
+         {"semillas": [...], "pesos": [...], "negativas": [...], "vistas": [...], "top_n": 5}
+    GET  /metrics                                Métricas en formato Prometheus (texto)
+
+top_n y limite deben ser enteros positivos (400 si no) y se recortan a
+SERVICIO_MAX_TOP_N: el micro-lote se resuelve con el mayor top_n del lote.
+En /sesion, semillas, negativas y vistas deben ser listas de tokens y pesos
+una lista de números con uno por semilla (400 si no).
+
+Uso:
+    python app/servicio.py --puerto 8000
+"""
+import argparse
+import asyncio
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from motor import obtener_motor
+from metricas import cronometrar, exportar_prometheus
+from settings import SERVICIO_HOST, SERVICIO_PUERTO, MICROLOTE_ESPERA_MS, MICROLOTE_MAX, SERVICIO_MAX_TOP_N
+
+MENSAJES_ESTADO = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                   500: 'Internal Server Error'}
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class MicroLoteador:
+    """
+    Agrupa peticiones de recomendación concurrentes en lotes
+
+    El primer pedido de un lote programa su ejecución tras `espera_ms`; los
+    que llegan mientras tanto se suman al mismo lote. Si el lote llega a
+    `max_lote` se ejecuta enseguida. Los lotes se calculan de uno en uno en
+    un hilo dedicado, así que mientras se resuelve uno se va llenando el
+    siguiente.
+
+    Args:
+        motor: RecommenderEngine
+        espera_ms: Ventana de agrupación en milisegundos
+        max_lote: Máximo de consultas por lote
+    """
+
+    def __init__(self, motor, espera_ms=MICROLOTE_ESPERA_MS, max_lote=MICROLOTE_MAX):
+        self.motor = motor
+        self.espera = espera_ms / 1000
+        self.max_lote = max_lote
+        self._pendientes = []
+        self._temporizador = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='microlote')
+        self.lotes = 0
+        self.consultas = 0
+
+    async def recomendar(self, consulta, top_n):
+        """
+        Recomendaciones de una consulta (token o nombre), resueltas en lote
+
+        Returns:
+            Tupla (token, vecinos, scores) de la fila de esta consulta
+        """
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendientes.append((consulta, top_n, futuro))
+        if len(self._pendientes) >= self.max_lote:
+            self._despachar()
+        elif self._temporizador is None:
+            self._temporizador = asyncio.get_running_loop().call_later(self.espera, self._despachar)
+        return await futuro
+
+    def _despachar(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        lote, self._pendientes = self._pendientes, []
+        if lote:
+            asyncio.ensure_future(self._resolver(lote))
+
+    async def _resolver(self, lote):
+        consultas = [consulta for consulta, _, _ in lote]
+        top_n = max(n for _, n, _ in lote)
+        loop = asyncio.get_running_loop()
+        try:
+            tokens, vecinos, scores = await loop.run_in_executor(
+                self._executor, self.motor.recomendar_muchos, consultas, top_n
+            )
+        except Exception as e:
+            for _, _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        self.lotes += 1
+        self.consultas += len(lote)
+        for i, (_, n, futuro) in enumerate(lote):
+            if not futuro.done():
+                futuro.set_result((int(tokens[i]), vecinos[i, :n], scores[i, :n]))
+
+
+class ServicioRecomendaciones:
+    """
+    Servidor HTTP/1.1 mínimo (keep-alive, cuerpos JSON) sobre asyncio
+
+    Args:
+        motor: RecommenderEngine (por defecto, el compartido del proceso)
+        espera_ms, max_lote: Parámetros del micro-lote
+    """
+
+    def __init__(self, motor=None, espera_ms=MICROLOTE_ESPERA_MS, max_lote=MICROLOTE_MAX):
+        self.motor = motor or obtener_motor()
+        self.loteador = MicroLoteador(self.motor, espera_ms, max_lote)
+        self.rutas = {
+            ('GET', '/salud'): self.salud,
+            ('GET', '/buscar'): self.buscar,
+            ('GET', '/recomendar'): self.recomendar,
+            ('POST', '/sesion'): self.sesion,
+            ('GET', '/metrics'): self.metricas,
+        }
+
+    def _cancion(self, token, similitud=None):
+        info = self.motor.catalogo.info(token)
+        if similitud is not None:
+            info['similitud'] = round(float(similitud), 6)
+        return info
+
+    # ---------- Endpoints ----------
+
+    async def salud(self, params, cuerpo):
+        return {'estado': 'ok', 'version_modelo': self.motor.embeddings.version,
+                'lotes': self.loteador.lotes, 'consultas_en_lote': self.loteador.consultas}
+
+    async def buscar(self, params, cuerpo):
+        query = params.get('q')
+        if not query:
+            raise ErrorHTTP(400, "Falta el parámetro 'q'")
+        return {'resultados': self.motor.sugerencias(query, _positivo(params, 'limite', 10))}
+
+    async def recomendar(self, params, cuerpo):
+        if 'token' in params:
+            consulta = _entero(params, 'token')
+        elif params.get('q'):
+            consulta = params['q']
+        else:
+            raise ErrorHTTP(400, "Falta el parámetro 'token' o 'q'")
+        top_n = _positivo(params, 'top_n', 5)
+
+        token, vecinos, scores = await self.loteador.recomendar(consulta, top_n)
+        if token < 0 or not self.motor.en_vocabulario(token):
+            raise ErrorHTTP(404, f"Canción no encontrada en el modelo: {consulta}")
+        return {
+            'cancion': self._cancion(token),
+            'recomendaciones': [
+                self._cancion(t, s) for t, s in zip(vecinos.tolist(), scores.tolist())
+                if t >= 0 and self.motor.contiene(t)
+            ],
+        }
+
+    async def sesion(self, params, cuerpo):
+        semillas = _tokens(cuerpo, 'semillas')
+        if not semillas:
+            raise ErrorHTTP(400, "'semillas' debe ser una lista de tokens")
+        negativas = _tokens(cuerpo, 'negativas')
+        vistas = _tokens(cuerpo, 'vistas')
+        pesos = cuerpo.get('pesos')
+        if pesos is not None and (not isinstance(pesos, list) or len(pesos) != len(semillas)
+                                  or not all(_es_numero(p) for p in pesos)):
+            raise ErrorHTTP(400, "'pesos' debe ser una lista de números, uno por semilla")
+        top_n = _positivo(cuerpo, 'top_n', 5)
+        loop = asyncio.get_running_loop()
+        recomendaciones = await loop.run_in_executor(None, lambda: self.motor.recomendar_sesion(
+            semillas, pesos=pesos, negativas=negativas, vistas=vistas, top_n=top_n,
+        ))
+        if recomendaciones is None:
+            raise ErrorHTTP(404, 'Ninguna semilla está en el vocabulario del modelo')
+        return {'recomendaciones': recomendaciones.to_dict('records')}
+
+    async def metricas(self, params, cuerpo):
+        # Texto plano: atender() lo envía sin pasar por JSON
+        return exportar_prometheus()
+
+    # ---------- HTTP ----------
+
+    async def atender(self, lector, escritor):
+        """Atiende una conexión (varias peticiones si el cliente usa keep-alive)"""
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                metodo, destino, _ = linea.decode('latin-1').split(' ', 2)
+                cabeceras = {}
+                while (linea := await lector.readline()) not in (b'\r\n', b'\n', b''):
+                    nombre, _, valor = linea.decode('latin-1').partition(':')
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                cuerpo = await lector.readexactly(int(cabeceras.get('content-length', 0)))
+
+                estado, respuesta = await self._despachar(metodo, destino, cuerpo)
+                if isinstance(respuesta, str):
+                    datos, tipo = respuesta.encode('utf-8'), 'text/plain; version=0.0.4'
+                else:
+                    datos, tipo = json.dumps(respuesta, ensure_ascii=False).encode('utf-8'), 'application/json'
+                cerrar = cabeceras.get('connection', '').lower() == 'close'
+                escritor.write(
+                    f"HTTP/1.1 {estado} {MENSAJES_ESTADO[estado]}\r\n"
+                    f"Content-Type: {tipo}; charset=utf-8\r\n"
+                    f"Content-Length: {len(datos)}\r\n"
+                    f"Connection: {'close' if cerrar else 'keep-alive'}\r\n\r\n".encode('latin-1') + datos
+                )
+                await escritor.drain()
+                if cerrar:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _despachar(self, metodo, destino, cuerpo):
+        url = urlsplit(destino)
+        params = {clave: valores[-1] for clave, valores in parse_qs(url.query).items()}
+        manejador = self.rutas.get((metodo, url.path))
+        try:
+            if manejador is None:
+                if any(ruta == url.path for _, ruta in self.rutas):
+                    raise ErrorHTTP(405, f"Método {metodo} no permitido en {url.path}")
+                raise ErrorHTTP(404, f"Ruta no encontrada: {url.path}")
+            try:
+                datos = json.loads(cuerpo) if cuerpo else {}
+            except ValueError:  # JSONDecodeError o bytes que no son UTF-8
+                raise ErrorHTTP(400, 'El cuerpo no es JSON válido')
+            if not isinstance(datos, dict):
+                raise ErrorHTTP(400, 'El cuerpo debe ser un objeto JSON')
+            with cronometrar(f"http{url.path.replace('/', '_')}"):
+                return 200, await manejador(params, datos)
+        except ErrorHTTP as e:
+            return e.estado, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+
+    async def iniciar(self, host=SERVICIO_HOST, puerto=SERVICIO_PUERTO):
+        """Arranca el servidor (los artefactos del motor se cargan antes de aceptar conexiones)"""
+        await asyncio.get_running_loop().run_in_executor(None, self.motor.cargar)
+        return await asyncio.start_server(self.atender, host, puerto)
+
+
+def _es_entero(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _es_numero(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool) and math.isfinite(valor)
+
+
+def _tokens(cuerpo, nombre):
+    """Lista de tokens (enteros) del cuerpo JSON, vacía si falta; 400 si no lo es"""
+    valor = cuerpo.get(nombre, [])
+    if not isinstance(valor, list) or not all(_es_entero(t) for t in valor):
+        raise ErrorHTTP(400, f"'{nombre}' debe ser una lista de tokens")
+    return valor
+
+
+def _entero(params, nombre, defecto=None):
+    """Entero de la query (texto) o del cuerpo JSON (solo int); 400 si no lo es"""
+    valor = params.get(nombre, defecto)
+    if isinstance(valor, str):
+        try:
+            return int(valor)
+        except ValueError:
+            pass
+    elif _es_entero(valor):
+        return valor
+    raise ErrorHTTP(400, f"El parámetro '{nombre}' debe ser un entero")
+
+
+def _positivo(params, nombre, defecto, maximo=SERVICIO_MAX_TOP_N):
+    """Entero >= 1 recortado a `maximo` (un valor enorme frenaría todo su micro-lote)"""
+    valor = _entero(params, nombre, defecto)
+    if valor < 1:
+        raise ErrorHTTP(400, f"El parámetro '{nombre}' debe ser mayor que 0")
+    return min(valor, maximo)
+
+
+async def servir(host=SERVICIO_HOST, puerto=SERVICIO_PUERTO, **kwargs):
+    servicio = ServicioRecomendaciones(**kwargs)
+    servidor = await servicio.iniciar(host, puerto)
+    direccion = servidor.sockets[0].getsockname()
+    print(f"🎧 Servicio de recomendaciones en http://{direccion[0]}:{direccion[1]}")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servicio HTTP de recomendaciones')
+    parser.add_argument('--host', default=SERVICIO_HOST)
+    parser.add_argument('--puerto', type=int, default=SERVICIO_PUERTO)
+    parser.add_argument('--espera-ms', type=float, default=MICROLOTE_ESPERA_MS)
+    parser.add_argument('--max-lote', type=int, default=MICROLOTE_MAX)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(servir(args.host, args.puerto, espera_ms=args.espera_ms, max_lote=args.max_lote))
+    except KeyboardInterrupt:
+        print("\n👋 Servicio detenido")
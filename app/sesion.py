@@ -0,0 +1,130 @@
+"""
+Recomendaciones a partir de varias canciones (sesión del usuario).
+
+La consulta de una sesión es la suma ponderada de los vectores de sus
+semillas: positivas (favoritos, búsquedas) y negativas (canciones que el
+usuario descartó). Las semillas y las canciones ya vistas se excluyen con
+una máscara booleana sobre las filas de Embeddings, antes del top-k.
+
+SesionRecomendacion mantiene la suma de forma incremental: agregar o quitar
+una semilla cuesta O(d), sin recalcular a partir de todas las demás.
+"""
+import numpy as np
+from indices_ann import top_k
+from settings import PESO_SEMILLA_NEGATIVA
+
+
+def vector_consulta(embeddings, filas, pesos):
+    """
+    Suma ponderada de los vectores de varias filas, normalizada
+
+    Args:
+        embeddings: Embeddings de servicio
+        filas: Array (s,) de filas de la matriz de vectores
+        pesos: Array (s,) de pesos (negativos para semillas negativas)
+
+    Returns:
+        Vector float32 (d,) con norma 1 (o ceros si las semillas se anulan)
+    """
+    suma = np.asarray(pesos, dtype=np.float32) @ np.asarray(embeddings.vectores[filas], dtype=np.float32)
+    norma = np.linalg.norm(suma)
+    return suma / norma if norma > 0 else suma
+
+
+def recomendar_con_mascara(embeddings, consulta, excluidas, top_n):
+    """
+    Top-n de una consulta excluyendo las filas marcadas en la máscara
+
+    Args:
+        embeddings: Embeddings de servicio
+        consulta: Vector (d,)
+        excluidas: Array booleano (n,) sobre las filas de Embeddings
+        top_n: Número de resultados
+
+    Returns:
+        Tupla (tokens int32, scores float32) de mayor a menor
+    """
+    scores = embeddings.vectores @ consulta
+    scores[excluidas] = -np.inf
+    mejores = top_k(scores, min(top_n, int(len(scores) - excluidas.sum())))
+    return np.asarray(embeddings.claves)[mejores], scores[mejores]
+
+
+class SesionRecomendacion:
+    """
+    Consulta de una sesión con semillas ponderadas y actualización incremental
+
+    Args:
+        embeddings: Embeddings de servicio
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.version = embeddings.version
+        self.suma = np.zeros(embeddings.vectores.shape[1], dtype=np.float32)
+        self.pesos = {}  # token -> peso acumulado en la suma
+        self.vistas = np.zeros(len(embeddings), dtype=bool)
+
+    def __len__(self):
+        return len(self.pesos)
+
+    def agregar(self, token, peso=1.0):
+        """
+        Suma una semilla a la consulta (peso negativo = semilla negativa)
+
+        Returns:
+            True si el token está en el vocabulario
+        """
+        fila = self.embeddings.fila(token)
+        if fila < 0:
+            return False
+        self.suma += peso * np.asarray(self.embeddings.vectores[fila], dtype=np.float32)
+        self.pesos[token] = self.pesos.get(token, 0.0) + peso
+        self.vistas[fila] = True
+        return True
+
+    def agregar_negativa(self, token, peso=PESO_SEMILLA_NEGATIVA):
+        return self.agregar(token, peso)
+
+    def quitar(self, token):
+        """Resta una semilla de la consulta (sigue marcada como vista)"""
+        peso = self.pesos.pop(token, None)
+        if peso is not None:
+            self.suma -= peso * np.asarray(self.embeddings.vector(token), dtype=np.float32)
+
+    def marcar_vista(self, token):
+        """Excluye un token de las recomendaciones sin cambiar la consulta"""
+        fila = self.embeddings.fila(token)
+        if fila >= 0:
+            self.vistas[fila] = True
+
+    def trasladar(self, embeddings):
+        """
+        Misma sesión sobre otros embeddings (p. ej. tras reentrenar): semillas y
+        vistas se conservan por token y la suma se recalcula con los vectores
+        nuevos (las semillas que ya no están en el vocabulario se descartan)
+
+        Returns:
+            SesionRecomendacion nueva
+        """
+        nueva = SesionRecomendacion(embeddings)
+        for token in np.asarray(self.embeddings.claves)[self.vistas].tolist():
+            nueva.marcar_vista(token)
+        for token, peso in self.pesos.items():
+            nueva.agregar(token, peso)
+        return nueva
+
+    def consulta(self):
+        norma = np.linalg.norm(self.suma)
+        return self.suma / norma if norma > 0 else self.suma
+
+    def recomendar(self, top_n=10):
+        """
+        Recomendaciones de la sesión
+
+        Returns:
+            Tupla (tokens, scores) de mayor a menor (vacía si no hay semillas)
+        """
+        if not self.pesos:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        return recomendar_con_mascara(self.embeddings, self.consulta(), self.vistas, top_n)
@@ -1,5 +1,133 @@
 LIMIT_PLAYLISTS = 40
 
+# Datos tokenizados y checkpoint del crawl incremental
+RUTA_DATOS_TOKENIZACION = 'data/datos_tokenizacion.pkl'
+RUTA_CHECKPOINT_TOKENIZACION = 'data/checkpoint_tokenizacion.pkl'
+CHECKPOINT_CADA = 20  # Playlists tokenizadas entre checkpoints
+VERBOSIDAD_EXTRACCION = 1  # data_extractor: 0 = resúmenes, 1 = por playlist, 2 = por canción
+
+# Corpus compacto de playlists tokenizadas (tokens int32 + offsets, memory-map)
+RUTA_CORPUS = 'data/corpus'
+
+# Catálogo columnar de canciones (token = índice de fila, memory-map)
+RUTA_CATALOGO = 'data/catalogo'
+
+# Artefacto de servicio: vectores normalizados float32 (memory-map)
+RUTA_EMBEDDINGS = 'model/embeddings'
+
+# Índice de vecinos aproximados: None (búsqueda exacta), 'ivf', 'hnsw',
+# o embeddings cuantizados 'int8' / 'pq' (con reordenado exacto)
+INDICE_ANN = None
+RUTA_INDICE_ANN = 'model/indice_ann'
+PARAMS_ANN = {
+    'ivf': {'n_listas': None, 'n_probe': 8},                         # n_listas None = 4·√n
+    'hnsw': {'M': 16, 'listas_construccion': 16, 'ef_busqueda': 64},
+    'int8': {'reordenar': 50},                                       # 4x menos memoria
+    'pq': {'m': 16, 'k_sub': 256, 'reordenar': 100},                 # m bytes por vector
+}
+RUTA_REPORTE_CUANTIZACION = 'model/reporte_cuantizacion.json'
+
+# Tabla precalculada de vecinos (recomendaciones con top_n <= K en O(1))
+RUTA_TABLA_VECINOS = 'model/vecinos'
+K_TABLA_VECINOS = 50
+BLOQUE_FILAS_VECINOS = 1024       # Filas por tarea
+BLOQUE_COLUMNAS_VECINOS = 16384   # Columnas por producto (≈64 MB por hilo en float32)
+WORKERS_TABLA_VECINOS = None      # None = todos los núcleos
+TAM_LOTE_RECOMENDACIONES = 1024   # Consultas por lote en recomendar_muchos
+
+# Recomendaciones de sesión (varias semillas)
+PESO_SEMILLA_NEGATIVA = -0.5      # Peso por defecto de las canciones descartadas
+
+# Caché LRU de resultados (clave: versión del modelo + token)
+CACHE_RESULTADOS_CAPACIDAD = 10000  # Tokens en caché
+CACHE_RESULTADOS_TOP_N = 50         # Vecinos guardados por token (top_n menores = slice)
+CACHE_PRECALENTAR = 1000            # Canciones más populares que se calculan al arrancar
+
+# Benchmarks con corpus sintético (benchmark.py)
+RUTA_BENCHMARK_RESULTADOS = 'model/benchmark.json'   # Última ejecución (depende de la máquina, no se versiona)
+RUTA_BENCHMARK_BASELINE = 'benchmarks/baseline.json'  # Línea base versionada en el repositorio
+UMBRAL_REGRESION = 0.20           # Empeorar más de un 20% es una regresión
+UMBRALES_REGRESION = {            # Umbrales por etapa o por 'etapa.métrica'
+    'busqueda': 0.50,             # Latencias de submilisegundos: más ruido
+    'recomendacion': 0.50,
+}
+RUIDO_MINIMO = {'segundos': 0.05, 'ms': 0.2}  # Diferencias absolutas menores no cuentan
+
+# Servicio HTTP de recomendaciones (servicio.py)
+SERVICIO_HOST = '127.0.0.1'
+SERVICIO_PUERTO = 8000
+MICROLOTE_ESPERA_MS = 2           # Ventana en la que se agrupan peticiones concurrentes
+MICROLOTE_MAX = 256               # Máximo de consultas por micro-lote
+SERVICIO_MAX_TOP_N = 100          # top_n / limite máximos por petición (mayores se recortan)
+
+# Métricas de tiempos por etapa (metricas.py)
+METRICAS_ACTIVAS = True           # False = cronometrar/contar no hacen nada
+METRICAS_PREFIJO = 'recomendador' # Prefijo de los nombres en la exportación Prometheus
+METRICAS_MUESTRAS = 1024          # Últimas muestras por etapa para p50/p95
+METRICAS_LIMITES = (              # Buckets del histograma (segundos)
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 30, 60, 300, 900,
+)
+METRICAS_PUERTO = 9100            # /metrics de los scripts (data_extractor.py, modelo.py)
+
+# Entrenamiento de Word2Vec (entrenamiento.py)
+MODO_ENTRENAMIENTO = 'corpus_file'  # 'corpus_file' (escala con los núcleos) o 'iterable'
+
+# Actualización incremental del modelo (python app/modelo.py --actualizar)
+RUTA_MODELO_COMPLETO = 'model/word2vec'  # Modelo con estado de entrenamiento + huellas del corpus
+EPOCHS_ACTUALIZACION = 5            # Épocas sobre las playlists nuevas o modificadas
+REPLAY_ACTUALIZACION = 1.0          # Playlists antiguas repasadas por cada nueva (limita la deriva)
+
+# Evaluación offline sobre playlists reservadas (evaluacion.py)
+FRACCION_PRUEBA = 0.1               # Playlists reservadas para evaluar
+KS_EVALUACION = (1, 5, 10, 20)      # hit-rate@k y cobertura@k
+CONTEXTO_SIGUIENTE = 1              # Canciones previas que forman la consulta de "siguiente canción"
+MAX_CONSULTAS_EVALUACION = 100_000  # Muestra máxima de consultas por tarea
+BLOQUE_CONSULTAS_EVALUACION = 1024  # Consultas por producto de matrices
+RUTA_REPORTE_EVALUACION = 'model/evaluacion.json'
+
+# Seguimiento por época: checkpoints y parada temprana (entrenamiento.py)
+EPOCHS_CHECKPOINT = 5               # Checkpoint del modelo cada N épocas (None = nunca)
+RUTA_CHECKPOINT = 'model/checkpoint'
+PARADA_TEMPRANA = False             # Elige las épocas por el hit-rate de validación (--parada-temprana)
+FRACCION_VALIDACION = 0.02          # Playlists reservadas para la parada temprana
+METRICA_PARADA = 'hit@10'           # Métrica de la tarea 'siguiente' de evaluacion.py
+PACIENCIA_PARADA = 3                # Épocas sin mejora antes de parar
+MEJORA_MINIMA_PARADA = 0.001        # Mejora absoluta mínima para contar como mejora
+CONSULTAS_VALIDACION = 5_000        # Consultas por evaluación de validación
+
+# Barrido de hiperparámetros sobre PARAMS (barrido.py)
+ESPACIO_BARRIDO = {
+    'vector_size': [64, 128, 256],
+    'window': [3, 5, 10],
+    'negative': [5, 15],
+    'epochs': [5, 10, 20],
+}
+PROCESOS_BARRIDO = None             # None = un proceso por cada 2 núcleos
+METRICA_BARRIDO = 'siguiente.hit@10'  # Métrica de evaluacion.py con la que se ordena
+CONSULTAS_BARRIDO = 20_000          # Consultas por tarea al evaluar cada candidato
+RUTA_BARRIDO = 'model/barrido.csv'
+
+# Caché en disco de respuestas crudas de la API de Spotify
+RUTA_CACHE = 'data/cache'
+
+# Crawler concurrente de playlists
+CRAWL_MAX_WORKERS = 8              # Hilos descargando playlists en paralelo
+CRAWL_PETICIONES_POR_SEGUNDO = 10  # Ritmo del token bucket compartido
+CRAWL_MAX_REINTENTOS = 5           # Reintentos ante respuestas 429
+
+# Cliente HTTP de la API de Spotify (cliente_spotify.py)
+SPOTIFY_POOL_CONEXIONES = CRAWL_MAX_WORKERS  # Conexiones keep-alive por host (una por hilo)
+SPOTIFY_TIMEOUT = (3.05, 15)       # Segundos de conexión y de lectura por petición
+SPOTIFY_REINTENTOS = 3             # Reintentos de GET ante errores de red y respuestas 5xx
+SPOTIFY_BACKOFF = 0.5              # Espera base del backoff exponencial (s)
+SPOTIFY_BACKOFF_JITTER = 0.5       # Segundos aleatorios añadidos a cada espera
+RUTA_TOKEN_SPOTIFY = 'data/.token_spotify.json'  # Token client-credentials compartido entre procesos
+
+# Descubrimiento de playlists por género (crawler.descubrir_playlists)
+RUTA_GENEROS = 'generos.json'      # {"generos": [...]} con los géneros a buscar
+OBJETIVO_PLAYLISTS_GENERO = 50     # Playlists por género (se pagina /search con offset)
+
 PARAMS = {
     'vector_size': 128,      # ✅ Mayor dimensionalidad = más información semántica
     'window': 5,             # ✅ Contexto razonable para playlists (5 canciones alrededor)
@@ -9,7 +137,8 @@ PARAMS = {
     'ns_exponent': 0.75,     # ✅ Exponente de sampling (estándar)
     'epochs': 20,            # ✅ Más épocas = mejor convergencia
     'seed': 42,              # ✅ Reproducibilidad
-    'workers': 4,            # ✅ Paralelización
+    'workers': None,         # ✅ None = todos los núcleos disponibles (ver entrenamiento.py)
     'alpha': 0.025,          # ✅ Learning rate inicial
     'min_alpha': 0.0001,     # ✅ Learning rate final
-}
\ No newline at end of file
+    'compute_loss': True,    # ✅ Pérdida por época en el log (coste despreciable)
+}
@@ -0,0 +1,240 @@
+"""
+Servidor HTTP local que imita la API de Spotify (paginación, búsqueda de
+playlists y respuestas 429) para probar y medir el crawler sin conexión.
+
+Uso:
+    python app/spotify_falso.py --playlists 200 --canciones 450 --workers 16
+    python app/spotify_falso.py --generos 13 --objetivo 50     # Descubrimiento por género
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, quote
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+
+RUTA_TRACKS = re.compile(r'^/v1/playlists/(?P<id>[0-9A-Za-z]+)/(tracks|items)$')
+RUTA_BUSQUEDA = '/v1/search'
+
+
+def canciones_por_playlist(playlist_id, media=300):
+    """Número de canciones determinista para una playlist falsa"""
+    semilla = int(hashlib.md5(playlist_id.encode('utf-8')).hexdigest()[:8], 16)
+    return media // 2 + semilla % media
+
+
+def track_falso(playlist_id, posicion, tamano_catalogo=5000):
+    """Genera un item de playlist con la misma forma que la API real"""
+    semilla = int(hashlib.md5(f"{playlist_id}:{posicion}".encode('utf-8')).hexdigest()[:8], 16)
+    numero = semilla % tamano_catalogo
+    return {
+        'track': {
+            'id': f"track{numero}",
+            'name': f"Canción {numero}",
+            'artists': [{'name': f"Artista {numero % 500}"}],
+            'popularity': numero % 100,
+        }
+    }
+
+
+def playlist_busqueda(consulta, posicion, total_playlists=2000):
+    """
+    Resultado de búsqueda determinista: los ids salen de un conjunto común a
+    todas las consultas (hay repetidas entre géneros), algunos nombres no
+    contienen el término buscado y algunos resultados vienen vacíos (None)
+    """
+    semilla = int(hashlib.md5(f"{consulta}:{posicion}".encode('utf-8')).hexdigest()[:8], 16)
+    if semilla % 20 == 0:
+        return None
+    numero = semilla % total_playlists
+    nombre = f"Éxitos {numero}" if semilla % 7 == 0 else f"{consulta} Mix {numero}"
+    return {
+        'id': f"busqueda{numero}",
+        'name': nombre,
+        'snapshot_id': f"snap{numero}",
+        'owner': {'id': 'spotify' if numero % 5 == 0 else f"usuario{numero % 97}"},
+    }
+
+
+class SpotifyFalso(ThreadingHTTPServer):
+    """
+    Servidor con un límite global de peticiones por segundo: al superarlo
+    responde 429 con cabecera Retry-After, igual que la API real.
+    """
+    daemon_threads = True
+
+    def __init__(self, direccion, limite_por_segundo=50, retry_after=1, media_canciones=300,
+                 resultados_busqueda=300):
+        super().__init__(direccion, ManejadorSpotifyFalso)
+        self.limite_por_segundo = limite_por_segundo
+        self.retry_after = retry_after
+        self.media_canciones = media_canciones
+        self.resultados_busqueda = resultados_busqueda
+        self.peticiones = 0
+        self.respuestas_429 = 0
+        self._ventana = (0, 0)  # (segundo, peticiones en ese segundo)
+        self._lock = threading.Lock()
+
+    @property
+    def url_base(self):
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}/v1/"
+
+    def admitir(self):
+        """Devuelve False si la petición supera el límite de la ventana actual"""
+        with self._lock:
+            self.peticiones += 1
+            segundo = int(time.monotonic())
+            inicio, cuenta = self._ventana
+            cuenta = cuenta + 1 if inicio == segundo else 1
+            self._ventana = (segundo, cuenta)
+            if cuenta > self.limite_por_segundo:
+                self.respuestas_429 += 1
+                return False
+            return True
+
+
+class ManejadorSpotifyFalso(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, estado, cuerpo, cabeceras=None):
+        datos = json.dumps(cuerpo).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, str(valor))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        if not self.server.admitir():
+            self._responder(
+                429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                {'Retry-After': self.server.retry_after}
+            )
+            return
+
+        coincidencia = RUTA_TRACKS.match(url.path)
+        if coincidencia:
+            self._responder(200, self._pagina_tracks(coincidencia['id'], parse_qs(url.query)))
+            return
+
+        if url.path == RUTA_BUSQUEDA:
+            self._responder(200, self._pagina_busqueda(parse_qs(url.query)))
+            return
+
+        self._responder(404, {'error': {'status': 404, 'message': 'Not found'}})
+
+    def _pagina_tracks(self, playlist_id, parametros):
+        offset = int(parametros.get('offset', ['0'])[0])
+        limit = min(int(parametros.get('limit', ['100'])[0]), 100)
+        total = canciones_por_playlist(playlist_id, self.server.media_canciones)
+
+        fin = min(offset + limit, total)
+        base = f"{self.server.url_base}playlists/{playlist_id}/items"
+        return {
+            'href': f"{base}?offset={offset}&limit={limit}",
+            'items': [track_falso(playlist_id, posicion) for posicion in range(offset, fin)],
+            'limit': limit,
+            'offset': offset,
+            'total': total,
+            'next': f"{base}?offset={fin}&limit={limit}" if fin < total else None,
+            'previous': None,
+        }
+
+
+    def _pagina_busqueda(self, parametros):
+        consulta = parametros.get('q', [''])[0]
+        offset = int(parametros.get('offset', ['0'])[0])
+        limit = min(int(parametros.get('limit', ['10'])[0]), 50)
+        total = self.server.resultados_busqueda
+
+        fin = min(offset + limit, total)
+        base = f"{self.server.url_base}search?query={quote(consulta)}&type=playlist"
+        return {
+            'playlists': {
+                'href': f"{base}&offset={offset}&limit={limit}",
+                'items': [playlist_busqueda(consulta, posicion) for posicion in range(offset, fin)],
+                'limit': limit,
+                'offset': offset,
+                'total': total,
+                'next': f"{base}&offset={fin}&limit={limit}" if fin < total else None,
+                'previous': None,
+            }
+        }
+
+
+def iniciar_servidor(puerto=0, **kwargs):
+    """Arranca el servidor falso en un hilo y lo devuelve (puerto 0 = libre)"""
+    servidor = SpotifyFalso(('127.0.0.1', puerto), **kwargs)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    return servidor
+
+
+def cliente_falso(servidor):
+    """
+    Cliente de cliente_spotify (mismo pool, reintentos y métricas) apuntando al
+    servidor falso; los 429 llegan al crawler igual que con la API real
+    """
+    from cliente_spotify import crear_cliente
+
+    return crear_cliente(auth='token-falso', prefijo=servidor.url_base)
+
+
+if __name__ == '__main__':
+    from crawler import TokenBucket, descargar_playlists, descubrir_playlists
+
+    parser = argparse.ArgumentParser(description='Benchmark del crawler contra un Spotify falso')
+    parser.add_argument('--playlists', type=int, default=200)
+    parser.add_argument('--canciones', type=int, default=300, help='Media de canciones por playlist')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--tasa', type=float, default=100, help='Peticiones/s del token bucket')
+    parser.add_argument('--limite-servidor', type=int, default=80, help='Peticiones/s antes de responder 429')
+    parser.add_argument('--generos', type=int, default=None,
+                        help='Mide el descubrimiento de playlists con este número de géneros falsos')
+    parser.add_argument('--objetivo', type=int, default=50, help='Playlists a descubrir por género')
+    args = parser.parse_args()
+
+    servidor = iniciar_servidor(limite_por_segundo=args.limite_servidor, media_canciones=args.canciones)
+    if args.generos is not None:
+        generos = [f"Genero{i}" for i in range(args.generos)]
+        playlists_generos, estadisticas = descubrir_playlists(
+            generos, args.objetivo, sp=cliente_falso(servidor), max_workers=args.workers,
+            bucket=TokenBucket(args.tasa), usar_cache=False
+        )
+        cortos = [genero for genero, playlists in playlists_generos.items() if len(playlists) < args.objetivo]
+        print(f"✓ Playlists únicas: {sum(len(playlists) for playlists in playlists_generos.values())} "
+              f"({len(generos)} géneros x objetivo {args.objetivo})")
+        print(f"✓ Géneros por debajo del objetivo tras quitar repetidas: {len(cortos)}")
+        print(f"✓ Búsqueda: {estadisticas.resumen()}")
+        print(f"✓ Servidor: {servidor.peticiones} peticiones, {servidor.respuestas_429} respondidas con 429")
+        servidor.shutdown()
+        raise SystemExit(0)
+
+    playlists = [{'id': f"falsa{i}", 'name': f"Falsa {i}"} for i in range(args.playlists)]
+
+    tracks_por_playlist, estadisticas = descargar_playlists(
+        playlists, sp=cliente_falso(servidor), max_workers=args.workers,
+        bucket=TokenBucket(args.tasa), usar_cache=False
+    )
+
+    incompletas = [
+        playlist_id for playlist_id, items in tracks_por_playlist.items()
+        if len(items) != canciones_por_playlist(playlist_id, args.canciones)
+    ]
+    print(f"✓ Playlists descargadas: {len(tracks_por_playlist)}/{len(playlists)}")
+    print(f"✓ Canciones: {sum(len(items) for items in tracks_por_playlist.values())}")
+    print(f"✓ Crawl: {estadisticas.resumen()}")
+    print(f"✓ Servidor: {servidor.peticiones} peticiones, {servidor.respuestas_429} respondidas con 429")
+    if incompletas:
+        print(f"✗ Playlists incompletas: {len(incompletas)}")
+    servidor.shutdown()
@@ -0,0 +1,284 @@
+"""
+Tabla precalculada de vecinos: los K más similares de cada canción.
+
+Los embeddings solo cambian cuando se reentrena el modelo, así que los
+vecinos se calculan una vez en lote y las recomendaciones pasan a ser un
+slice de un array con memory-map:
+
+    vecinos.npy   int32 (n, K): tokens vecinos de cada fila de Embeddings
+    scores.npy    float16 (n, K): similitud coseno, de mayor a menor
+    claves.npy    int32 (n,): token de cada fila (para actualizaciones incrementales)
+    meta.json     K y versión de los embeddings con los que se calculó
+    afectados.npy (tras actualizar_tabla_vecinos) tokens cuya lista cambió
+
+El cálculo recorre la matriz de similitudes por bloques (filas x columnas)
+en varios hilos; NumPy libera el GIL en el producto de matrices, así que los
+hilos usan todos los núcleos y la memoria queda acotada por el tamaño de
+bloque, no por el vocabulario.
+
+Uso:
+    python app/tabla_vecinos.py --k 50
+    python app/tabla_vecinos.py --actualizar   # Solo las filas afectadas por los vectores cambiados
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from embeddings import top_k_similares
+from settings import (RUTA_EMBEDDINGS, RUTA_TABLA_VECINOS, K_TABLA_VECINOS,
+                      BLOQUE_FILAS_VECINOS, BLOQUE_COLUMNAS_VECINOS, WORKERS_TABLA_VECINOS)
+
+# Con más vectores cambiados que esta fracción casi todas las filas acaban
+# recalculándose: es más rápido recalcular la tabla completa
+MAX_FRACCION_CAMBIADA = 0.25
+
+
+def _calcular_filas(embeddings, filas, k, vecinos, scores, bloque_filas, bloque_columnas, executor):
+    """Top-k exacto de las `filas` indicadas, escrito en vecinos/scores por bloques de filas"""
+    vectores, claves = embeddings.vectores, np.asarray(embeddings.claves)
+
+    def procesar(inicio):
+        bloque = filas[inicio:inicio + bloque_filas]
+        resultado, similitudes = top_k_similares(vectores[bloque], vectores, k,
+                                                 excluir=bloque, bloque_columnas=bloque_columnas)
+        vecinos[bloque] = claves[resultado]
+        scores[bloque] = similitudes
+        return len(bloque)
+
+    hechas = 0
+    for filas_hechas in executor.map(procesar, range(0, len(filas), bloque_filas)):
+        hechas += filas_hechas
+        print(f"\r   {hechas}/{len(filas)} filas", end='', flush=True)
+
+
+def _abrir_destino(ruta, n, k):
+    ruta_tmp = f"{ruta}.tmp"
+    if os.path.exists(ruta_tmp):
+        shutil.rmtree(ruta_tmp)
+    os.makedirs(ruta_tmp)
+    vecinos = np.lib.format.open_memmap(os.path.join(ruta_tmp, 'vecinos.npy'), mode='w+', dtype=np.int32, shape=(n, k))
+    scores = np.lib.format.open_memmap(os.path.join(ruta_tmp, 'scores.npy'), mode='w+', dtype=np.float16, shape=(n, k))
+    return ruta_tmp, vecinos, scores
+
+
+def _publicar(ruta_tmp, ruta, embeddings, vecinos, scores, meta):
+    vecinos.flush()
+    scores.flush()
+    np.save(os.path.join(ruta_tmp, 'claves.npy'), np.asarray(embeddings.claves))
+    with open(os.path.join(ruta_tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'k': int(vecinos.shape[1]), 'version_embeddings': embeddings.version,
+                   'num_vectores': int(vecinos.shape[0]), **meta}, f, indent=2)
+    if os.path.exists(ruta):
+        shutil.rmtree(ruta)
+    os.replace(ruta_tmp, ruta)
+
+
+def calcular_tabla_vecinos(embeddings, ruta=RUTA_TABLA_VECINOS, k=K_TABLA_VECINOS,
+                           bloque_filas=BLOQUE_FILAS_VECINOS, bloque_columnas=BLOQUE_COLUMNAS_VECINOS,
+                           workers=WORKERS_TABLA_VECINOS):
+    """
+    Calcula y guarda los k vecinos exactos de cada canción
+
+    Args:
+        embeddings: Embeddings de servicio
+        ruta: Carpeta de destino (se reemplaza de forma atómica)
+        k: Vecinos por canción (recomendaciones con top_n <= k salen de la tabla)
+        bloque_filas: Filas por tarea
+        bloque_columnas: Columnas por producto de matrices (memoria por hilo:
+            bloque_filas x bloque_columnas float32)
+        workers: Hilos (None = todos los núcleos)
+
+    Returns:
+        TablaVecinos con el resultado
+    """
+    n = len(embeddings.vectores)
+    k = max(min(k, n - 1), 1)
+    workers = workers or os.cpu_count()
+    print(f"\n=== CALCULANDO TABLA DE VECINOS (n={n}, K={k}, {workers} hilos) ===\n")
+
+    ruta_tmp, vecinos, scores = _abrir_destino(ruta, n, k)
+    inicio_total = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        _calcular_filas(embeddings, np.arange(n), k, vecinos, scores, bloque_filas, bloque_columnas, executor)
+    duracion = time.perf_counter() - inicio_total
+
+    _publicar(ruta_tmp, ruta, embeddings, vecinos, scores, {'segundos': duracion})
+    print(f"\n✓ Tabla de vecinos guardada en: {ruta}/ ({duracion:.1f}s, {n / max(duracion, 1e-9):,.0f} filas/s)")
+    return TablaVecinos(ruta)
+
+
+def actualizar_tabla_vecinos(embeddings, ruta=RUTA_TABLA_VECINOS, bloque_filas=BLOQUE_FILAS_VECINOS,
+                             bloque_columnas=BLOQUE_COLUMNAS_VECINOS, workers=WORKERS_TABLA_VECINOS):
+    """
+    Actualiza la tabla tras una actualización incremental de los embeddings
+    recalculando solo lo necesario
+
+    Los pares de filas que no cambiaron conservan su similitud, así que para
+    cada fila estable el nuevo top-k sale de fusionar su lista anterior (sin
+    los tokens cambiados) con su top-k frente a los vectores cambiados. El
+    resultado es exacto si su k-ésimo score no baja del k-ésimo anterior; si
+    baja (algún vecino desapareció sin reemplazo conocido), la fila se
+    recalcula entera, igual que las filas cambiadas.
+
+    Si la tabla no existe, los embeddings no son una actualización de la
+    versión con la que se calculó o cambió más de MAX_FRACCION_CAMBIADA de
+    los vectores, se recalcula completa.
+
+    Returns:
+        TablaVecinos con el resultado (afectados.npy: tokens cuya lista cambió)
+    """
+    anterior = TablaVecinos(ruta) if TablaVecinos.existe(ruta) else None
+    cambiados = None
+    if anterior is not None and anterior.claves is not None:
+        cambiados = embeddings.cambiados_desde(anterior.meta['version_embeddings'])
+    if cambiados is None or anterior.k > len(embeddings) - 1 or len(cambiados) > MAX_FRACCION_CAMBIADA * len(embeddings):
+        return calcular_tabla_vecinos(embeddings, ruta, bloque_filas=bloque_filas,
+                                      bloque_columnas=bloque_columnas, workers=workers)
+
+    vectores, claves = embeddings.vectores, np.asarray(embeddings.claves)
+    n, k = len(vectores), anterior.k
+    workers = workers or os.cpu_count()
+    print(f"\n=== ACTUALIZANDO TABLA DE VECINOS (n={n}, K={k}, {len(cambiados)} vectores cambiados) ===\n")
+
+    filas_embeddings = np.asarray(embeddings.filas)
+    filas_cambiadas = np.sort(filas_embeddings[cambiados]).astype(np.int64)
+    claves_cambiadas = claves[filas_cambiadas]
+    vectores_cambiados = np.asarray(vectores[filas_cambiadas], dtype=np.float32)
+    claves_anteriores = np.asarray(anterior.claves)
+    fila_anterior = np.full(int(max(claves.max(), claves_anteriores.max())) + 1, -1, dtype=np.int64)
+    fila_anterior[claves_anteriores] = np.arange(len(claves_anteriores))
+    estables = np.setdiff1d(np.arange(n), filas_cambiadas)
+
+    ruta_tmp, vecinos, scores = _abrir_destino(ruta, n, k)
+
+    def fusionar(inicio):
+        bloque = estables[inicio:inicio + bloque_filas]
+        previas = fila_anterior[claves[bloque]]
+        tokens_previos = np.asarray(anterior.vecinos[previas])
+        # Scores de la lista anterior recalculados en float32 (la tabla los guarda en float16)
+        consultas = np.asarray(vectores[bloque], dtype=np.float32)
+        scores_previos = np.einsum('bd,bkd->bk', consultas, vectores[filas_embeddings[tokens_previos]])
+        cambiados_previos = np.isin(tokens_previos, claves_cambiadas)
+        # Umbral = k-ésimo score de la versión anterior: exacto si ese vecino no
+        # cambió; si cambió, el float16 guardado más su error de redondeo
+        kesimo = np.asarray(anterior.scores[previas, -1])
+        umbral = np.where(cambiados_previos[:, -1], (kesimo + np.spacing(kesimo)).astype(np.float32),
+                          scores_previos[:, -1])
+        candidatos_tokens = tokens_previos
+        candidatos_scores = np.where(cambiados_previos, -np.inf, scores_previos)
+        if len(filas_cambiadas):
+            filas_nuevas, scores_nuevos = top_k_similares(consultas, vectores_cambiados, k,
+                                                          bloque_columnas=bloque_columnas)
+            candidatos_tokens = np.hstack([candidatos_tokens, claves_cambiadas[filas_nuevas]])
+            candidatos_scores = np.hstack([candidatos_scores, scores_nuevos])
+        orden = np.argsort(-candidatos_scores, axis=1, kind='stable')[:, :k]
+        tokens = np.take_along_axis(candidatos_tokens, orden, axis=1)
+        similitudes = np.take_along_axis(candidatos_scores, orden, axis=1)
+        vecinos[bloque] = tokens
+        scores[bloque] = similitudes
+        exactas = similitudes[:, -1] >= umbral
+        modificadas = np.any(tokens != tokens_previos, axis=1)
+        return bloque[~exactas], bloque[exactas & modificadas]
+
+    inicio_total = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        partes = list(executor.map(fusionar, range(0, len(estables), bloque_filas)))
+        incompletas = np.concatenate([p[0] for p in partes] + [np.zeros(0, dtype=np.int64)])
+        fusionadas = np.concatenate([p[1] for p in partes] + [np.zeros(0, dtype=np.int64)])
+        recalcular = np.union1d(filas_cambiadas, incompletas)
+        _calcular_filas(embeddings, recalcular, k, vecinos, scores, bloque_filas, bloque_columnas, executor)
+    duracion = time.perf_counter() - inicio_total
+
+    afectados = claves[np.union1d(recalcular, fusionadas)]
+    np.save(os.path.join(ruta_tmp, 'afectados.npy'), afectados)
+    _publicar(ruta_tmp, ruta, embeddings, vecinos, scores, {
+        'segundos': duracion, 'version_base': anterior.meta['version_embeddings'],
+        'filas_recalculadas': int(len(recalcular)), 'filas_afectadas': int(len(afectados)),
+    })
+    print(f"\n✓ Tabla de vecinos actualizada en: {ruta}/ ({duracion:.1f}s, {len(recalcular)} filas "
+          f"recalculadas, {len(afectados)} con vecinos distintos)")
+    return TablaVecinos(ruta)
+
+
+class TablaVecinos:
+    """
+    Vecinos precalculados con memory-map
+
+    Args:
+        ruta: Carpeta de la tabla (ver calcular_tabla_vecinos)
+    """
+
+    def __init__(self, ruta=RUTA_TABLA_VECINOS):
+        self.ruta = ruta
+        self.vecinos = np.load(os.path.join(ruta, 'vecinos.npy'), mmap_mode='r')
+        self.scores = np.load(os.path.join(ruta, 'scores.npy'), mmap_mode='r')
+        ruta_claves = os.path.join(ruta, 'claves.npy')
+        self.claves = np.load(ruta_claves, mmap_mode='r') if os.path.exists(ruta_claves) else None
+        with open(os.path.join(ruta, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+    @staticmethod
+    def existe(ruta=RUTA_TABLA_VECINOS):
+        return os.path.exists(os.path.join(ruta, 'meta.json'))
+
+    @property
+    def k(self):
+        return self.meta['k']
+
+    def vigente(self, embeddings):
+        """Comprueba que la tabla se calculó con esta versión de los embeddings"""
+        return self.meta['version_embeddings'] == embeddings.version
+
+    def afectados_desde(self, version):
+        """
+        Tokens cuya lista de vecinos cambió respecto a la tabla de la versión
+        `version` de los embeddings, o None si no se puede saber (tabla
+        recalculada completa o de otra versión base)
+        """
+        if self.meta.get('version_base') != version:
+            return None
+        return np.load(os.path.join(self.ruta, 'afectados.npy'))
+
+    def consultar(self, fila, top_n):
+        """
+        Vecinos de una fila de Embeddings (top_n <= k)
+
+        Returns:
+            Tupla (tokens, scores): vistas sobre el memory-map, de mayor a menor
+        """
+        return self.vecinos[fila, :top_n], self.scores[fila, :top_n]
+
+
+def cargar_tabla_vecinos(embeddings, ruta=RUTA_TABLA_VECINOS):
+    """
+    Abre la tabla si existe y corresponde a la versión actual de los embeddings
+
+    Returns:
+        TablaVecinos o None
+    """
+    if not TablaVecinos.existe(ruta):
+        return None
+    tabla = TablaVecinos(ruta)
+    if not tabla.vigente(embeddings):
+        print(f"⚠️  La tabla de vecinos de {ruta} es de otra versión de los embeddings; se ignora")
+        return None
+    return tabla
+
+
+if __name__ == '__main__':
+    from embeddings import Embeddings
+
+    parser = argparse.ArgumentParser(description='Precalcula los K vecinos de cada canción')
+    parser.add_argument('--k', type=int, default=K_TABLA_VECINOS)
+    parser.add_argument('--workers', type=int, default=WORKERS_TABLA_VECINOS)
+    parser.add_argument('--actualizar', action='store_true',
+                        help='Recalcula solo las filas afectadas por una actualización incremental')
+    args = parser.parse_args()
+
+    if args.actualizar:
+        actualizar_tabla_vecinos(Embeddings(RUTA_EMBEDDINGS), workers=args.workers)
+    else:
+        calcular_tabla_vecinos(Embeddings(RUTA_EMBEDDINGS), k=args.k, workers=args.workers)
@@ -0,0 +1,157 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from corpus import EscritorCorpus, CorpusPlaylists
+from normalizacion import SEPARADOR_ARTISTAS
+from settings import RUTA_DATOS_TOKENIZACION, RUTA_CHECKPOINT_TOKENIZACION, RUTA_CORPUS
+
+
+def estado_vacio():
+    """Estado de tokenización inicial (sin canciones ni playlists)"""
+    return {
+        # Diccionario de mapeo: "cancion - artista" -> token_id
+        'canciones_a_tokens': {},
+        # Diccionario inverso: token_id -> {'cancion', 'artista', 'genero', 'popularidad'}
+        'tokens_a_canciones': {},
+        # playlist_id -> snapshot_id con el que se tokenizó
+        'snapshots': {},
+        # genero -> lista de playlists descubiertas
+        'playlists_generos': {},
+        # Playlists ya escritas en el corpus parcial de esta ejecución (checkpoint)
+        'playlists_en_corpus_parcial': 0,
+    }
+
+
+def cargar_estado(ruta=RUTA_DATOS_TOKENIZACION):
+    """
+    Carga un estado de tokenización guardado
+
+    Args:
+        ruta: Archivo pickle con el estado
+
+    Returns:
+        Diccionario de estado, o None si el archivo no existe
+    """
+    if not os.path.exists(ruta):
+        return None
+
+    with open(ruta, 'rb') as f:
+        datos = pickle.load(f)
+
+    # Las playlists tokenizadas ya no viven en el pickle sino en el corpus compacto
+    playlists_por_id = datos.pop('playlists_por_id', None)
+    playlists_tokenizadas = datos.pop('playlists_tokenizadas', None)
+    if playlists_tokenizadas and not CorpusPlaylists.existe():
+        migrar_playlists_a_corpus(playlists_por_id or dict(enumerate(playlists_tokenizadas)))
+
+    estado = estado_vacio()
+    estado.update(datos)
+    return estado
+
+
+def migrar_playlists_a_corpus(playlists_por_id, ruta=RUTA_CORPUS):
+    """Convierte las playlists de un pickle antiguo (listas de listas) al corpus compacto"""
+    with EscritorCorpus(ruta) as escritor:
+        for playlist_id, tokens in playlists_por_id.items():
+            escritor.agregar(tokens, str(playlist_id))
+
+
+def guardar_estado(estado, ruta=RUTA_DATOS_TOKENIZACION):
+    """Guarda el estado (mapeos y snapshots) de forma atómica"""
+    datos = dict(estado)
+
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    ruta_tmp = f"{ruta}.tmp"
+    with open(ruta_tmp, 'wb') as f:
+        pickle.dump(datos, f)
+    os.replace(ruta_tmp, ruta)
+
+
+def guardar_checkpoint(estado):
+    """Guarda el progreso parcial del crawl para poder reanudarlo"""
+    guardar_estado(estado, RUTA_CHECKPOINT_TOKENIZACION)
+
+
+def borrar_checkpoint():
+    """Elimina el checkpoint una vez que el crawl terminó correctamente"""
+    if os.path.exists(RUTA_CHECKPOINT_TOKENIZACION):
+        os.remove(RUTA_CHECKPOINT_TOKENIZACION)
+
+
+def playlists_pendientes(estado, playlists):
+    """
+    Filtra las playlists cuyo snapshot cambió o que nunca se tokenizaron
+
+    Args:
+        estado: Estado de tokenización actual
+        playlists: Lista de diccionarios con 'id' y 'snapshot_id'
+
+    Returns:
+        Lista de playlists que deben descargarse y tokenizarse de nuevo
+    """
+    pendientes = {}
+    for playlist_info in playlists:
+        snapshot_guardado = estado['snapshots'].get(playlist_info['id'])
+        if snapshot_guardado is None or snapshot_guardado != playlist_info.get('snapshot_id'):
+            pendientes[playlist_info['id']] = playlist_info
+    return list(pendientes.values())
+
+
+def tokenizar_lote(estado, tracks):
+    """
+    Convierte en tokens las canciones de muchas playlists a la vez,
+    reutilizando los tokens existentes y numerando las nuevas a continuación
+    (la clave de una canción es "cancion - artista" en minúsculas).
+
+    Las parejas (nombre, artistas) se factorizan primero por sus códigos
+    enteros, la clave se construye solo para las parejas distintas y un
+    segundo factorize une las que solo difieren en mayúsculas.
+    factorize numera en orden de primera aparición, así que las canciones
+    nuevas reciben sus tokens en el orden en que aparecen en las filas
+
+    Args:
+        estado: Estado de tokenización (se modifica en el lugar)
+        tracks: DataFrame de normalizacion.aplanar_tracks (columnas nombre,
+            artistas, genero y popularidad), en el orden de tokenización
+
+    Returns:
+        Tupla (tokens int32 alineados con las filas, máscara de filas que
+        crearon un token nuevo)
+    """
+    canciones_a_tokens = estado['canciones_a_tokens']
+    tokens_a_canciones = estado['tokens_a_canciones']
+
+    codigos_nombre, nombres = pd.factorize(tracks['nombre'])
+    codigos_artistas, artistas = pd.factorize(tracks['artistas'])
+    n_artistas = max(len(artistas), 1)
+    codigos_pareja, parejas = pd.factorize(codigos_nombre.astype(np.int64) * n_artistas + codigos_artistas)
+    nombres = pd.Series(nombres, dtype=object).str.lower().to_numpy(dtype=object)
+    artistas = pd.Series(artistas, dtype=object).str.replace(SEPARADOR_ARTISTAS, ', ', regex=False).to_numpy(dtype=object)
+    nombres_pareja = nombres[parejas // n_artistas]
+    artistas_pareja = artistas[parejas % n_artistas]
+    claves_pareja = pd.Series(nombres_pareja) + ' - ' + pd.Series(artistas_pareja).str.lower()
+    codigos_clave, claves = pd.factorize(claves_pareja)
+    codigos = codigos_clave[codigos_pareja]
+
+    # Tokens existentes (0 = canción nueva); las nuevas siguen a partir del último asignado
+    tokens_claves = np.fromiter((canciones_a_tokens.get(clave, 0) for clave in claves),
+                                dtype=np.int64, count=len(claves))
+    nuevas = np.flatnonzero(tokens_claves == 0)
+    tokens_claves[nuevas] = len(tokens_a_canciones) + 1 + np.arange(len(nuevas))
+
+    # Fila de la primera aparición de cada clave nueva (los códigos crecen con la fila)
+    primeras = np.unique(codigos, return_index=True)[1][nuevas]
+    nuevos_tokens = tokens_claves[nuevas].tolist()
+    canciones_a_tokens.update(zip(claves[nuevas], nuevos_tokens))
+    for token, pareja, genero, popularidad in zip(
+        nuevos_tokens, codigos_pareja[primeras], tracks['genero'].to_numpy()[primeras],
+        tracks['popularidad'].to_numpy()[primeras],
+    ):
+        tokens_a_canciones[token] = {'cancion': nombres_pareja[pareja], 'artista': artistas_pareja[pareja],
+                                     'genero': genero,
+                                     'popularidad': None if pd.isna(popularidad) else int(popularidad)}
+
+    es_nueva = np.zeros(len(codigos), dtype=bool)
+    es_nueva[primeras] = True
+    return tokens_claves[codigos].astype(np.int32), es_nueva
@@ -1,37 +1,29 @@
-from autentication import sp
 import re
 from settings import LIMIT_PLAYLISTS
+from crawler import TokenBucket, EstadisticasCrawl, buscar_playlists_genero
+from cliente_spotify import obtener_cliente
 
 # Función para buscar múltiples playlists por género
-def buscar_playlist_genero(genero, limite=LIMIT_PLAYLISTS):
-    """Busca múltiples playlists de un género musical"""
-    query = f'Top {genero}'
+def buscar_playlist_genero(genero, limite=LIMIT_PLAYLISTS, refrescar=False):
+    """
+    Busca múltiples playlists de un género musical (refrescar=True ignora la caché).
+    Pagina la búsqueda con offset hasta reunir `limite` playlists; para varios
+    géneros a la vez ver crawler.descubrir_playlists
+    """
     playlists_encontradas = []
-    
+
     try:
-        results = sp.search(q=query, type='playlist', limit=LIMIT_PLAYLISTS)  # Buscar más resultados
-        
-        if results and results['playlists']['items']:
-            for playlist in results['playlists']['items']:
-                if playlist and genero.lower() in playlist['name'].lower():
-                    es_oficial = 'spotify' in playlist['owner']['id'].lower()
-                    tipo = "oficial" if es_oficial else "popular"
-                    print(f"✓ Playlist {tipo}: {playlist['name']} - ID: {playlist['id']}")
-                    
-                    playlists_encontradas.append({
-                        'id': playlist['id'], 
-                        'name': playlist['name'],
-                        'oficial': es_oficial
-                    })
-                    
-                    # Limitar cantidad de playlists
-                    if len(playlists_encontradas) >= limite:
-                        break
-                
+        playlists_encontradas = buscar_playlists_genero(
+            obtener_cliente(), genero, limite, TokenBucket(), EstadisticasCrawl(), refrescar=refrescar
+        )
+        for playlist in playlists_encontradas:
+            tipo = "oficial" if playlist['oficial'] else "popular"
+            print(f"✓ Playlist {tipo}: {playlist['name']} - ID: {playlist['id']}")
+
     except Exception as e:
         print(f"Error buscando playlists de {genero}: {e}")
-    
-    return playlists_encontradas if playlists_encontradas else []
+
+    return playlists_encontradas
 
 # Función para limpiar paréntesis
 def limpiar_parentesis(texto):
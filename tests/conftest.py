@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos de app/ se importan entre sí por nombre (como al ejecutar python app/x.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
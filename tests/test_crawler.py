@@ -0,0 +1,97 @@
+import pytest
+import cache_playlists
+from crawler import TokenBucket, descargar_playlists, descubrir_playlists
+from spotify_falso import iniciar_servidor, cliente_falso, canciones_por_playlist, track_falso
+
+MEDIA_CANCIONES = 150  # Entre 75 y 224 canciones: de 1 a 3 páginas por playlist
+
+
+@pytest.fixture
+def servidor():
+    servidor = iniciar_servidor(puerto=0, limite_por_segundo=1000, media_canciones=MEDIA_CANCIONES)
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def cache_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_playlists, 'RUTA_CACHE', str(tmp_path / 'cache'))
+    monkeypatch.setattr(cache_playlists, '_memoria', {})
+    return tmp_path / 'cache'
+
+
+def _playlists(n):
+    return [{'id': f"falsa{i}", 'name': f"Falsa {i}", 'snapshot_id': f"snap{i}"} for i in range(n)]
+
+
+def _paginas(playlist_id):
+    return -(-canciones_por_playlist(playlist_id, MEDIA_CANCIONES) // 100)
+
+
+def test_descarga_todas_las_paginas_en_orden(servidor):
+    playlists = _playlists(12)
+    tracks, estadisticas = descargar_playlists(playlists, sp=cliente_falso(servidor), max_workers=4,
+                                               bucket=TokenBucket(1000), usar_cache=False)
+
+    assert set(tracks) == {p['id'] for p in playlists}
+    for playlist_id, items in tracks.items():
+        total = canciones_por_playlist(playlist_id, MEDIA_CANCIONES)
+        assert items == [track_falso(playlist_id, posicion) for posicion in range(total)]
+    assert estadisticas.paginas == sum(_paginas(p['id']) for p in playlists)
+    assert estadisticas.peticiones == servidor.peticiones == estadisticas.paginas
+
+
+def test_429_pausa_y_reintenta_hasta_completar(servidor):
+    # Sin límite en el bucket: solo el Retry-After del servidor frena al crawler
+    servidor.limite_por_segundo = 10
+    servidor.retry_after = 1
+    playlists = _playlists(8)
+    tracks, estadisticas = descargar_playlists(playlists, sp=cliente_falso(servidor), max_workers=8,
+                                               bucket=TokenBucket(1000), usar_cache=False)
+
+    assert estadisticas.respuestas_429 > 0
+    assert estadisticas.respuestas_429 == servidor.respuestas_429
+    assert set(tracks) == {p['id'] for p in playlists}
+    assert estadisticas.duracion >= servidor.retry_after  # El bucket se pausó con el Retry-After
+    for playlist_id, items in tracks.items():
+        assert len(items) == canciones_por_playlist(playlist_id, MEDIA_CANCIONES)
+    # Cada 429 se reintenta: las peticiones válidas son exactamente las páginas
+    assert estadisticas.peticiones - estadisticas.respuestas_429 == estadisticas.paginas
+
+
+def test_playlists_repetidas_se_descargan_una_vez(servidor):
+    playlists = _playlists(5)
+    tracks, estadisticas = descargar_playlists(playlists + playlists[:3], sp=cliente_falso(servidor),
+                                               bucket=TokenBucket(1000), usar_cache=False)
+
+    assert len(tracks) == 5
+    assert servidor.peticiones == sum(_paginas(p['id']) for p in playlists)
+
+
+def test_descubrimiento_sin_repetidas_entre_generos(servidor):
+    generos = ['Rock', 'Pop', 'Salsa', 'Indie']
+    playlists_generos, _ = descubrir_playlists(generos, objetivo=40, sp=cliente_falso(servidor),
+                                               bucket=TokenBucket(1000), usar_cache=False)
+
+    ids = [p['id'] for playlists in playlists_generos.values() for p in playlists]
+    assert list(playlists_generos) == generos
+    assert len(ids) == len(set(ids))
+    for genero, playlists in playlists_generos.items():
+        assert 0 < len(playlists) <= 40
+        assert all(genero.lower() in p['name'].lower() for p in playlists)
+
+
+def test_segunda_ejecucion_sale_de_la_cache_sin_peticiones(servidor, cache_temporal, monkeypatch):
+    playlists = _playlists(6)
+    primera, _ = descargar_playlists(playlists, sp=cliente_falso(servidor), bucket=TokenBucket(1000))
+    peticiones = servidor.peticiones
+    assert peticiones > 0
+
+    # Sin la caché en memoria: la segunda ejecución lee el disco
+    monkeypatch.setattr(cache_playlists, '_memoria', {})
+    segunda, estadisticas = descargar_playlists(playlists, sp=cliente_falso(servidor), bucket=TokenBucket(1000))
+
+    assert segunda == primera
+    assert estadisticas.peticiones == 0
+    assert servidor.peticiones == peticiones
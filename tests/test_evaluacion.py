@@ -0,0 +1,51 @@
+import numpy as np
+from evaluacion import _normalizar, _evaluar_exacto, metricas_consultas
+
+
+def _datos(rng, vectores, n_consultas, excluir_por_consulta=5):
+    objetivos = rng.integers(0, len(vectores), n_consultas)
+    excluir_consulta = np.repeat(np.arange(n_consultas), excluir_por_consulta)
+    excluir_fila = rng.integers(0, len(vectores), len(excluir_consulta))
+    distinto = excluir_fila != objetivos[excluir_consulta]
+    return {
+        'objetivos': objetivos,
+        'excluir_consulta': excluir_consulta[distinto],
+        'excluir_fila': excluir_fila[distinto],
+        'omitidas': 0,
+    }
+
+
+def _rangos_ingenuos(vectores, datos, margen):
+    """Cotas del rango del objetivo con el ranking completo q @ V.T (sin contar al propio objetivo)"""
+    scores = datos['consultas'] @ vectores.T
+    filas = np.arange(len(scores))
+    scores[datos['excluir_consulta'], datos['excluir_fila']] = -np.inf
+    objetivo = scores[filas, datos['objetivos']].copy()
+    scores[filas, datos['objetivos']] = -np.inf
+    return (np.count_nonzero(scores > objetivo[:, None] + margen, axis=1),
+            np.count_nonzero(scores > objetivo[:, None] - margen, axis=1))
+
+
+def test_objetivo_igual_a_la_consulta_tiene_rango_uno():
+    rng = np.random.default_rng(0)
+    vectores = _normalizar(rng.standard_normal((3000, 64)).astype(np.float32))
+    datos = _datos(rng, vectores, 400)
+    datos['consultas'] = vectores[datos['objetivos']].copy()
+
+    resultado = metricas_consultas(vectores, datos, ks=(1, 10), bloque_consultas=64, bloque_columnas=512, workers=1)
+
+    assert resultado['mrr'] == 1.0
+    assert resultado['hit@1'] == 1.0
+
+
+def test_rangos_coinciden_con_el_ranking_ingenuo():
+    rng = np.random.default_rng(1)
+    vectores = _normalizar(rng.standard_normal((5000, 100)).astype(np.float32))
+    datos = _datos(rng, vectores, 600)
+    datos['consultas'] = _normalizar(rng.standard_normal((600, 100)).astype(np.float32))
+
+    rangos, _ = _evaluar_exacto(vectores, datos['consultas'], datos['objetivos'], datos['excluir_consulta'],
+                                datos['excluir_fila'], 10, 128, 1024, 2)
+    minimo, maximo = _rangos_ingenuos(vectores, datos, margen=1e-5)
+
+    assert np.all((minimo <= rangos) & (rangos <= maximo))
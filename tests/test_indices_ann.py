@@ -0,0 +1,38 @@
+import numpy as np
+from indices_ann import IndiceHNSW, cargar_indice, evaluar_recall
+
+
+def _agrupados(n, d=32, tam_grupo=50, semilla=0):
+    """Vectores normalizados en grupos bien separados (el caso en el que un grafo k-NN queda partido)"""
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((n // tam_grupo, d))
+    vectores = centros[rng.integers(0, len(centros), n)] + 0.6 * rng.standard_normal((n, d))
+    return (vectores / np.linalg.norm(vectores, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_hnsw_recall_en_datos_agrupados():
+    vectores = _agrupados(4000)
+    indice = IndiceHNSW(vectores, M=8, listas_construccion=8).construir()
+
+    assert indice.vecinos0.shape == (len(vectores), 16)
+    assert evaluar_recall(indice, vectores, k=10, n_consultas=100, ef_busqueda=64)['recall'] >= 0.9
+
+
+def test_hnsw_grafo_sin_bucles_ni_repetidos():
+    vectores = _agrupados(2000)
+    indice = IndiceHNSW(vectores, M=8, listas_construccion=8).construir()
+
+    for nodo, fila in enumerate(indice.vecinos0):
+        vecinos = fila[fila >= 0]
+        assert len(vecinos) > 0
+        assert nodo not in vecinos
+        assert len(set(vecinos.tolist())) == len(vecinos)
+
+
+def test_indice_de_otra_version_de_los_embeddings_se_ignora(tmp_path):
+    vectores = _agrupados(500)
+    ruta = str(tmp_path / 'indice_ann')
+    IndiceHNSW(vectores, M=8).construir().guardar(ruta, version_embeddings='v1')
+
+    assert cargar_indice(vectores, ruta, version_embeddings='v1') is not None
+    assert cargar_indice(vectores, ruta, version_embeddings='v2') is None
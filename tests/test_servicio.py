@@ -0,0 +1,49 @@
+import asyncio
+import json
+import pytest
+from motor import RecommenderEngine
+from servicio import ServicioRecomendaciones
+
+CUERPOS_INVALIDOS = [
+    b'[1, 2]',
+    b'{"semillas": []}',
+    b'{"semillas": "1"}',
+    b'{"semillas": [1, "2"]}',
+    b'{"semillas": [1, true]}',
+    b'{"semillas": [1], "negativas": 3}',
+    b'{"semillas": [1], "negativas": [1.5]}',
+    b'{"semillas": [1], "vistas": {"a": 1}}',
+    b'{"semillas": [1], "vistas": [null]}',
+    b'{"semillas": [1, 2], "pesos": [1.0]}',
+    b'{"semillas": [1], "pesos": 1.0}',
+    b'{"semillas": [1], "pesos": ["1"]}',
+    b'{"semillas": [1], "pesos": [NaN]}',
+    b'{"semillas": [1], "top_n": "cinco"}',
+    b'{"semillas": [1], "top_n": 0}',
+]
+
+
+async def _post(puerto, ruta, cuerpo):
+    lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+    escritor.write(f"POST {ruta} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(cuerpo)}\r\n"
+                   f"Connection: close\r\n\r\n".encode('latin-1') + cuerpo)
+    await escritor.drain()
+    respuesta = await lector.read()
+    escritor.close()
+    cabecera, _, datos = respuesta.partition(b'\r\n\r\n')
+    return int(cabecera.split(b' ', 2)[1]), json.loads(datos)
+
+
+@pytest.mark.parametrize('cuerpo', CUERPOS_INVALIDOS)
+def test_sesion_con_cuerpo_invalido_devuelve_400(tmp_path, cuerpo):
+    async def probar():
+        # El cuerpo se valida antes de tocar el motor: no hacen falta artefactos
+        motor = RecommenderEngine(ruta_catalogo=str(tmp_path / 'catalogo'),
+                                  ruta_embeddings=str(tmp_path / 'embeddings'), usar_indice=False)
+        servidor = await asyncio.start_server(ServicioRecomendaciones(motor).atender, '127.0.0.1', 0)
+        async with servidor:
+            return await _post(servidor.sockets[0].getsockname()[1], '/sesion', cuerpo)
+
+    estado, respuesta = asyncio.run(probar())
+    assert estado == 400, respuesta
+    assert 'error' in respuesta